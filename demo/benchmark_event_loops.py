@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+"""This benchmark compares the event loop implementations that may be chosen with the
+configuration option `event_loop_policy`.
+
+For each policy, it measures the throughput of websocket messages sent, as a WoTServer does, to a
+crowd of subscribers, and the precision of timers: how late `call_later` runs its callbacks.
+A policy whose module is not installed is skipped.
+
+--event_loop_policies=asyncio,uvloop sets the policies to compare
+--number_of_clients=20 sets how many websocket clients subscribe
+--number_of_messages=2000 sets how many messages are sent to each client
+--number_of_timers=500 sets how many timers are measured for each delay
+"""
+
+import asyncio
+import json
+import logging
+
+from time import perf_counter
+
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application
+from tornado.websocket import WebSocketHandler, websocket_connect
+
+from pywot import (
+    logging_config,
+    log_config
+)
+from pywot.event_loops import use_event_loop_policy
+from configmanners import (
+    configuration,
+    Namespace,
+)
+
+TIMER_DELAYS = (0.001, 0.01, 0.1)
+
+
+class SubscriberHandler(WebSocketHandler):
+    def initialize(self, subscribers):
+        self.subscribers = subscribers
+
+    def open(self):
+        self.subscribers.add(self)
+
+    def on_close(self):
+        self.subscribers.discard(self)
+
+
+async def count_messages(a_connection, number_of_messages):
+    for i in range(number_of_messages):
+        if await a_connection.read_message() is None:
+            raise ConnectionError("the websocket closed early")
+
+
+async def measure_websocket_throughput(number_of_clients, number_of_messages):
+    """return the number of messages per second received by all the clients together"""
+    subscribers = set()
+    a_socket, port = bind_unused_port()
+    server = HTTPServer(Application([(r"/", SubscriberHandler, dict(subscribers=subscribers))]))
+    server.add_sockets([a_socket])
+    connections = [
+        await websocket_connect(f"ws://127.0.0.1:{port}/") for i in range(number_of_clients)
+    ]
+    while len(subscribers) < number_of_clients:
+        await asyncio.sleep(0.01)
+
+    started = perf_counter()
+    readers = asyncio.gather(
+        *(count_messages(a_connection, number_of_messages) for a_connection in connections)
+    )
+    for i in range(number_of_messages):
+        # the same message as Thing.property_notify sends for each change of a property
+        message = json.dumps(
+            {"messageType": "propertyStatus", "data": {"temperature": 20.0 + i / 100.0}}
+        )
+        await asyncio.gather(*(a_subscriber.write_message(message) for a_subscriber in subscribers))
+    await readers
+    seconds = perf_counter() - started
+
+    for a_connection in connections:
+        a_connection.close()
+    server.stop()
+    return number_of_clients * number_of_messages / seconds
+
+
+async def measure_timer_precision(delay, number_of_timers):
+    """return the mean, 99th percentile and maximum lateness of timers of `delay` in seconds"""
+    io_loop = asyncio.get_event_loop()
+    latenesses = []
+    for i in range(number_of_timers):
+        fired = io_loop.create_future()
+        started = perf_counter()
+        io_loop.call_later(delay, lambda: fired.set_result(perf_counter()))
+        latenesses.append(await fired - started - delay)
+    latenesses.sort()
+    return (
+        sum(latenesses) / len(latenesses),
+        latenesses[int(len(latenesses) * 0.99)],
+        latenesses[-1],
+    )
+
+
+def run_benchmark(config):
+    for policy_name in config.event_loop_policies.split(","):
+        policy_name = policy_name.strip()
+        if policy_name == 'asyncio':
+            # use_event_loop_policy leaves the policy of the previous comparison in place
+            asyncio.set_event_loop_policy(None)
+        elif use_event_loop_policy(policy_name) != policy_name:
+            print(f'{policy_name:>10}: not available')
+            continue
+        io_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(io_loop)
+        try:
+            messages_per_second = io_loop.run_until_complete(
+                measure_websocket_throughput(config.number_of_clients, config.number_of_messages)
+            )
+            print(
+                f'{policy_name:>10}: {messages_per_second:.0f} websocket messages per second '
+                f'to {config.number_of_clients} clients'
+            )
+            for a_delay in TIMER_DELAYS:
+                mean, ninety_ninth_percentile, maximum = io_loop.run_until_complete(
+                    measure_timer_precision(a_delay, config.number_of_timers)
+                )
+                print(
+                    f'{"":>10}  timers of {a_delay * 1000.0:g}ms late by {mean * 1000000.0:.0f}us '
+                    f'on average, {ninety_ninth_percentile * 1000000.0:.0f}us at the 99th '
+                    f'percentile, {maximum * 1000000.0:.0f}us at worst'
+                )
+        finally:
+            io_loop.close()
+            asyncio.set_event_loop(None)
+    asyncio.set_event_loop_policy(None)
+
+
+if __name__ == '__main__':
+    required_config = Namespace()
+    required_config.add_option(
+        'event_loop_policies',
+        doc='a comma separated list of the event loop policies to compare',
+        default='asyncio,uvloop',
+    )
+    required_config.add_option(
+        'number_of_clients',
+        doc='the number of websocket clients',
+        default=20,
+    )
+    required_config.add_option(
+        'number_of_messages',
+        doc='the number of messages sent to each websocket client',
+        default=2000,
+    )
+    required_config.add_option(
+        'number_of_timers',
+        doc='the number of timers measured for each delay',
+        default=500,
+    )
+    required_config.update(logging_config)
+    required_config.logging_level.default = 'WARNING'
+    config = configuration(required_config)
+
+    logging.basicConfig(
+        level=config.logging_level,
+        format=config.logging_format
+    )
+    log_config(config)
+
+    run_benchmark(config)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+"""This benchmark measures how long it takes to instantiate a fleet of WoTThings, the startup cost
+paid by a server that creates its things from configuration by the hundreds.
+
+For comparison, it also times the scan of `dir()` that WoTThing.__init__ used to make on every
+instantiation to find the WoT Properties of the class.  WoTThing now makes that scan just once
+per class, when the class is created.
+
+--number_of_things=1000 sets the size of the fleet
+--number_of_repeats=5 sets how many times each measurement is repeated, the best time is reported
+"""
+
+import logging
+
+from timeit import repeat
+
+from pywot import (
+    WoTThing,
+    WoTProperty,
+    logging_config,
+    log_config
+)
+from configmanners import (
+    configuration,
+    Namespace,
+)
+
+
+class BenchmarkThing(WoTThing):
+    def __init__(self, config, name):
+        super(BenchmarkThing, self).__init__(config, name, "thing", "a thing to be counted")
+
+    async def get_all_values(self):
+        pass
+
+    temperature = WoTThing.wot_property(
+        name='temperature',
+        initial_value=0.0,
+        description='a temperature',
+        value_source_fn=get_all_values,
+    )
+    humidity = WoTThing.wot_property(
+        name='humidity',
+        initial_value=0.0,
+        description='a relative humidity',
+        value_source_fn=get_all_values,
+    )
+    pressure = WoTThing.wot_property(
+        name='pressure',
+        initial_value=30.0,
+        description='a barometric pressure',
+        value_source_fn=get_all_values,
+    )
+    on_off = WoTThing.wot_property(
+        name='on',
+        initial_value=False,
+        description='on/off status',
+    )
+    mode = WoTThing.wot_property(
+        name='mode',
+        initial_value='off',
+        description='an operating mode',
+    )
+
+
+def scan_dir_for_wot_properties(a_class):
+    """the per instantiation search for WoT Properties as WoTThing.__init__ used to do it"""
+    wot_properties = []
+    for attribute_name in dir(a_class):
+        if attribute_name.startswith("_"):
+            continue
+        if not isinstance(getattr(a_class, attribute_name), WoTProperty):
+            continue
+        wot_properties.append(getattr(a_class, attribute_name))
+    return wot_properties
+
+
+def run_benchmark(config):
+    number_of_things = config.number_of_things
+
+    def instantiate_the_fleet():
+        return [BenchmarkThing(config, f"thing {i}") for i in range(number_of_things)]
+
+    def scan_for_the_fleet():
+        return [scan_dir_for_wot_properties(BenchmarkThing) for i in range(number_of_things)]
+
+    def iterate_for_the_fleet():
+        return [list(BenchmarkThing.wot_properties) for i in range(number_of_things)]
+
+    for label, a_function in (
+        ('instantiate things', instantiate_the_fleet),
+        ('scan dir() for properties (old way)', scan_for_the_fleet),
+        ('iterate the class registry (new way)', iterate_for_the_fleet),
+    ):
+        best_time = min(repeat(a_function, number=1, repeat=config.number_of_repeats))
+        print(
+            f'{label:>40}: {number_of_things} in {best_time * 1000.0:.2f}ms '
+            f'({best_time * 1000000.0 / number_of_things:.2f}us each)'
+        )
+
+
+if __name__ == '__main__':
+    required_config = Namespace()
+    required_config.update(BenchmarkThing.get_required_config())
+    required_config.add_option(
+        'number_of_things',
+        doc='the number of things to instantiate',
+        default=1000,
+    )
+    required_config.add_option(
+        'number_of_repeats',
+        doc='the number of times to repeat each measurement',
+        default=5,
+    )
+    required_config.update(logging_config)
+    required_config.logging_level.default = 'WARNING'
+    config = configuration(required_config)
+
+    logging.basicConfig(
+        level=config.logging_level,
+        format=config.logging_format
+    )
+    log_config(config)
+
+    run_benchmark(config)
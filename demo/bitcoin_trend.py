@@ -10,9 +10,7 @@ can be edited to set the parameters.  Thereafter, running with --admin.conf=my_c
 load configuration from the file.
 """
 
-import aiohttp
 import async_timeout
-import json
 import logging
 
 from pywot import (
@@ -63,10 +61,10 @@ class BitcoinTrend(WoTThing):
         self.previous_value = 0
 
     async def get_bitcoin_value(self):
-        async with aiohttp.ClientSession() as session:
-            async with async_timeout.timeout(self.config.seconds_for_timeout):
-                async with session.get(self.config.target_url) as response:
-                    self.bitcoin_data = json.loads(await response.text())
+        async with async_timeout.timeout(self.config.seconds_for_timeout):
+            # when coindesk says the price hasn't changed since the last poll, this raises
+            # NotModified and the poll ends here
+            self.bitcoin_data = await self.fetch_json_if_changed(self.config.target_url)
         current_observation = self.bitcoin_data['bpi']['USD']['rate_float']
         self.trend = self.sign(current_observation - self.previous_value)
         self.previous_value = current_observation
@@ -81,6 +79,10 @@ class BitcoinTrend(WoTThing):
         initial_value=0,
         description='the trend positive or negative',
         value_source_fn=get_bitcoin_value,
+        # the price sits still for long stretches and then moves quickly, so poll as often as
+        # once a minute while it moves and as rarely as every fifteen minutes while it doesn't
+        minimum_seconds_between_polling=60,
+        maximum_seconds_between_polling=900,
     )
 
 
@@ -22,6 +22,10 @@ from pywot import (
     logging_config,
     log_config
 )
+from pywot.http_client import HttpClient
+
+# all the bonded things share one pool of HTTP connections
+http_client = HttpClient()
 
 # We open a web socket to each light so we can get notified of any state change.  On noting a
 # state change, we set that state in each of the other lights.  However, setting the state in
@@ -85,28 +89,27 @@ async def change_property(config, a_thing, a_property, a_value):
     a_value_formatted = format_for_json_output(a_value)
     while True:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with async_timeout.timeout(config.seconds_for_timeout):
-                    async with session.put(
-                        "http://gateway.local/things/{}/properties/{}".format(
-                            a_thing,
-                            a_property
-                        ),
-                        headers={
-                            'Accept': 'application/json',
-                            'Authorization': 'Bearer {}'.format(config.things_gateway_auth_key),
-                            'Content-Type': 'application/json'
-                        },
-                        data='{{"{}": {}}}'.format(
-                            a_property,
-                            a_value_formatted
-                        )
-                    ) as response:
-                        logging.debug('sent %s', '{{"{}": {}}}'.format(
-                            a_property,
-                            a_value_formatted
-                        ))
-                        return await response.text()
+            async with async_timeout.timeout(config.seconds_for_timeout):
+                async with http_client.put(
+                    "http://gateway.local/things/{}/properties/{}".format(
+                        a_thing,
+                        a_property
+                    ),
+                    headers={
+                        'Accept': 'application/json',
+                        'Authorization': 'Bearer {}'.format(config.things_gateway_auth_key),
+                        'Content-Type': 'application/json'
+                    },
+                    data='{{"{}": {}}}'.format(
+                        a_property,
+                        a_value_formatted
+                    )
+                ) as response:
+                    logging.debug('sent %s', '{{"{}": {}}}'.format(
+                        a_property,
+                        a_value_formatted
+                    ))
+                    return await response.text()
         except aiohttp.client_exceptions.ClientConnectorError as e:
             logging.error('problem contacting http:/gateway.local: {}'.format(e))
             logging.info('retrying after 20 second pause')
@@ -149,5 +152,9 @@ if __name__ == '__main__':
     )
     log_config(config)
 
+    event_loop = asyncio.get_event_loop()
     asyncio.ensure_future(bond_things_together(config))
-    asyncio.get_event_loop().run_forever()
+    try:
+        event_loop.run_forever()
+    finally:
+        event_loop.run_until_complete(http_client.close())
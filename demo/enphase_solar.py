@@ -10,7 +10,6 @@
 --admin.conf=my_config.ini will thereafter load configuration from the file.
 """
 
-import aiohttp
 import async_timeout
 import logging
 
@@ -21,6 +20,7 @@ from pywot import (
     logging_config,
     log_config
 )
+from pywot.executors import process_pool
 from configmanners import (
     configuration,
     Namespace,
@@ -35,6 +35,27 @@ def create_url(config, local_namespace, args):
     )
 
 
+def parse_enphase_home_page(enphase_home_page_raw):
+    """find the raw strings for lifetime generation, current generation, the number of
+    microinverters and the number of those online.  This runs in the process pool."""
+    enphase_page = BeautifulSoup(enphase_home_page_raw, 'html.parser')
+    # this is stupidly fragile - we're assuming this page format never
+    # changes from fetch to fetch - observation has shown this to be ok
+    # but don't know if that will hold over Enphase software updates.
+    td_elements = enphase_page.find_all('table')[2].find_all('td')
+    # the contents are bs4.NavigableString, converting them to plain str keeps the
+    # rest of the parse tree from being pickled back to the event loop process
+    return tuple(
+        str(td_elements[an_index].contents[0])
+        for an_index in (
+            EnphaseEnergyMonitor._LIFETIME_GENERATION,
+            EnphaseEnergyMonitor._CURRENTLY_GENERATING,
+            EnphaseEnergyMonitor._MICROINVERTER_TOTAL,
+            EnphaseEnergyMonitor._MICROINVERTERS_ONLINE,
+        )
+    )
+
+
 class EnphaseEnergyMonitor(WoTThing):
     required_config = Namespace()
     required_config.add_option(
@@ -80,23 +101,27 @@ class EnphaseEnergyMonitor(WoTThing):
         return float(number_as_str) * EnphaseEnergyMonitor._multiplicative_factor[units.strip()]
 
     async def get_enphase_data(self):
-        async with aiohttp.ClientSession() as session:
-            async with async_timeout.timeout(self.config.seconds_for_timeout):
-                async with session.get(self.config.target_url) as response:
-                    enphase_home_page_raw = await response.text()
-        enphase_page = BeautifulSoup(enphase_home_page_raw, 'html.parser')
-        # this is stupidly fragile - we're assuming this page format never
-        # changes from fetch to fetch - observation has shown this to be ok
-        # but don't know if that will hold over Enphase software updates.
-        td_elements = enphase_page.find_all('table')[2].find_all('td')
-        self.lifetime_generation = self._scale_based_on_units(
-            td_elements[self._LIFETIME_GENERATION].contents[0]
+        async with async_timeout.timeout(self.config.seconds_for_timeout):
+            async with self.http.get(self.config.target_url) as response:
+                enphase_home_page_raw = await response.text()
+        # parsing the page is CPU bound work that would stall every other Thing sharing
+        # the event loop, so it is done in another process
+        (
+            lifetime_generation,
+            generating_now,
+            microinverter_total,
+            microinverters_online
+        ) = await self.run_blocking(
+            parse_enphase_home_page,
+            enphase_home_page_raw,
+            executor=process_pool
         )
-        self.generating_now = self._scale_based_on_units(
-            td_elements[self._CURRENTLY_GENERATING].contents[0]
-        )
-        self.microinverter_total = td_elements[self._MICROINVERTER_TOTAL].contents[0]
-        self.microinverters_online = td_elements[self._MICROINVERTERS_ONLINE].contents[0]
+        # publish the four new values to the subscribers as one update
+        with self.batch_update():
+            self.lifetime_generation = self._scale_based_on_units(lifetime_generation)
+            self.generating_now = self._scale_based_on_units(generating_now)
+            self.microinverter_total = microinverter_total
+            self.microinverters_online = microinverters_online
         logging.debug(
             'new values fetched: %s, %s, %s, %s',
             self.lifetime_generation,
@@ -116,17 +141,24 @@ class EnphaseEnergyMonitor(WoTThing):
         name='generating_now',
         initial_value=0.0,
         description='currently generating in KWh',
+        value_source_fn=get_enphase_data,
+        # don't bother subscribers with changes of less than ten watts
+        deadband=0.01,
+        # keep the changes of the last few days for charting at /properties/generating_now/history
+        history_capacity=2000,
         units='KW'
     )
     microinverter_total = WoTThing.wot_property(
         name='microinverter_total',
         initial_value=0,
-        description='the number of microinverters installed'
+        description='the number of microinverters installed',
+        value_source_fn=get_enphase_data,
     )
     microinverters_online = WoTThing.wot_property(
         name='microinverters_online',
         initial_value=0,
         description='the number of micro inverters online',
+        value_source_fn=get_enphase_data,
     )
 
 
@@ -1,5 +1,4 @@
 #!/usr/bin/env python3
-import json
 import asyncio
 import aiohttp
 import async_timeout
@@ -20,6 +19,10 @@ from pywot import (
     logging_config,
     log_config
 )
+from pywot.http_client import HttpClient
+
+# all the tide lights share one pool of HTTP connections
+http_client = HttpClient()
 
 
 async def get_tide_table(config, last_tide_in_the_past=None):
@@ -27,11 +30,10 @@ async def get_tide_table(config, last_tide_in_the_past=None):
     logging.info('loading new tide table')
     while True:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with async_timeout.timeout(config.seconds_for_timeout):
-                    async with session.get(config.target_url) as response:
-                        raw_tide_data = json.loads(await response.text())
-                        break
+            async with async_timeout.timeout(config.seconds_for_timeout):
+                # lights configured for the same location share a single fetch
+                raw_tide_data = await http_client.get_json_cached(config.target_url)
+                break
         except Exception as e:
             logging.error('problem reading {}: {}'.format(config.target_url, e))
             logging.info('retrying after 20 second pause')
@@ -171,18 +173,17 @@ high_to_low_color_list = [
 async def change_bulb_color(config, a_color):
     while True:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with async_timeout.timeout(config.seconds_for_timeout):
-                    async with session.put(
-                        "http://gateway.local/things/{}/properties/color".format(config.thing_id),
-                        headers={
-                            'Accept': 'application/json',
-                            'Authorization': 'Bearer {}'.format(config.things_gateway_auth_key),
-                            'Content-Type': 'application/json'
-                        },
-                        data='{{"color": "{}"}}'.format(a_color)
-                    ) as response:
-                        return await response.text()
+            async with async_timeout.timeout(config.seconds_for_timeout):
+                async with http_client.put(
+                    "http://gateway.local/things/{}/properties/color".format(config.thing_id),
+                    headers={
+                        'Accept': 'application/json',
+                        'Authorization': 'Bearer {}'.format(config.things_gateway_auth_key),
+                        'Content-Type': 'application/json'
+                    },
+                    data='{{"color": "{}"}}'.format(a_color)
+                ) as response:
+                    return await response.text()
         except aiohttp.client_exceptions.ClientConnectorError as e:
             logging.error('problem contacting http:/gateway.local: {}'.format(e))
             logging.info('retrying after 20 second pause')
@@ -361,3 +362,4 @@ if __name__ == '__main__':
 
     event_loop = asyncio.get_event_loop()
     event_loop.run_until_complete(run_all_tide_lights(config))
+    event_loop.run_until_complete(http_client.close())
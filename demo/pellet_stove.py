@@ -86,17 +86,24 @@ class PelletStove(WoTThing):
         self._controller = config.controller_implementation_class()
         self.lingering_shutdown_task = None
 
-        self.logging_count = 0
-
-    async def get_thermostat_state(self):
-        previous_thermostat_state = self.thermostat_state
-        self.thermostat_state = self._controller.get_thermostat_state()
-        self.logging_count += 1
-        if self.logging_count % 300 == 0:
-            logging.debug('still monitoring thermostat')
-            self.logging_count = 0
-        if previous_thermostat_state != self.thermostat_state:
-            if self.thermostat_state:
+    async def watch_thermostat(self):
+        # the controller calls back when the thermostat changes, so the stove reacts within
+        # milliseconds rather than waiting for the next poll
+        thermostat_changes = self._controller.thermostat.changes()
+        try:
+            async for new_thermostat_state in thermostat_changes:
+                # the value stream assigns the new state to the property, just react to it here
+                await self.react_to_thermostat_state(
+                    self.thermostat_state, new_thermostat_state
+                )
+                yield new_thermostat_state
+        finally:
+            # stop the edge detection now rather than whenever the generator is collected
+            await thermostat_changes.aclose()
+
+    async def react_to_thermostat_state(self, previous_thermostat_state, new_thermostat_state):
+        if previous_thermostat_state != new_thermostat_state:
+            if new_thermostat_state:
                 logging.info('start heating')
                 await self.set_stove_mode_to_heating()
             else:
@@ -117,7 +124,7 @@ class PelletStove(WoTThing):
         name='thermostat_state',
         description='the on/off state of the thermostat',
         initial_value=False,
-        value_source_fn=get_thermostat_state,
+        value_stream_fn=watch_thermostat,
     )
     stove_state = WoTThing.wot_property(
         name='stove_state',
@@ -192,7 +199,6 @@ if __name__ == '__main__':
     required_config.server = Namespace()
     required_config.server.update(WoTServer.get_required_config())
     required_config.update(PelletStove.get_required_config())
-    required_config.seconds_between_polling.default = 1
     required_config.update(logging_config)
     config = configuration(required_config)
     logging.basicConfig(
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import logging
-from aiohttp import ClientSession
 from async_timeout import timeout
 from pywot import (
     WoTThing,
@@ -53,13 +52,12 @@ class RouterMonitor(WoTThing):
     async def is_the_router_ok(self):
         logging.debug('executing is_the_router_ok')
         try:
-            async with ClientSession() as session:
-                async with timeout(self.config.seconds_for_timeout):
-                    async with session.get(self.config.target_url) as response:
-                        # we're just awaitng a response before a timeout
-                        # we don't really care what the response is
-                        await response.text()
-                        return True
+            async with timeout(self.config.seconds_for_timeout):
+                async with self.http.get(self.config.target_url) as response:
+                    # we're just awaitng a response before a timeout
+                    # we don't really care what the response is
+                    await response.text()
+                    return True
         except CancelledError as e:
             logging.debug('is_the_router_ok shutdown')
             raise e
@@ -83,7 +81,9 @@ class RouterMonitor(WoTThing):
         name="router_ok",
         initial_value=True,
         description="boolean value indication the state of the router",
-        value_source_fn=is_router_ok_polling_task
+        value_source_fn=is_router_ok_polling_task,
+        # a poll that finds the router down sleeps through its power cycle, minutes long
+        polling_timeout=None
     )
 
 
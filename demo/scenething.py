@@ -19,6 +19,7 @@ import websockets
 
 from pywot import (
     WoTThing,
+    SERIALIZE,
     logging_config,
     log_config
 )
@@ -32,18 +33,20 @@ ON = True
 OFF = False
 
 
-def scene_on_off(thing_instance, on_off):
+# these value forwarders are coroutines.  pywot runs them one at a time in the order that the
+# values arrive, so rapid toggling can't start a scene while the previous one is still running
+async def scene_on_off(thing_instance, on_off):
     if on_off is ON:
-        asyncio.ensure_future(thing_instance.turn_on_participants())
+        await thing_instance.turn_on_participants()
     else:
-        asyncio.ensure_future(thing_instance.restore_participants())
+        await thing_instance.restore_participants()
 
 
-def learn_on_off(thing_instance, on_off):
+async def learn_on_off(thing_instance, on_off):
     if on_off is ON:
-        asyncio.ensure_future(thing_instance.learn_changes())
+        await thing_instance.learn_changes()
     else:
-        asyncio.ensure_future(thing_instance.stop_learning())
+        await thing_instance.stop_learning()
 
 
 class SceneThing(WoTThing):
@@ -90,29 +93,29 @@ class SceneThing(WoTThing):
         initial_value=False,
         description='on/off status',
         value_forwarder=scene_on_off,
-
+        forwarder_policy=SERIALIZE,
     )
     learn = WoTThing.wot_property(
         name='learn',
         initial_value=False,
         description='learn mode',
         value_forwarder=learn_on_off,
+        forwarder_policy=SERIALIZE,
     )
 
     async def get_all_things(self):
-        async with aiohttp.ClientSession() as session:
-            async with async_timeout.timeout(self.config.seconds_for_timeout):
-                async with session.get(
-                    self.config.all_things_url,
-                    headers={
-                        'Accept': 'application/json',
-                        'Authorization': 'Bearer {}'.format(self.config.things_gateway_auth_key),
-                        'Content-Type': 'application/json'
-                    }
-                ) as response:
-                    all_things = json.loads(await response.text())
-                    print(json.dumps(all_things))
-                    return all_things
+        async with async_timeout.timeout(self.config.seconds_for_timeout):
+            async with self.http.get(
+                self.config.all_things_url,
+                headers={
+                    'Accept': 'application/json',
+                    'Authorization': 'Bearer {}'.format(self.config.things_gateway_auth_key),
+                    'Content-Type': 'application/json'
+                }
+            ) as response:
+                all_things = json.loads(await response.text())
+                print(json.dumps(all_things))
+                return all_things
 
     @staticmethod
     def quote_strings(a_value):
@@ -123,34 +126,33 @@ class SceneThing(WoTThing):
     async def change_property(self, a_thing_id, a_property, a_value):
         while True:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with async_timeout.timeout(self.config.seconds_for_timeout):
-                        async with session.put(
-                            "http://gateway.local/things/{}/properties/{}/".format(
-                                a_thing_id,
-                                a_property
+                async with async_timeout.timeout(self.config.seconds_for_timeout):
+                    async with self.http.put(
+                        "http://gateway.local/things/{}/properties/{}/".format(
+                            a_thing_id,
+                            a_property
+                        ),
+                        headers={
+                            'Accept': 'application/json',
+                            'Authorization': 'Bearer {}'.format(
+                                self.config.things_gateway_auth_key
                             ),
-                            headers={
-                                'Accept': 'application/json',
-                                'Authorization': 'Bearer {}'.format(
-                                    self.config.things_gateway_auth_key
-                                ),
-                                'Content-Type': 'application/json'
-                            },
-                            data='{{"{}": {}}}'.format(
+                            'Content-Type': 'application/json'
+                        },
+                        data='{{"{}": {}}}'.format(
+                            a_property,
+                            str(self.quote_strings(a_value)).lower()
+                        )
+                    ) as response:
+                        logging.debug(
+                            'change_property: sent %s to %s',
+                            '{{"{}": {}}}'.format(
                                 a_property,
                                 str(self.quote_strings(a_value)).lower()
-                            )
-                        ) as response:
-                            logging.debug(
-                                'change_property: sent %s to %s',
-                                '{{"{}": {}}}'.format(
-                                    a_property,
-                                    str(self.quote_strings(a_value)).lower()
-                                ),
-                                a_thing_id
-                            )
-                            return await response.text()
+                            ),
+                            a_thing_id
+                        )
+                        return await response.text()
             except aiohttp.client_exceptions.ClientConnectorError as e:
                 logging.error(
                     'change_property: problem contacting http:/gateway.local: {}'.format(e)
@@ -216,19 +218,18 @@ class SceneThing(WoTThing):
             # as of 0.4, the 'properties' resource has not been implemented in the Things API
             # this means that rather than fetching all the properties for a thing in one call
             # we've got to do it one property at a time.
-            async with aiohttp.ClientSession() as session:
-                async with async_timeout.timeout(self.config.seconds_for_timeout):
-                    logging.debug(self.config.thing_state_url_template.format(a_thing_id, a_property))
-                    async with session.get(
-                        self.config.thing_state_url_template.format(a_thing_id, a_property),
-                        headers={
-                            'Accept': 'application/json',
-                            'Authorization': 'Bearer {}'.format(self.config.things_gateway_auth_key),
-                            'Content-Type': 'application/json'
-                        }
-                    ) as response:
-                        state_snapshot = json.loads(await response.text())
-                        self.preserved_state[a_thing_id].update(state_snapshot)
+            async with async_timeout.timeout(self.config.seconds_for_timeout):
+                logging.debug(self.config.thing_state_url_template.format(a_thing_id, a_property))
+                async with self.http.get(
+                    self.config.thing_state_url_template.format(a_thing_id, a_property),
+                    headers={
+                        'Accept': 'application/json',
+                        'Authorization': 'Bearer {}'.format(self.config.things_gateway_auth_key),
+                        'Content-Type': 'application/json'
+                    }
+                ) as response:
+                    state_snapshot = json.loads(await response.text())
+                    self.preserved_state[a_thing_id].update(state_snapshot)
 
     async def turn_on_participants(self):
         if self.learn == ON:
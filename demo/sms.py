@@ -54,13 +54,21 @@ class TwilioSMS(WoTThing):
             "a gateway for sending SMS"
         )
 
-    def set_to_number(self, to_number):
-        self.send_twilio_sms(to_number, None)
+    async def set_to_number(self, to_number):
+        await self.send_twilio_sms(to_number, None)
 
-    def set_message(self, message):
-        self.send_twilio_sms(None, message)
+    async def set_message(self, message):
+        await self.send_twilio_sms(None, message)
 
-    def send_twilio_sms(self, to_number, message):
+    def create_twilio_message(self, body, to_number):
+        client = Client(self.config.twilio_account_sid, self.config.twilio_auth_token)
+        return client.messages.create(
+            body=body,
+            from_=self.config.from_number,
+            to=to_number
+        )
+
+    async def send_twilio_sms(self, to_number, message):
 #         logging.debug('args %s, kwargs: %s', args, kwargs)
         if to_number is not None:
             self.to_number = to_number
@@ -70,12 +78,8 @@ class TwilioSMS(WoTThing):
             logging.debug('NOT READY: to_number: %s, message: %s', self.to_number, self.message)
             return
         logging.debug('sending SMS')
-        client = Client(self.config.twilio_account_sid, self.config.twilio_auth_token)
-        message = client.messages.create(
-            body=self.message,
-            from_=self.config.from_number,
-            to=self.to_number
-        )
+        # the Twilio client makes a synchronous HTTP request, run it away from the event loop
+        await self.run_blocking(self.create_twilio_message, self.message, self.to_number)
         self.to_number = None
         self.message = None
 
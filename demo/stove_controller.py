@@ -1,5 +1,7 @@
 import RPi.GPIO as GPIO
 
+from pywot.gpio import EdgeInput, RPiGPIOBackend
+
 WHITE = 17
 ORANGE = 22
 BLUE = 23
@@ -14,7 +16,9 @@ class StoveControllerImplementation:
         GPIO.setup(WHITE, GPIO.OUT)
         GPIO.setup(ORANGE, GPIO.OUT)
         GPIO.setup(BLUE, GPIO.OUT)
-        GPIO.setup(THERMOSTAT, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        # the thermostat closes its contact to call for heat, pulling the pin low.  Rather than
+        # polling it, the pin is watched for edges.
+        self.thermostat = EdgeInput(RPiGPIOBackend(), THERMOSTAT, pull_up=True, inverted=True)
         self.set_off()
 
     def set_on_high(self):
@@ -39,8 +43,3 @@ class StoveControllerImplementation:
 
     def shutdown(self):
         GPIO.cleanup()
-
-    def get_thermostat_state(self):
-        return not GPIO.input(THERMOSTAT)
-
-
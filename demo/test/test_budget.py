@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import asyncio
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import patch
+
+from pywot import WoTThing
+from pywot.budget import PollingBudget
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+
+class Clock:
+    """a wall clock moved by hand"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class PollingBudgetTest(TestCase):
+    def setUp(self):
+        # a quarter of the way into an hour long period
+        self.clock = Clock(1000 * 3600 + 900)
+        patcher = patch('pywot.budget.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_draw_until_exhausted(self):
+        budget = PollingBudget('upstream', 10, seconds_per_period=3600, reserved_requests=2)
+        self.assertEqual(budget.period_start, 1000 * 3600)
+        self.assertEqual([budget.draw() for _ in range(9)], [True] * 8 + [False])
+        self.assertEqual(budget.requests_used, 8)
+        self.assertEqual(budget.requests_remaining, 0)
+        # an exhausted budget waits out the period
+        self.assertEqual(budget.seconds_between_polls(), 2700)
+
+    def test_a_new_period_renews_the_quota(self):
+        budget = PollingBudget('upstream', 3, seconds_per_period=3600)
+        for _ in range(3):
+            budget.draw()
+        self.assertFalse(budget.draw())
+        self.clock.now += 2700
+        self.assertTrue(budget.draw())
+        self.assertEqual(budget.requests_used, 1)
+        self.assertEqual(budget.period_start, 1001 * 3600)
+
+    def test_the_wait_is_shared_among_the_consumers(self):
+        budget = PollingBudget('upstream', 100, seconds_per_period=3600)
+        self.assertEqual(budget.seconds_between_polls(), 27)
+        consumers = [PollingConsumer() for _ in range(3)]
+        for a_consumer in consumers:
+            budget.add_consumer(a_consumer)
+        self.assertEqual(budget.seconds_between_polls(), 81)
+        # the wait grows as the quota is used up
+        for _ in range(50):
+            budget.draw()
+        self.assertEqual(budget.seconds_between_polls(), 162)
+        # those no longer polling drop out
+        del consumers[1:], a_consumer
+        self.assertEqual(budget.seconds_between_polls(), 54)
+
+    def test_projected_exhaustion(self):
+        budget = PollingBudget('upstream', 100, seconds_per_period=3600)
+        self.assertIsNone(budget.projected_exhaustion())
+        # 10 requests in 900 seconds would last the period
+        for _ in range(10):
+            budget.draw()
+        self.assertIsNone(budget.projected_exhaustion())
+        # 50 requests in 900 seconds exhaust the quota 900 seconds from now
+        for _ in range(40):
+            budget.draw()
+        self.assertEqual(budget.projected_exhaustion(), 900)
+        self.assertEqual(budget.stats()["seconds_until_exhausted"], 900)
+
+
+class PollingConsumer:
+    """stands in for a PollingEntry, which a budget holds weakly"""
+
+
+class QuotaLimitedThing(WoTThing):
+    budget = PollingBudget('upstream', 2, seconds_per_period=3600)
+
+    def __init__(self, config):
+        super(QuotaLimitedThing, self).__init__(config, "limited", "thing", "a thing to poll")
+        self.number_of_polls = 0
+
+    async def fetch(self):
+        self.number_of_polls += 1
+
+    reading = WoTThing.wot_property(
+        name='reading',
+        description='fetched from a rate limited upstream',
+        initial_value=0,
+        value_source_fn=fetch,
+        polling_budget=budget,
+    )
+
+
+class BudgetedPollingTest(TestCase):
+    def test_polls_beyond_the_quota_are_skipped(self):
+        thing = QuotaLimitedThing(DotDict({
+            "seconds_between_polling": 300,
+            "seconds_for_polling_timeout": 10,
+            "polling_failures_before_backoff": 3,
+            "maximum_seconds_of_polling_backoff": 3600,
+            "poll_on_demand": False,
+        }))
+        polling_entry, = thing.polling_entries
+
+        async def scenario():
+            for _ in range(3):
+                await polling_entry.poll()
+
+        asyncio.get_event_loop().run_until_complete(scenario())
+        self.assertEqual(thing.number_of_polls, 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import asyncio
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot.cache import SingleFlightCache
+
+
+class Upstream:
+    """a slow source that counts how often it is fetched from"""
+
+    def __init__(self):
+        self.number_of_fetches = 0
+        self.failing = False
+
+    async def fetch(self, a_key):
+        self.number_of_fetches += 1
+        await asyncio.sleep(0.01)
+        if self.failing:
+            raise ConnectionError("the upstream is down")
+        return f"{a_key} #{self.number_of_fetches}"
+
+
+class SingleFlightCacheTest(TestCase):
+    def setUp(self):
+        self.eventloop = asyncio.get_event_loop()
+        self.upstream = Upstream()
+
+    def test_concurrent_requests_share_one_fetch(self):
+        cache = SingleFlightCache()
+
+        async def scenario():
+            return await asyncio.gather(
+                *(cache.get('tides', self.upstream.fetch, 'tides') for _ in range(5))
+            )
+
+        results = self.eventloop.run_until_complete(scenario())
+        self.assertEqual(results, ['tides #1'] * 5)
+        self.assertEqual(self.upstream.number_of_fetches, 1)
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["joins"], stats["in_flight"]), (1, 4, 0))
+
+    def test_a_fresh_result_is_served_from_the_cache(self):
+        cache = SingleFlightCache(seconds_to_live=0.05)
+
+        async def scenario():
+            first = await cache.get('tides', self.upstream.fetch, 'tides')
+            second = await cache.get('tides', self.upstream.fetch, 'tides')
+            await asyncio.sleep(0.06)
+            # expired, so fetched again
+            third = await cache.get('tides', self.upstream.fetch, 'tides')
+            return first, second, third
+
+        results = self.eventloop.run_until_complete(scenario())
+        self.assertEqual(results, ('tides #1', 'tides #1', 'tides #2'))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_failures_are_not_cached(self):
+        cache = SingleFlightCache()
+        self.upstream.failing = True
+        with self.assertRaises(ConnectionError):
+            self.eventloop.run_until_complete(cache.get('tides', self.upstream.fetch, 'tides'))
+        self.assertEqual(len(cache), 0)
+
+        self.upstream.failing = False
+        result = self.eventloop.run_until_complete(cache.get('tides', self.upstream.fetch, 'tides'))
+        self.assertEqual(result, 'tides #2')
+
+    def test_a_requester_giving_up_does_not_cancel_the_fetch(self):
+        cache = SingleFlightCache()
+
+        async def scenario():
+            impatient = asyncio.ensure_future(cache.get('tides', self.upstream.fetch, 'tides'))
+            patient = asyncio.ensure_future(cache.get('tides', self.upstream.fetch, 'tides'))
+            await asyncio.sleep(0)
+            impatient.cancel()
+            return await patient
+
+        self.assertEqual(self.eventloop.run_until_complete(scenario()), 'tides #1')
+        self.assertEqual(self.upstream.number_of_fetches, 1)
+
+    def test_the_least_recently_used_are_evicted(self):
+        cache = SingleFlightCache(maximum_entries=2)
+
+        async def scenario():
+            for a_key in ('tides', 'weather', 'tides', 'moon'):
+                await cache.get(a_key, self.upstream.fetch, a_key)
+
+        self.eventloop.run_until_complete(scenario())
+        self.assertEqual(list(cache._entries), ['tides', 'moon'])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        cache.invalidate('tides')
+        self.assertEqual(list(cache._entries), ['moon'])
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+)
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        self.circuit_breaker = CircuitBreaker(
+            'tide station', failure_threshold=3, maximum_seconds_open=1000
+        )
+
+    def test_failures_below_the_threshold_keep_it_closed(self):
+        self.assertTrue(self.circuit_breaker.record_failure(60))
+        self.assertTrue(self.circuit_breaker.record_failure(60))
+        self.assertEqual(self.circuit_breaker.state, CLOSED)
+        self.assertEqual(self.circuit_breaker.seconds_until_probe(), 0)
+
+    def test_the_threshold_opens_it(self):
+        for _ in range(2):
+            self.circuit_breaker.record_failure(60)
+        # the failure that opens the circuit is worth logging
+        self.assertTrue(self.circuit_breaker.record_failure(60))
+        self.assertEqual(self.circuit_breaker.state, OPEN)
+        self.assertFalse(self.circuit_breaker.is_closed)
+        self.assertEqual(self.circuit_breaker.seconds_open, 120)
+
+    def test_asking_for_the_next_probe_makes_it_half_open(self):
+        for _ in range(3):
+            self.circuit_breaker.record_failure(60)
+        self.assertEqual(self.circuit_breaker.seconds_until_probe(), 120)
+        self.assertEqual(self.circuit_breaker.state, HALF_OPEN)
+
+    def test_a_failed_probe_reopens_it_for_longer(self):
+        for _ in range(3):
+            self.circuit_breaker.record_failure(60)
+        waits = []
+        for _ in range(4):
+            waits.append(self.circuit_breaker.seconds_until_probe())
+            # the failures of probes are not worth logging
+            self.assertFalse(self.circuit_breaker.record_failure(60))
+            self.assertEqual(self.circuit_breaker.state, OPEN)
+        # doubling each time, up to the maximum
+        self.assertEqual(waits, [120, 240, 480, 960])
+        self.assertEqual(self.circuit_breaker.seconds_until_probe(), 1000)
+
+    def test_a_successful_probe_closes_it(self):
+        for _ in range(3):
+            self.circuit_breaker.record_failure(60)
+        self.circuit_breaker.seconds_until_probe()
+        self.circuit_breaker.record_success()
+        self.assertEqual(self.circuit_breaker.state, CLOSED)
+        self.assertEqual(self.circuit_breaker.number_of_consecutive_failures, 0)
+        self.assertEqual(self.circuit_breaker.seconds_until_probe(), 0)
+        # it takes the full threshold of failures to open it again
+        self.assertTrue(self.circuit_breaker.record_failure(60))
+        self.assertEqual(self.circuit_breaker.state, CLOSED)
+
+    def test_a_long_outage_stays_finite(self):
+        for _ in range(100):
+            self.circuit_breaker.record_failure(60)
+        self.assertEqual(self.circuit_breaker.seconds_open, 1000)
+
+
+if __name__ == '__main__':
+    main()
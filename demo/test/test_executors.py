@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot import metrics
+from pywot.executors import ManagedExecutor
+
+
+class ManagedExecutorTest(TestCase):
+    def setUp(self):
+        self.eventloop = asyncio.get_event_loop()
+        self.executor = ManagedExecutor(f"test {self.id()}", ThreadPoolExecutor, 1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def _fail(self):
+        raise ValueError("the upstream is down")
+
+    def test_outcomes_are_counted(self):
+        released = threading.Event()
+
+        async def scenario():
+            self.assertEqual(await self.executor.run(sum, (1, 2, 3)), 6)
+            with self.assertRaises(ValueError):
+                await self.executor.run(self._fail)
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.executor.run(released.wait, timeout=0.01)
+            # abandoned, but its thread is still busy
+            self.assertEqual(self.executor.number_in_flight, 1)
+
+            a_call = asyncio.ensure_future(self.executor.run(sum, (4, 5)))
+            await asyncio.sleep(0.01)
+            a_call.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await a_call
+
+            released.set()
+            while self.executor.number_in_flight:
+                await asyncio.sleep(0.005)
+
+        self.eventloop.run_until_complete(scenario())
+        stats = self.executor.stats()
+        self.assertEqual(stats["submitted"], 4)
+        self.assertEqual(stats["succeeded"], 1)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["timed_out"], 1)
+        self.assertEqual(stats["cancelled"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["maximum_queue_depth"], 1)
+
+    def test_stats_are_served_as_gauges(self):
+        self.eventloop.run_until_complete(self.executor.run(sum, (1, 2)))
+        while self.executor.number_in_flight:
+            self.eventloop.run_until_complete(asyncio.sleep(0.005))
+        rendered = metrics.registry.render()
+        self.assertIn("# TYPE pywot_executor_succeeded gauge", rendered)
+        self.assertIn(f'pywot_executor_succeeded{{executor="{self.executor.name}"}} 1', rendered)
+        self.assertIn(f'pywot_executor_in_flight{{executor="{self.executor.name}"}} 0', rendered)
+
+
+if __name__ == '__main__':
+    main()
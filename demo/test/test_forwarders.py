@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import asyncio
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot import WoTThing
+from pywot.forwarders import (
+    CANCEL_PREVIOUS,
+    PARALLEL,
+    SERIALIZE,
+)
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+
+class Dimmer(WoTThing):
+    def __init__(self, config):
+        super(Dimmer, self).__init__(config, "dimmer", "thing", "a slow to answer dimmer")
+        self.events = []
+
+    async def _forward(self, new_value):
+        self.events.append(('start', new_value))
+        try:
+            await asyncio.sleep(0.02)
+        except asyncio.CancelledError:
+            self.events.append(('cancel', new_value))
+            raise
+        self.events.append(('end', new_value))
+
+    async def set_level(self, new_value):
+        await self._forward(new_value)
+
+    async def set_color(self, new_value):
+        await self._forward(new_value)
+
+    async def set_fade(self, new_value):
+        await self._forward(new_value)
+
+    level = WoTThing.wot_property(
+        name='level',
+        description='forwarded in the order written',
+        initial_value=0,
+        value_forwarder=set_level,
+        forwarder_policy=SERIALIZE,
+    )
+    color = WoTThing.wot_property(
+        name='color',
+        description='only the latest color matters',
+        initial_value=0,
+        value_forwarder=set_color,
+        forwarder_policy=CANCEL_PREVIOUS,
+    )
+    fade = WoTThing.wot_property(
+        name='fade',
+        description='forwarded two at a time',
+        initial_value=0,
+        value_forwarder=set_fade,
+        forwarder_policy=PARALLEL,
+        maximum_parallel_forwards=2,
+    )
+
+
+class ForwarderPolicyTest(TestCase):
+    def setUp(self):
+        self.eventloop = asyncio.get_event_loop()
+        self.dimmer = Dimmer(DotDict({"poll_on_demand": False, "maximum_concurrent_forwards": 4}))
+
+    def _write(self, property_name, new_value):
+        # as the Things Gateway does, through the webthing.Value of the property
+        self.dimmer.properties[property_name].set_value(new_value)
+
+    async def _wait_for_forwards(self, property_name):
+        forwarder = self.dimmer.properties[property_name].value.value_forwarder
+        while forwarder.running_tasks or forwarder.pending_values:
+            await asyncio.sleep(0.005)
+
+    def test_serialize(self):
+        async def scenario():
+            for a_level in (1, 2, 3):
+                self._write('level', a_level)
+            await self._wait_for_forwards('level')
+
+        self.eventloop.run_until_complete(scenario())
+        self.assertEqual(
+            self.dimmer.events,
+            [('start', 1), ('end', 1), ('start', 2), ('end', 2), ('start', 3), ('end', 3)],
+        )
+
+    def test_cancel_previous(self):
+        async def scenario():
+            self._write('color', 1)
+            await asyncio.sleep(0.005)
+            # cancels the forward of 1 in progress
+            self._write('color', 2)
+            # 3 replaces 2, which has not started yet, and 4 replaces 3
+            await asyncio.sleep(0)
+            self._write('color', 3)
+            self._write('color', 4)
+            await self._wait_for_forwards('color')
+
+        self.eventloop.run_until_complete(scenario())
+        self.assertEqual(
+            self.dimmer.events, [('start', 1), ('cancel', 1), ('start', 4), ('end', 4)]
+        )
+
+    def test_parallel(self):
+        async def scenario():
+            for a_fade in (1, 2, 3, 4):
+                self._write('fade', a_fade)
+            await self._wait_for_forwards('fade')
+
+        self.eventloop.run_until_complete(scenario())
+        self.assertEqual(
+            self.dimmer.events,
+            [
+                ('start', 1), ('start', 2), ('end', 1), ('end', 2),
+                ('start', 3), ('start', 4), ('end', 3), ('end', 4),
+            ],
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+from contextlib import nullcontext
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import patch
+
+from pywot import WoTThing
+from pywot.history import PropertyHistory
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+
+class Thermometer(WoTThing):
+    def __init__(self, config):
+        super(Thermometer, self).__init__(config, "thermometer", "thing", "a charted thermometer")
+
+    temperature = WoTThing.wot_property(
+        name='temperature',
+        description='kept for charting',
+        initial_value=20.0,
+        history_capacity=3,
+    )
+    heating = WoTThing.wot_property(
+        name='heating',
+        description='kept as 0 and 1',
+        initial_value=False,
+        history_capacity=3,
+    )
+
+
+class PropertyHistoryTest(TestCase):
+    def _filled_history(self, capacity, number_of_values):
+        history = PropertyHistory(capacity)
+        for i in range(number_of_values):
+            history.append(float(i), timestamp=100.0 + i)
+        return history
+
+    def _as_lists(self, timestamps_and_values):
+        timestamps, values = timestamps_and_values
+        return [float(t) for t in timestamps], [float(v) for v in values]
+
+    def test_a_partly_filled_ring(self):
+        history = self._filled_history(5, 3)
+        self.assertEqual(len(history), 3)
+        self.assertEqual(self._as_lists(history.range()), ([100, 101, 102], [0, 1, 2]))
+
+    def test_a_full_ring_keeps_the_most_recent(self):
+        history = self._filled_history(4, 10)
+        self.assertEqual(len(history), 4)
+        self.assertEqual(
+            self._as_lists(history.range()), ([106, 107, 108, 109], [6, 7, 8, 9])
+        )
+
+    def test_range_is_inclusive(self):
+        for a_numpy in (None, 'installed'):
+            with self.subTest(numpy=a_numpy), self._numpy(a_numpy):
+                history = self._filled_history(4, 10)
+                self.assertEqual(self._as_lists(history.range(107, 108)), ([107, 108], [7, 8]))
+                self.assertEqual(self._as_lists(history.range(start=108.5)), ([109], [9]))
+                self.assertEqual(self._as_lists(history.range(end=106)), ([106], [6]))
+                self.assertEqual(self._as_lists(history.range(200, 300)), ([], []))
+
+    def test_downsample(self):
+        for a_numpy in (None, 'installed'):
+            with self.subTest(numpy=a_numpy), self._numpy(a_numpy):
+                history = self._filled_history(10, 10)
+                self.assertEqual(
+                    history.downsample(3, start=100, end=109),
+                    [
+                        (100.0, 3, 0.0, 2.0, 1.0),
+                        (103.0, 3, 3.0, 5.0, 4.0),
+                        # the end of the range falls in the last bucket
+                        (106.0, 4, 6.0, 9.0, 7.5),
+                    ],
+                )
+                # the buckets without values are left out
+                self.assertEqual(
+                    history.downsample(3, start=94, end=109),
+                    [(99.0, 4, 0.0, 3.0, 1.5), (104.0, 6, 4.0, 9.0, 6.5)],
+                )
+                self.assertEqual(history.downsample(3, start=200, end=300), [])
+
+    def _numpy(self, a_numpy):
+        if a_numpy is None:
+            return patch('pywot.history.numpy', None)
+        # NumPy as it is, if it is installed
+        return nullcontext()
+
+    def test_a_thing_records_its_numeric_properties(self):
+        thermometer = Thermometer(DotDict({"poll_on_demand": False}))
+        for a_temperature in (21.0, 22.0, 23.0, 24.0):
+            thermometer.temperature = a_temperature
+        thermometer.heating = True
+        self.assertEqual(
+            self._as_lists(thermometer.histories['temperature'].range())[1], [22, 23, 24]
+        )
+        self.assertEqual(self._as_lists(thermometer.histories['heating'].range())[1], [1.0])
+
+
+if __name__ == '__main__':
+    main()
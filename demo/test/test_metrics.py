@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot import WoTThing
+from pywot import metrics
+from pywot.metrics import MetricsRegistry
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+
+class Lamp(WoTThing):
+    def __init__(self, config):
+        super(Lamp, self).__init__(config, "metered lamp", "thing", "a lamp to count")
+
+    brightness = WoTThing.wot_property(
+        name='brightness',
+        description='from 0 to 100',
+        initial_value=0,
+    )
+
+
+class MetricsFormatTest(TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        polls = self.registry.counter("polls_total", "polls by outcome", ("thing", "outcome"))
+        polls.increment("tides", "success")
+        polls.increment("tides", "success")
+        polls.increment("tides", "error", amount=3)
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP polls_total polls by outcome\n"
+            "# TYPE polls_total counter\n"
+            'polls_total{thing="tides",outcome="error"} 3\n'
+            'polls_total{thing="tides",outcome="success"} 2\n',
+        )
+
+    def test_gauge(self):
+        remaining = self.registry.gauge("remaining", "what is left")
+        remaining.set(0.5)
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP remaining what is left\n# TYPE remaining gauge\nremaining 0.5\n",
+        )
+        # whole numbers without a fraction, and infinity as Prometheus spells it
+        remaining.set(12.0)
+        self.assertTrue(self.registry.render().endswith("\nremaining 12\n"))
+        remaining.set(float("inf"))
+        self.assertTrue(self.registry.render().endswith("\nremaining +Inf\n"))
+
+    def test_histogram(self):
+        seconds = self.registry.histogram("seconds", "durations", ("thing",), buckets=(0.1, 1.0))
+        for a_duration in (0.05, 0.1, 0.5, 2.0):
+            seconds.observe(a_duration, "tides")
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP seconds durations\n"
+            "# TYPE seconds histogram\n"
+            # the buckets are cumulative, and a bound counts the values equal to it
+            'seconds_bucket{thing="tides",le="0.1"} 2\n'
+            'seconds_bucket{thing="tides",le="1"} 3\n'
+            'seconds_bucket{thing="tides",le="+Inf"} 4\n'
+            'seconds_sum{thing="tides"} 2.65\n'
+            'seconds_count{thing="tides"} 4\n',
+        )
+
+    def test_escaping(self):
+        a_counter = self.registry.counter(
+            "escaped_total", 'a "quoted" help\\text\nover two lines', ("name",)
+        )
+        a_counter.increment('a "quoted"\\name\n')
+        self.assertEqual(
+            self.registry.render().splitlines(),
+            [
+                '# HELP escaped_total a "quoted" help\\\\text\\nover two lines',
+                "# TYPE escaped_total counter",
+                'escaped_total{name="a \\"quoted\\"\\\\name\\n"} 1',
+            ],
+        )
+
+    def test_names_are_unique(self):
+        self.registry.counter("polls_total", "polls")
+        with self.assertRaises(ValueError):
+            self.registry.gauge("polls_total", "polls again")
+
+    def test_assignments_are_counted(self):
+        lamp = Lamp(DotDict({"poll_on_demand": False}))
+        lamp.brightness = 50
+        lamp.brightness = 50
+        rendered = metrics.registry.render()
+        self.assertIn(
+            'pywot_property_sets_total{thing="metered lamp",property="brightness"} 2', rendered
+        )
+        self.assertIn(
+            'pywot_notifications_sent_total{thing="metered lamp",property="brightness"} 1', rendered
+        )
+        self.assertIn(
+            'pywot_notifications_suppressed_total{thing="metered lamp",property="brightness",'
+            'reason="unchanged"} 1',
+            rendered,
+        )
+        self.assertIn(
+            'pywot_property_set_seconds_count{thing="metered lamp",property="brightness"} 2',
+            rendered,
+        )
+
+
+if __name__ == '__main__':
+    main()
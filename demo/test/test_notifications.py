@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot import WoTThing
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+
+class FakeSubscriber:
+    """a websocket client that keeps the messages sent to it"""
+
+    def __init__(self):
+        self.messages = []
+
+    def write_message(self, message):
+        self.messages.append(json.loads(message))
+
+    def update_property(self, a_property):
+        # as webthing's ThingHandler does, since webthing.Thing no longer writes the message
+        self.write_message(
+            json.dumps(
+                {
+                    "messageType": "propertyStatus",
+                    "data": {a_property.name: a_property.get_value()},
+                }
+            )
+        )
+
+
+class WeatherStation(WoTThing):
+    def __init__(self, config):
+        super(WeatherStation, self).__init__(config, "weather", "thing", "a weather station")
+
+    temperature = WoTThing.wot_property(
+        name='temperature',
+        description='the air temperature',
+        initial_value=20.0,
+    )
+    pressure = WoTThing.wot_property(
+        name='pressure',
+        description='the air pressure',
+        initial_value=1013.0,
+    )
+    conditions = WoTThing.wot_property(
+        name='conditions',
+        description='the sky',
+        initial_value='clear',
+    )
+    wind_speed = WoTThing.wot_property(
+        name='wind_speed',
+        description='the wind speed, gusty enough to be rate limited',
+        initial_value=0.0,
+        min_interval=0.05,
+    )
+
+
+class BatchUpdateTest(TestCase):
+    def setUp(self):
+        self.station = WeatherStation(DotDict({"poll_on_demand": False}))
+        self.subscriber = FakeSubscriber()
+        self.station.subscribers.add(self.subscriber)
+
+    def test_a_batch_is_one_message(self):
+        with self.station.batch_update():
+            self.station.temperature = 21.0
+            self.station.pressure = 1009.0
+            # reads see the new values before the batch ends
+            self.assertEqual(self.station.temperature, 21.0)
+            self.assertEqual(self.subscriber.messages, [])
+        self.assertEqual(
+            self.subscriber.messages,
+            [
+                {
+                    "messageType": "propertyStatus",
+                    "data": {"temperature": 21.0, "pressure": 1009.0},
+                }
+            ],
+        )
+
+    def test_a_batch_leaves_out_the_unchanged(self):
+        self.station.update_properties(
+            {"temperature": 20.0, "pressure": 1009.0, "conditions": 'cloudy'}
+        )
+        self.assertEqual(len(self.subscriber.messages), 1)
+        self.assertEqual(
+            self.subscriber.messages[0]["data"], {"pressure": 1009.0, "conditions": 'cloudy'}
+        )
+
+    def test_a_property_changed_twice_in_a_batch_is_sent_once(self):
+        with self.station.batch_update():
+            self.station.temperature = 21.0
+            self.station.temperature = 22.0
+        self.assertEqual(self.subscriber.messages[0]["data"], {"temperature": 22.0})
+
+    def test_a_nested_batch_is_published_by_the_outer_one(self):
+        with self.station.batch_update():
+            self.station.temperature = 21.0
+            with self.station.batch_update():
+                self.station.conditions = 'rain'
+            self.assertEqual(self.subscriber.messages, [])
+            self.station.pressure = 1000.0
+        self.assertEqual(len(self.subscriber.messages), 1)
+        self.assertEqual(
+            self.subscriber.messages[0]["data"],
+            {"temperature": 21.0, "conditions": 'rain', "pressure": 1000.0},
+        )
+
+    def test_an_empty_batch_sends_nothing(self):
+        with self.station.batch_update():
+            self.station.temperature = 20.0
+        self.assertEqual(self.subscriber.messages, [])
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        self.eventloop = asyncio.get_event_loop()
+        self.station = WeatherStation(DotDict({"poll_on_demand": False}))
+        self.subscriber = FakeSubscriber()
+        self.station.subscribers.add(self.subscriber)
+
+    def _wind_speeds_sent(self):
+        return [
+            a_message["data"]["wind_speed"]
+            for a_message in self.subscriber.messages
+            if "wind_speed" in a_message["data"]
+        ]
+
+    def test_the_trailing_notification_carries_the_latest_value(self):
+        async def scenario():
+            # the leading edge goes out at once
+            self.station.wind_speed = 1.0
+            self.assertEqual(self._wind_speeds_sent(), [1.0])
+            # those within the interval are conflated, but readers see them at once
+            for a_wind_speed in (2.0, 3.0, 4.0):
+                self.station.wind_speed = a_wind_speed
+            self.assertEqual(self.station.wind_speed, 4.0)
+            self.assertEqual(self._wind_speeds_sent(), [1.0])
+            await asyncio.sleep(0.1)
+            self.assertEqual(self._wind_speeds_sent(), [1.0, 4.0])
+            # once the interval has passed, the next value goes out at once again
+            await asyncio.sleep(0.06)
+            self.station.wind_speed = 5.0
+            self.assertEqual(self._wind_speeds_sent(), [1.0, 4.0, 5.0])
+
+        self.eventloop.run_until_complete(scenario())
+
+    def test_a_batch_leaves_rate_limited_properties_to_their_own_pace(self):
+        async def scenario():
+            self.station.wind_speed = 1.0
+            with self.station.batch_update():
+                self.station.temperature = 25.0
+                self.station.wind_speed = 2.0
+            self.assertEqual(self.subscriber.messages[-1]["data"], {"temperature": 25.0})
+            self.assertEqual(self._wind_speeds_sent(), [1.0])
+            await asyncio.sleep(0.1)
+            self.assertEqual(self._wind_speeds_sent(), [1.0, 2.0])
+
+        self.eventloop.run_until_complete(scenario())
+
+
+if __name__ == '__main__':
+    main()
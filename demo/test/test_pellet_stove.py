@@ -14,6 +14,11 @@ from unittest.mock import (
 
 import pellet_stove
 
+from pywot.gpio import (
+    EdgeInput,
+    FakeGPIOBackend,
+)
+
 from configmanners.dotdict import (
     DotDict
 )
@@ -120,72 +125,138 @@ class PelletStoveTest(TestCase):
 
         ps._controller.shutdown.assert_called_once_with()
 
-    def test_run_scenario_1(self):
-        config = self._new_config()
-        ps = pellet_stove.PelletStove(config)
+    def _new_stove_with_thermostat(self):
+        ps = pellet_stove.PelletStove(self._new_config())
         ps._controller = Mock()
-        ps._controller.get_thermostat_state.side_effect = [False, True, False, False]
+        gpio = FakeGPIOBackend()
+        ps._controller.thermostat = EdgeInput(
+            gpio, 18, pull_up=True, inverted=True, debounce_seconds=0.01
+        )
+        return ps, gpio
+
+    async def _follow_thermostat(self, ps, thermostat_states):
+        # as the value stream does, assign each state the stream yields to the property
+        ps.thermostat_state = await thermostat_states.__anext__()
+
+    def test_run_scenario_1(self):
+        ps, gpio = self._new_stove_with_thermostat()
 
         async def scenario_1():
-            await ps.get_thermostat_state()
+            thermostat_states = ps.watch_thermostat()
+            await self._follow_thermostat(ps, thermostat_states)
 
             self.assertFalse(ps.thermostat_state)
             self.assertEqual(ps.stove_state, 'off')
             self.assertEqual(ps.stove_automation_mode, 'off')
 
-            await ps.get_thermostat_state()
+            # the thermostat calls for heat, closing its contact
+            gpio.set_level(18, 0)
+            await self._follow_thermostat(ps, thermostat_states)
 
             self.assertTrue(ps.thermostat_state)
             self.assertEqual(ps.stove_state, 'high')
             self.assertEqual(ps.stove_automation_mode, 'heating')
-            ps._controller.set_on_high.called_once_with()
+            ps._controller.set_on_high.assert_called_once_with()
 
-            await ps.get_thermostat_state()
+            gpio.set_level(18, 1)
+            await self._follow_thermostat(ps, thermostat_states)
             await ps.lingering_shutdown_task
 
             self.assertFalse(ps.thermostat_state)
             self.assertTrue(ps.lingering_shutdown_task is None)
             self.assertEqual(ps.stove_state, 'off')
             self.assertEqual(ps.stove_automation_mode, 'off')
-            ps._controller.set_on_medium.called_once_with()
-            ps._controller.set_on_low.called_once_with()
-            ps._controller.set_off.called_once_with()
+            ps._controller.set_on_medium.assert_called_once_with()
+            ps._controller.set_on_low.assert_called_once_with()
+            ps._controller.set_off.assert_called_once_with()
+
+            await thermostat_states.aclose()
 
         run_async(self.eventloop, scenario_1())
 
     def test_run_scenario_2(self):
-        config = self._new_config()
-        ps = pellet_stove.PelletStove(config)
-        ps._controller = Mock()
-        ps._controller.get_thermostat_state.side_effect = [False, True, False, True]
+        ps, gpio = self._new_stove_with_thermostat()
+        # long enough for the thermostat to call for heat again while the stove lingers
+        ps.medium_linger_time_in_seconds = 10
 
         async def scenario_2():
-            await ps.get_thermostat_state()
+            thermostat_states = ps.watch_thermostat()
+            await self._follow_thermostat(ps, thermostat_states)
 
             self.assertFalse(ps.thermostat_state)
             self.assertEqual(ps.stove_state, 'off')
             self.assertEqual(ps.stove_automation_mode, 'off')
 
-            await ps.get_thermostat_state()
+            gpio.set_level(18, 0)
+            await self._follow_thermostat(ps, thermostat_states)
 
             self.assertTrue(ps.thermostat_state)
             self.assertEqual(ps.stove_state, 'high')
             self.assertEqual(ps.stove_automation_mode, 'heating')
-            ps._controller.set_on_high.called_once_with()
 
-            await ps.get_thermostat_state()
-            await ps.get_thermostat_state()
+            gpio.set_level(18, 1)
+            await self._follow_thermostat(ps, thermostat_states)
+            # let the lingering shutdown begin
+            await asyncio.sleep(0)
+            self.assertEqual(ps.stove_state, 'medium')
+
+            gpio.set_level(18, 0)
+            await self._follow_thermostat(ps, thermostat_states)
 
             self.assertTrue(ps.thermostat_state)
             self.assertTrue(ps.lingering_shutdown_task is None)
             self.assertEqual(ps.stove_state, 'high')
             self.assertEqual(ps.stove_automation_mode, 'heating')
-            ps._controller.set_on_medium.called_once_with()
-            ps._controller.set_on_low.called_once_with()
-            ps._controller.set_off.called_once_with()
+            self.assertEqual(ps._controller.set_on_high.call_count, 2)
+            ps._controller.set_on_medium.assert_called_once_with()
+            ps._controller.set_on_low.assert_not_called()
+            ps._controller.set_off.assert_not_called()
+
+            await thermostat_states.aclose()
 
         run_async(self.eventloop, scenario_2())
 
+    def test_watch_thermostat(self):
+        config = self._new_config()
+        ps = pellet_stove.PelletStove(config)
+        ps._controller = Mock()
+        gpio = FakeGPIOBackend()
+        ps._controller.thermostat = EdgeInput(
+            gpio, 18, pull_up=True, inverted=True, debounce_seconds=0.01
+        )
+
+        async def scenario():
+            thermostat_states = ps.watch_thermostat()
+
+            # the first state is the current state of the thermostat, not calling for heat
+            self.assertFalse(await thermostat_states.__anext__())
+            self.assertFalse(ps.thermostat_state)
+            self.assertEqual(ps.stove_state, 'off')
+
+            # the contact bounces as it closes, but that is just one change.  The edges are
+            # signaled from another thread, as the real GPIO backend would.
+            for a_level in (0, 1, 0, 1, 0):
+                await self.eventloop.run_in_executor(None, gpio.set_level, 18, a_level)
+            # the stream reacts to the change and leaves the assignment to the value stream
+            self.assertTrue(await thermostat_states.__anext__())
+            self.assertFalse(ps.thermostat_state)
+            ps.thermostat_state = True
+            self.assertEqual(ps.stove_state, 'high')
+            self.assertEqual(ps.stove_automation_mode, 'heating')
+            ps._controller.set_on_high.assert_called_once_with()
+
+            gpio.set_level(18, 1)
+            self.assertFalse(await thermostat_states.__anext__())
+            ps.thermostat_state = False
+            await ps.lingering_shutdown_task
+            self.assertEqual(ps.stove_state, 'off')
+            self.assertEqual(ps.stove_automation_mode, 'off')
+
+            await thermostat_states.aclose()
+            self.assertNotIn(18, gpio.callbacks)
+
+        run_async(self.eventloop, scenario())
+
 
 if __name__ == '__main__':
     main()
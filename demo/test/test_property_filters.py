@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import json
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot import WoTThing
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+
+class FakeSubscriber:
+    """a websocket client that keeps the messages sent to it"""
+
+    def __init__(self):
+        self.messages = []
+
+    def write_message(self, message):
+        self.messages.append(json.loads(message))
+
+    def update_property(self, a_property):
+        # as webthing's ThingHandler does, since webthing.Thing no longer writes the message
+        self.write_message(
+            json.dumps(
+                {
+                    "messageType": "propertyStatus",
+                    "data": {a_property.name: a_property.get_value()},
+                }
+            )
+        )
+
+    def values_of(self, property_name):
+        return [
+            a_message["data"][property_name]
+            for a_message in self.messages
+            if property_name in a_message["data"]
+        ]
+
+
+class Sensor(WoTThing):
+    def __init__(self, config):
+        super(Sensor, self).__init__(config, "sensor", "thing", "a noisy sensor")
+
+    temperature = WoTThing.wot_property(
+        name='temperature',
+        description='suppresses changes within half a degree',
+        initial_value=20.0,
+        deadband=0.5,
+    )
+    humidity = WoTThing.wot_property(
+        name='humidity',
+        description='suppresses changes within five percent',
+        initial_value=50.0,
+        relative_deadband=0.05,
+    )
+    level = WoTThing.wot_property(
+        name='level',
+        description='rounded to a multiple of 0.25',
+        initial_value=1.0,
+        quantum=0.25,
+    )
+    count = WoTThing.wot_property(
+        name='count',
+        description='an integer rounded to a multiple of 5',
+        initial_value=0,
+        quantum=5,
+    )
+    position = WoTThing.wot_property(
+        name='position',
+        description='an integer rounded to a multiple of 2.5',
+        initial_value=0,
+        quantum=2.5,
+    )
+    heartbeat = WoTThing.wot_property(
+        name='heartbeat',
+        description='every value is sent, even an unchanged one',
+        initial_value='alive',
+        suppress_unchanged=False,
+    )
+    mode = WoTThing.wot_property(
+        name='mode',
+        description='an unchanged value is suppressed',
+        initial_value='off',
+    )
+
+
+class PropertyFiltersTest(TestCase):
+    def setUp(self):
+        self.sensor = Sensor(DotDict({"poll_on_demand": False}))
+        self.subscriber = FakeSubscriber()
+        self.sensor.subscribers.add(self.subscriber)
+
+    def test_unchanged_values_are_suppressed(self):
+        self.sensor.mode = 'off'
+        self.sensor.mode = 'heating'
+        self.sensor.mode = 'heating'
+        self.assertEqual(self.subscriber.values_of('mode'), ['heating'])
+
+    def test_unchanged_values_are_resent_without_suppress_unchanged(self):
+        self.sensor.heartbeat = 'alive'
+        self.sensor.heartbeat = 'alive'
+        self.assertEqual(self.subscriber.values_of('heartbeat'), ['alive', 'alive'])
+
+    def test_deadband(self):
+        for a_temperature in (20.3, 20.5, 20.6, 20.9, 21.2):
+            self.sensor.temperature = a_temperature
+        # each value is compared with the last one published, not the last one assigned
+        self.assertEqual(self.subscriber.values_of('temperature'), [20.6, 21.2])
+        self.assertEqual(self.sensor.temperature, 21.2)
+
+    def test_relative_deadband(self):
+        for a_humidity in (52.0, 53.0, 55.0, 57.0):
+            self.sensor.humidity = a_humidity
+        self.assertEqual(self.subscriber.values_of('humidity'), [53.0, 57.0])
+
+    def test_quantize(self):
+        for a_level in (1.1, 1.2, 1.3, 1.4):
+            self.sensor.level = a_level
+        self.assertEqual(self.subscriber.values_of('level'), [1.25, 1.5])
+
+    def test_quantize_keeps_integers_with_an_integral_quantum(self):
+        self.sensor.count = 7
+        self.assertEqual(self.sensor.count, 5)
+        self.assertIs(type(self.sensor.count), int)
+
+    def test_quantize_makes_floats_of_integers_with_a_fractional_quantum(self):
+        self.sensor.position = 7
+        self.assertEqual(self.sensor.position, 7.5)
+        self.sensor.position = 6
+        self.assertEqual(self.sensor.position, 5.0)
+        self.assertEqual(self.subscriber.values_of('position'), [7.5, 5.0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot import WoTThing
+from pywot.snapshot import (
+    load_snapshot,
+    pack_snapshot,
+    snapshot_things,
+    unpack_snapshot,
+    write_merged_snapshot,
+)
+from pywot.timeseries import (
+    RECORD,
+    TimeSeriesStore,
+    write_atomically,
+)
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+# the start of a day, so that the records of a test fall in one segment
+DAY_START = 1700006400.0
+
+
+class Stove(WoTThing):
+    def __init__(self, config):
+        super(Stove, self).__init__(config, "stove", "thing", "a stove to restart")
+        self.forwarded = []
+
+    def set_target(self, new_value):
+        self.forwarded.append(new_value)
+
+    temperature = WoTThing.wot_property(
+        name='temperature',
+        description='measured',
+        initial_value=20.0,
+    )
+    mode = WoTThing.wot_property(
+        name='mode',
+        description='never changes in these tests',
+        initial_value='off',
+    )
+    target = WoTThing.wot_property(
+        name='target',
+        description='set on the stove itself',
+        initial_value=18.0,
+        value_forwarder=set_target,
+    )
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_pack_unpack_round_trip(self):
+        values = {
+            "stove/temperature": (21.5, 1700000000.25),
+            "stove/level": (3, 1700000001.0),
+            "stove/heating": (True, 1700000002.0),
+            "stove/mode": ("lingering_in_médium", 1700000003.0),
+        }
+        written_at, unpacked_values = unpack_snapshot(pack_snapshot(values, written_at=1700000004.0))
+        self.assertEqual(written_at, 1700000004.0)
+        self.assertEqual(unpacked_values, values)
+        self.assertIs(type(unpacked_values["stove/heating"][0]), bool)
+        self.assertIs(type(unpacked_values["stove/level"][0]), int)
+
+    def test_values_that_cannot_be_stored_are_left_out(self):
+        values = {
+            "stove/temperature": (21.5, 1700000000.0),
+            "stove/schedule": ([1, 2, 3], 1700000000.0),
+            "stove/huge": (2 ** 64, 1700000000.0),
+        }
+        written_at, unpacked_values = unpack_snapshot(pack_snapshot(values))
+        self.assertEqual(unpacked_values, {"stove/temperature": (21.5, 1700000000.0)})
+
+    def test_unpack_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            unpack_snapshot(b"NOTASNAP" + bytes(14))
+
+    def test_load_ignores_a_corrupt_snapshot(self):
+        path = os.path.join(self.directory, "snapshot")
+        with open(path, "wb") as f:
+            f.write(pack_snapshot({"stove/temperature": (21.5, 1700000000.0)})[:-4])
+        self.assertEqual(load_snapshot(path), (None, {}))
+        self.assertEqual(load_snapshot(os.path.join(self.directory, "missing")), (None, {}))
+
+    def test_write_merged_snapshot_keeps_other_keys(self):
+        path = os.path.join(self.directory, "snapshot")
+        write_merged_snapshot(path, {"a/x": (1.0, 1.0), "a/y": (2.0, 1.0)})
+        write_merged_snapshot(path, {"a/y": (3.0, 2.0), "b/z": ("on", 2.0)})
+        written_at, values = load_snapshot(path)
+        self.assertEqual(values, {"a/x": (1.0, 1.0), "a/y": (3.0, 2.0), "b/z": ("on", 2.0)})
+
+
+class WarmRestartTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.snapshot_file = os.path.join(self.directory, "snapshot")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _new_stove(self):
+        return Stove(DotDict({
+            "poll_on_demand": False,
+            "property_snapshot_file": self.snapshot_file,
+            "maximum_seconds_of_snapshot_age": 3600,
+        }))
+
+    def test_only_changed_properties_are_snapshotted(self):
+        stove = self._new_stove()
+        stove.temperature = 22.5
+        stove.target = 21.0
+        written_at, values = unpack_snapshot(snapshot_things([stove]))
+        self.assertEqual(set(values), {"stove/temperature", "stove/target"})
+
+    def test_restore(self):
+        stove = self._new_stove()
+        stove.temperature = 22.5
+        stove.target = 21.0
+        write_atomically(self.snapshot_file, snapshot_things([stove]))
+
+        restarted_stove = self._new_stove()
+        self.assertEqual(restarted_stove.temperature, 22.5)
+        self.assertTrue(restarted_stove.properties['temperature'].metadata["restored"])
+        self.assertEqual(
+            restarted_stove.property_change_times['temperature'],
+            stove.property_change_times['temperature'],
+        )
+        # never changed, so not restored
+        self.assertEqual(restarted_stove.mode, 'off')
+        self.assertNotIn("restored", restarted_stove.properties['mode'].metadata)
+        # the stove itself is the authority on the value of a forwarded property
+        self.assertEqual(restarted_stove.target, 18.0)
+        self.assertNotIn('target', restarted_stove.property_change_times)
+        self.assertEqual(restarted_stove.forwarded, [])
+
+        restarted_stove.temperature = 23.0
+        self.assertNotIn("restored", restarted_stove.properties['temperature'].metadata)
+
+
+class TimeSeriesStoreTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_append_query_round_trip(self):
+        store = TimeSeriesStore(self.directory)
+        for i in range(10):
+            store.append("stove/temperature", 20.0 + i, timestamp=DAY_START + i * 60)
+            store.append("stove/heating", i % 2 == 0, timestamp=DAY_START + i * 60 + 1)
+        self.assertEqual(
+            store.query("stove/temperature", DAY_START + 120, DAY_START + 240),
+            [(DAY_START + 120, 22.0), (DAY_START + 180, 23.0), (DAY_START + 240, 24.0)],
+        )
+        self.assertEqual(
+            store.query_rollups("stove/temperature"), [(DAY_START, 10, 20.0, 29.0, 24.5)]
+        )
+        self.assertEqual(store.query("stove/missing"), [])
+        store.close()
+
+    def test_torn_record_is_cut_off_on_reopen(self):
+        store = TimeSeriesStore(self.directory)
+        store.append("stove/temperature", 20.0, timestamp=DAY_START + 60)
+        store.append("stove/temperature", 21.0, timestamp=DAY_START + 120)
+        store.close()
+        # a crash in the middle of writing the third record
+        segment_path = os.path.join(
+            self.directory, "segments", f"{int(DAY_START):012d}.tsdat"
+        )
+        with open(segment_path, "ab") as f:
+            f.write(RECORD.pack(DAY_START + 180, 22.0, 0)[:10])
+
+        store = TimeSeriesStore(self.directory)
+        self.assertEqual(
+            store.query("stove/temperature"), [(DAY_START + 60, 20.0), (DAY_START + 120, 21.0)]
+        )
+        store.append("stove/temperature", 23.0, timestamp=DAY_START + 240)
+        self.assertEqual(os.path.getsize(segment_path), 3 * RECORD.size)
+        self.assertEqual(
+            store.query("stove/temperature"),
+            [(DAY_START + 60, 20.0), (DAY_START + 120, 21.0), (DAY_START + 240, 23.0)],
+        )
+        store.close()
+
+    def test_finished_segment_is_rolled_up_and_series_names_kept(self):
+        store = TimeSeriesStore(self.directory, seconds_per_rollup=600)
+        for i in range(20):
+            store.append("stove/temperature", float(i), timestamp=DAY_START + i * 60)
+        # the first record of the next day finishes the segment of the first
+        store.append("stove/temperature", 100.0, timestamp=DAY_START + 24 * 60 * 60)
+        store.close()
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(self.directory, "segments", f"{int(DAY_START):012d}.tsrollup")
+            )
+        )
+
+        store = TimeSeriesStore(self.directory, seconds_per_rollup=600)
+        self.assertEqual(
+            store.query_rollups("stove/temperature", DAY_START, DAY_START + 1200),
+            [(DAY_START, 10, 0.0, 9.0, 4.5), (DAY_START + 600, 10, 10.0, 19.0, 14.5)],
+        )
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
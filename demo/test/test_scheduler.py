@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+import asyncio
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot import WoTThing
+from pywot.scheduler import (
+    BACKGROUND_PRIORITY,
+    CRITICAL_PRIORITY,
+    NORMAL_PRIORITY,
+    PollingScheduler,
+)
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+
+def run_async(an_event_loop, a_coroutine):
+    """credit: https://blog.miguelgrinberg.com/post/unit-testing-asyncio-code"""
+    return an_event_loop.run_until_complete(a_coroutine)
+
+
+class PolledThing(WoTThing):
+    def __init__(self, config):
+        super(PolledThing, self).__init__(config, "polled thing", "thing", "a thing to poll")
+        self.polled = []
+        self.poll_happened = asyncio.Event()
+
+    async def _note_poll(self, value_source_name):
+        self.polled.append(value_source_name)
+        self.poll_happened.set()
+
+    async def poll_background(self):
+        await self._note_poll('background')
+
+    async def poll_normal(self):
+        await self._note_poll('normal')
+
+    async def poll_critical(self):
+        await self._note_poll('critical')
+
+    # defined from the lowest priority to the highest, so that the order of the polls cannot
+    # come from the order of definition
+    background = WoTThing.wot_property(
+        name='background',
+        description='a property of little value',
+        initial_value=0,
+        value_source_fn=poll_background,
+        polling_priority=BACKGROUND_PRIORITY,
+    )
+    normal = WoTThing.wot_property(
+        name='normal',
+        description='an ordinary property',
+        initial_value=0,
+        value_source_fn=poll_normal,
+        polling_priority=NORMAL_PRIORITY,
+    )
+    critical = WoTThing.wot_property(
+        name='critical',
+        description='a safety related property',
+        initial_value=0,
+        value_source_fn=poll_critical,
+        polling_priority=CRITICAL_PRIORITY,
+    )
+
+
+class PollingSchedulerTest(TestCase):
+    def setUp(self):
+        self.eventloop = asyncio.get_event_loop()
+
+    def _new_thing_config(self):
+        return DotDict({
+            "seconds_between_polling": 300,
+            "seconds_for_polling_timeout": 10,
+            "polling_failures_before_backoff": 3,
+            "maximum_seconds_of_polling_backoff": 3600,
+            "poll_on_demand": False,
+        })
+
+    def _new_scheduler_config(self, number_of_critical_polling_workers=0):
+        return DotDict({
+            "number_of_polling_workers": 1,
+            "number_of_critical_polling_workers": number_of_critical_polling_workers,
+            "polling_phase_spread": 0.0,
+            "polling_jitter": 0.0,
+        })
+
+    async def _run_until_polled(self, scheduler, thing, number_of_polls):
+        tasks = scheduler.start()
+        try:
+            while len(thing.polled) < number_of_polls:
+                thing.poll_happened.clear()
+                await asyncio.wait_for(thing.poll_happened.wait(), 1.0)
+        finally:
+            for a_task in tasks:
+                a_task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def test_due_polls_run_in_priority_order(self):
+        thing = PolledThing(self._new_thing_config())
+        scheduler = PollingScheduler(self._new_scheduler_config())
+        for a_polling_entry in thing.polling_entries:
+            scheduler.add_first_poll(a_polling_entry)
+
+        run_async(self.eventloop, self._run_until_polled(scheduler, thing, 3))
+        self.assertEqual(thing.polled, ['critical', 'normal', 'background'])
+        # each is scheduled again a polling period later
+        for a_polling_entry in thing.polling_entries:
+            self.assertIsNotNone(a_polling_entry.deadline)
+
+    def test_poll_now(self):
+        thing = PolledThing(self._new_thing_config())
+        scheduler = PollingScheduler(self._new_scheduler_config())
+        polling_entries_by_priority = {
+            a_polling_entry.priority: a_polling_entry for a_polling_entry in thing.polling_entries
+        }
+        normal_entry = polling_entries_by_priority[NORMAL_PRIORITY]
+        background_entry = polling_entries_by_priority[BACKGROUND_PRIORITY]
+        # the first normal poll is far in the future and the background source is dormant
+        scheduler.add(normal_entry, 1000.0)
+        background_entry.dormant = True
+
+        async def scenario():
+            scheduler.poll_now(normal_entry)
+            await self._run_until_polled(scheduler, thing, 1)
+            self.assertEqual(thing.polled, ['normal'])
+
+            scheduler.poll_now(background_entry)
+            self.assertFalse(background_entry.dormant)
+            await self._run_until_polled(scheduler, thing, 2)
+            self.assertEqual(thing.polled, ['normal', 'background'])
+
+        run_async(self.eventloop, scenario())
+
+    def test_critical_workers_poll_critical_sources_alone(self):
+        thing = PolledThing(self._new_thing_config())
+        scheduler = PollingScheduler(self._new_scheduler_config(number_of_critical_polling_workers=1))
+        scheduler.config.number_of_polling_workers = 0
+        for a_polling_entry in thing.polling_entries:
+            scheduler.add_first_poll(a_polling_entry)
+
+        async def scenario():
+            await self._run_until_polled(scheduler, thing, 1)
+            # give the critical worker the chance to take more than it should
+            tasks = scheduler.start()
+            await asyncio.sleep(0.05)
+            for a_task in tasks:
+                a_task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        run_async(self.eventloop, scenario())
+        self.assertEqual(thing.polled, ['critical'])
+
+
+class DemandDrivenPollingTest(TestCase):
+    def setUp(self):
+        self.eventloop = asyncio.get_event_loop()
+        self.thing = PolledThing(DotDict({
+            "seconds_between_polling": 300,
+            "seconds_for_polling_timeout": 10,
+            "polling_failures_before_backoff": 3,
+            "maximum_seconds_of_polling_backoff": 3600,
+            "poll_on_demand": True,
+            "seconds_until_idle": 0.01,
+            "seconds_between_idle_polling": None,
+        }))
+        self.scheduler = PollingScheduler(DotDict({
+            "number_of_polling_workers": 1,
+            "number_of_critical_polling_workers": 0,
+            "polling_phase_spread": 0.0,
+            "polling_jitter": 0.0,
+        }))
+        for a_polling_entry in self.thing.polling_entries:
+            self.scheduler.add_first_poll(a_polling_entry)
+
+    def _let_the_thing_go_idle(self):
+        run_async(self.eventloop, asyncio.sleep(0.02))
+        # as the scheduler leaves the entries of an idle thing after their last poll
+        for a_polling_entry in self.thing.polling_entries:
+            a_polling_entry.deadline = None
+            a_polling_entry.dormant = True
+
+    def _dormant_entries(self):
+        return [
+            a_polling_entry.name
+            for a_polling_entry in self.thing.polling_entries
+            if a_polling_entry.dormant
+        ]
+
+    def test_an_idle_thing_is_not_polled(self):
+        self._let_the_thing_go_idle()
+        self.assertTrue(self.thing.is_idle())
+        for a_polling_entry in self.thing.polling_entries:
+            self.assertIsNone(self.scheduler.seconds_until_next_poll(a_polling_entry))
+
+    def test_a_new_subscriber_wakes_the_thing(self):
+        self._let_the_thing_go_idle()
+        self.thing.add_subscriber(object())
+        self.assertFalse(self.thing.is_idle())
+        self.assertEqual(self._dormant_entries(), [])
+
+    def test_a_read_wakes_the_thing(self):
+        self._let_the_thing_go_idle()
+        self.thing.get_property('normal')
+        self.assertEqual(self._dormant_entries(), [])
+
+    def test_the_last_subscriber_leaving_does_not_wake_the_thing(self):
+        a_subscriber = object()
+        self.thing.add_subscriber(a_subscriber)
+        self._let_the_thing_go_idle()
+        self.thing.remove_subscriber(a_subscriber)
+        self.assertEqual(len(self._dormant_entries()), 3)
+        # the idle time starts over from the departure
+        self.assertFalse(self.thing.is_idle())
+        run_async(self.eventloop, asyncio.sleep(0.02))
+        self.assertTrue(self.thing.is_idle())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pywot import WoTThing
+from pywot.sharding import (
+    ShardedWoTServer,
+    ShardThings,
+    absolute_hrefs,
+    shard_of,
+    thing_id_of,
+)
+
+from configmanners.dotdict import (
+    DotDict
+)
+
+
+class Lamp(WoTThing):
+    def __init__(self, config, name):
+        super(Lamp, self).__init__(config, name, "thing", "a lamp among many")
+
+    brightness = WoTThing.wot_property(
+        name='brightness',
+        description='from 0 to 100',
+        initial_value=0,
+    )
+
+
+class ShardingTest(TestCase):
+    def _new_lamps(self, *names):
+        return [Lamp(DotDict({"poll_on_demand": False}), a_name) for a_name in names]
+
+    def _new_server(self, things, number_of_shards=4):
+        return ShardedWoTServer(
+            DotDict({"server": DotDict({"number_of_shards": number_of_shards})}), things, port=8000
+        )
+
+    def _shard_index_of(self, server, a_thing):
+        for shard_index, a_shard in enumerate(server.shards):
+            if a_thing in a_shard:
+                return shard_index
+
+    def test_a_thing_keeps_its_shard_as_others_come_and_go(self):
+        lamps = self._new_lamps('hall', 'kitchen', 'porch', 'attic', 'cellar')
+        server = self._new_server(lamps)
+        self.assertEqual(len(server.shards), 4)
+        for a_lamp in lamps:
+            self.assertEqual(self._shard_index_of(server, a_lamp), shard_of(a_lamp, 4))
+
+        # fewer things than shards still spread over all of them
+        fewer_server = self._new_server(lamps[:2])
+        self.assertEqual(len(fewer_server.shards), 4)
+        for a_lamp in lamps[:2]:
+            self.assertEqual(
+                self._shard_index_of(fewer_server, a_lamp), self._shard_index_of(server, a_lamp)
+            )
+        # only the shards with things have workers, each on the port of its shard
+        self.assertEqual(
+            fewer_server.worker_ports,
+            sorted({8001 + shard_of(a_lamp, 4) for a_lamp in lamps[:2]}),
+        )
+
+    def test_things_are_found_by_the_id_from_their_names(self):
+        hall, kitchen = self._new_lamps('hall', 'kitchen')
+        shard_things = ShardThings([hall, kitchen], 'shard')
+        self.assertIs(shard_things.get_thing(str(thing_id_of(kitchen))), kitchen)
+        # the id doesn't depend on the other things of the shard
+        self.assertIs(ShardThings([kitchen], 'shard').get_thing(str(thing_id_of(kitchen))), kitchen)
+        self.assertIsNone(shard_things.get_thing('0'))
+        self.assertIsNone(shard_things.get_thing('kitchen'))
+
+        shard_things.set_href_prefixes()
+        self.assertEqual(kitchen.get_href(), f"/{thing_id_of(kitchen)}")
+        self.assertEqual(
+            kitchen.as_thing_description()["properties"]["brightness"]["links"][0]["href"],
+            f"/{thing_id_of(kitchen)}/properties/brightness",
+        )
+
+    def test_things_that_would_share_a_url_are_refused(self):
+        # names with the same CRC-32
+        with self.assertRaises(ValueError):
+            self._new_server(self._new_lamps('plumless', 'buckeroo'))
+
+    def test_every_href_points_at_the_worker(self):
+        descriptions = [
+            {
+                "href": "/17",
+                "base": "http://gateway.local:8002/17",
+                "properties": {
+                    "brightness": {
+                        "links": [{"rel": "property", "href": "/17/properties/brightness"}]
+                    }
+                },
+                "links": [
+                    {"rel": "properties", "href": "/17/properties"},
+                    {"rel": "alternate", "href": "ws://gateway.local:8002/17"},
+                ],
+            }
+        ]
+        absolute_hrefs(descriptions, "http://gateway.local:8002/")
+        self.assertEqual(
+            descriptions,
+            [
+                {
+                    "href": "http://gateway.local:8002/17",
+                    "base": "http://gateway.local:8002/17",
+                    "properties": {
+                        "brightness": {
+                            "links": [
+                                {
+                                    "rel": "property",
+                                    "href": "http://gateway.local:8002/17/properties/brightness",
+                                }
+                            ]
+                        }
+                    },
+                    "links": [
+                        {"rel": "properties", "href": "http://gateway.local:8002/17/properties"},
+                        {"rel": "alternate", "href": "ws://gateway.local:8002/17"},
+                    ],
+                }
+            ],
+        )
+
+
+if __name__ == '__main__':
+    main()
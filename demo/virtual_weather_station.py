@@ -7,8 +7,11 @@ used as the basis for rules in the Things Gateway.
 To use this Web Thing, a developer API key must be acquired from Weather Underground at this URL:
 https://www.wunderground.com/weather/api/d/pricing.html
 
-I use the Developer version of the Cumulus Plan which allows for 500 API hits for a cost of 0$.
-That translates to fetching weather data every three minutes.
+I use the Developer version of the Cumulus Plan which allows for 500 API hits a day for a cost
+of 0$.  That translates to fetching weather data about every three minutes.  Rather than tuning
+seconds_between_polling by hand, all the weather stations in the process draw from one polling
+budget of --api_hits_per_day.  When they poll faster than the budget allows, pywot slows them
+down to stay within it.
 
 Once the app is running, --help will give a complete listing of the options.  Alternatively,
 running with the option --admin.dump_conf=my_config.ini  will create an ini file that then
@@ -16,13 +19,12 @@ can be edited to set the parameters.  Thereafter, running with --admin.conf=my_c
 load configuration from the file.
 """
 
-import aiohttp
 import async_timeout
-import json
 import logging
 
 from pywot import (
     WoTThing,
+    PollingBudget,
     logging_config,
     log_config
 )
@@ -32,6 +34,9 @@ from configmanners import (
     class_converter,
 )
 
+# every weather station shares the API key and so the daily quota of hits
+weather_underground_budget = PollingBudget('Weather Underground', requests_per_period=500)
+
 
 def create_url(config, local_namespace, args):
     """generate a URL to fetch local weather data from Weather Underground using
@@ -70,6 +75,11 @@ class WeatherStation(WoTThing):
         'target_url',
         function=create_url
     )
+    required_config.add_option(
+        'api_hits_per_day',
+        doc='the number of hits a day allowed by the Weather Underground plan',
+        default=500,
+    )
     required_config.add_option(
         'seconds_for_timeout',
         doc='the number of seconds to allow for fetching weather data',
@@ -83,6 +93,7 @@ class WeatherStation(WoTThing):
             "thing",
             "my weather station with data for {}, {}".format(config.city_name, config.state_code)
         )
+        weather_underground_budget.requests_per_period = config.api_hits_per_day
         self.weather_data = {
             'current_observation': {
                 'temp_f': self.temperature,
@@ -92,38 +103,50 @@ class WeatherStation(WoTThing):
         }
 
     async def get_weather_data(self):
-        async with aiohttp.ClientSession() as session:
-            async with async_timeout.timeout(self.config.seconds_for_timeout):
-                async with session.get(self.config.target_url) as response:
-                    self.weather_data = json.loads(await response.text())
+        async with async_timeout.timeout(self.config.seconds_for_timeout):
+            # an unchanged observation ends the poll here with NotModified
+            self.weather_data = await self.fetch_json_if_changed(self.config.target_url)
         current_observation = self.weather_data['current_observation']
-        self.temperature = current_observation['temp_f']
-        self.barometric_pressure = current_observation['pressure_in']
-        self.wind_speed = current_observation['wind_mph']
         logging.debug(
             'new values fetched: %s, %s, %s',
-            self.temperature,
-            self.barometric_pressure,
-            self.wind_speed
+            current_observation['temp_f'],
+            current_observation['pressure_in'],
+            current_observation['wind_mph']
         )
+        # returning the new values rather than assigning them one at a time lets pywot
+        # publish all three to the subscribers in a single update
+        return {
+            'temperature': current_observation['temp_f'],
+            'barometric_pressure': current_observation['pressure_in'],
+            'wind_speed': current_observation['wind_mph'],
+        }
 
     temperature = WoTThing.wot_property(
         name='temperature',
         initial_value=0.0,
         description='the temperature in ℉',
         value_source_fn=get_weather_data,
+        polling_budget=weather_underground_budget,
+        # a day's worth of readings within the 500 hits a day budget
+        history_capacity=500,
         units='℉'
     )
     barometric_pressure = WoTThing.wot_property(
         name='barometric_pressure',
         initial_value=30.0,
         description='the air pressure in inches',
+        value_source_fn=get_weather_data,
+        polling_budget=weather_underground_budget,
         units='in'
     )
     wind_speed = WoTThing.wot_property(
         name='wind_speed',
         initial_value=30.0,
         description='the wind speed in mph',
+        value_source_fn=get_weather_data,
+        polling_budget=weather_underground_budget,
+        # gusts make the wind speed jitter from one poll to the next
+        deadband=1.0,
         units='mph'
     )
 
@@ -6,14 +6,77 @@ from webthing import (
     Value,
     WebThingServer,
 )
-from asyncio import sleep, gather, get_event_loop, CancelledError
-from configmanners import Namespace, RequiredConfig
+from asyncio import gather, get_event_loop, iscoroutinefunction, Semaphore, sleep
+from configmanners import Namespace, RequiredConfig, class_converter
 from configmanners.converters import to_str
+from tornado.websocket import WebSocketClosedError
 from functools import partial
-from itertools import filterfalse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from collections.abc import Mapping
+from contextlib import contextmanager
+import json
 import logging
 
+from time import monotonic, time
+
+from pywot.executors import (
+    housekeeping_pool,
+    thread_pool,
+    process_pool,
+    shutdown_executors,
+)
+from pywot import metrics
+from pywot.budget import PollingBudget
+from pywot.event_loops import event_loop_config, use_event_loop_policy
+from pywot.http_client import HttpClient, HttpValidators, NotModified
+from pywot.history import PropertyHistory, PropertyHistoryHandler
+from pywot.metrics import MetricsHandler
+from pywot.streams import StreamEntry
+from pywot.snapshot import load_snapshot, snapshot_things, snapshot_values, write_merged_snapshot
+from pywot.timeseries import TimeSeriesStore, write_atomically
+from pywot.watchdog import start_watchdog, watchdog_config
+from pywot.forwarders import (
+    AsyncForwarder,
+    forward_in_executor,
+    SERIALIZE,
+    CANCEL_PREVIOUS,
+    PARALLEL,
+)
+from pywot.scheduler import (
+    PollingEntry,
+    PollingScheduler,
+    current_polling_entry,
+    postpone_next_poll,
+    CONFIGURED_POLLING_TIMEOUT,
+    CRITICAL_PRIORITY,
+    NORMAL_PRIORITY,
+    BACKGROUND_PRIORITY,
+)
+
+# the class level description of a value source: the function to poll, the names of all the
+# WoT Properties that declared it, the priority at which it should be polled, how often, the
+# executor to run it in if it is a blocking function, the PollingBudget it draws from, the
+# bounds of an adaptive polling interval and how long a poll may take.
+ValueSource = namedtuple(
+    "ValueSource",
+    (
+        "value_source_fn",
+        "property_names",
+        "polling_priority",
+        "seconds_between_polling",
+        "executor",
+        "polling_budget",
+        "minimum_seconds_between_polling",
+        "maximum_seconds_between_polling",
+        "polling_timeout",
+    ),
+)
+
+# the class level description of a value stream: the function returning the async iterator and
+# the names of all the WoT Properties that declared it.
+StreamSource = namedtuple("StreamSource", ("value_stream_fn", "property_names"))
+
 
 def pytype_as_wottype(example_value):
     """given a value of a basic type, return the string
@@ -33,7 +96,25 @@ class WoTProperty:
         initial_value,
         description,
         value_source_fn=None,
+        value_stream_fn=None,
         value_forwarder=None,
+        polling_priority=NORMAL_PRIORITY,
+        seconds_between_polling=None,
+        polling_budget=None,
+        minimum_seconds_between_polling=None,
+        maximum_seconds_between_polling=None,
+        polling_timeout=CONFIGURED_POLLING_TIMEOUT,
+        suppress_unchanged=True,
+        deadband=None,
+        relative_deadband=None,
+        quantum=None,
+        max_rate_hz=None,
+        min_interval=None,
+        forwarder_policy=SERIALIZE,
+        maximum_parallel_forwards=4,
+        blocking=False,
+        executor=None,
+        history_capacity=None,
         **kwargs
     ):
         # WoT Properties must be instantiated when the Thing is instantiated.  Since this code runs
@@ -50,31 +131,97 @@ class WoTProperty:
             **kwargs
         )
         self.name = name
-        if value_source_fn is not None:
-            # since this Wot Property has its own function for a source of values, it will need an
-            # async loop to poll for the values.  We define it here as a closure over
-            # the `value_source_fn`.  It will be executed only after instantiation by the server
-            # and the first parameter is an instance of Thing, we're effectively making a new
-            # instance method for the WoTThing class.  Ideally, this should be a member of the
-            # of the WoTThing class and may well move there in the future.
-            async def a_property_fetching_coroutine(thing_instance):
-                while True:
-                    try:
-                        await value_source_fn(thing_instance)
-                    except CancelledError:
-                        logging.debug("cancel detected")
-                        break
-                    except Exception as e:
-                        logging.error(f"loading data fails: {type(e)}: {e}")
-                        # we'll be optimistic and prefer to retry if something goes wrong.
-                        # while graceful falure is to be commended, there is also great value
-                        # in spontaneous recovery.
-                    await sleep(thing_instance.config.seconds_between_polling)
-
-            # since there may be more that one `a_property_fetching_task`, it gets tagged
-            # so that we can get more helpful debugging and logging information
-            a_property_fetching_coroutine.property_name = name
-            self.property_fetching_coroutine = a_property_fetching_coroutine
+        # a value source is polled by the WoTServer's PollingScheduler rather than by a loop of
+        # its own.  WoTThing instances pair it with themselves to make a PollingEntry.
+        self.value_source_fn = value_source_fn
+        # a value stream pushes new values as they happen rather than being polled, see
+        # pywot.streams.  Each instance runs it in a task of its own.
+        self.value_stream_fn = value_stream_fn
+        self.polling_priority = polling_priority
+        # None means poll at the interval configured for the whole thing
+        self.seconds_between_polling = seconds_between_polling
+        # a pywot.budget.PollingBudget shared by all the value sources using a rate limited
+        # upstream.  It stretches the polling period as needed to stay within the quota.
+        self.polling_budget = polling_budget
+        # given both bounds, the polling interval adapts within them: it lengthens while polls
+        # find nothing new and shortens when values move
+        self.minimum_seconds_between_polling = minimum_seconds_between_polling
+        self.maximum_seconds_between_polling = maximum_seconds_between_polling
+        # the seconds a poll may take before it is abandoned as failed, None for no limit.  By
+        # default, the thing's `config.seconds_for_polling_timeout`.
+        self.polling_timeout = polling_timeout
+        # noisy sources should not send a notification to every subscriber on every poll.  These
+        # filter the values assigned to the property before they reach the webthing.Value.
+        #   suppress_unchanged - drop a new value equal to the current one.  When False, an equal
+        #                        value is sent to the subscribers again.
+        #   deadband - drop a numeric value within this distance of the current one
+        #   relative_deadband - drop a numeric value within this fraction of the current one
+        #   quantum - round numeric values to a multiple of this before any comparison
+        self.suppress_unchanged = suppress_unchanged
+        self.deadband = deadband
+        self.relative_deadband = relative_deadband
+        self.quantum = quantum
+        # a fast changing source may produce values faster than any subscriber can use them.
+        # `min_interval` (or its reciprocal `max_rate_hz`) is the fewest seconds allowed between
+        # notifications.  Values arriving faster are conflated: only the latest is published.
+        if min_interval is None and max_rate_hz is not None:
+            min_interval = 1.0 / max_rate_hz
+        self.min_interval = min_interval
+        # how a coroutine `value_forwarder` is run, see pywot.forwarders
+        self.forwarder_policy = forwarder_policy
+        self.maximum_parallel_forwards = maximum_parallel_forwards
+        # a blocking `value_source_fn` or `value_forwarder` is an ordinary function rather than a
+        # coroutine.  It is run in an executor from pywot.executors so that it doesn't stall the
+        # event loop.  It must not assign to properties itself: a blocking `value_source_fn`
+        # returns the new value of its property (or a mapping of property names to values).
+        if executor is None and blocking:
+            executor = thread_pool
+        if executor is not None and issubclass(executor.executor_class, ProcessPoolExecutor):
+            # the thing is passed to the function, and a thing cannot be pickled.  CPU bound work
+            # goes to a process pool with `run_blocking` and picklable arguments instead.
+            raise ValueError(
+                f"{name}: a value source or forwarder cannot run in the process executor "
+                f"{executor.name}"
+            )
+        self.executor = executor
+        # the number of recent values of a numeric property to keep in a
+        # pywot.history.PropertyHistory, None keeps none
+        if history_capacity and not isinstance(initial_value, (int, float, type(None))):
+            raise ValueError(
+                f"{name}: a history holds numbers, not values like {initial_value!r}"
+            )
+        self.history_capacity = history_capacity
+
+    @staticmethod
+    def _is_numeric(a_value):
+        return isinstance(a_value, (int, float)) and not isinstance(a_value, bool)
+
+    def quantize(self, new_value):
+        if self.quantum is None or not self._is_numeric(new_value):
+            return new_value
+        # the second rounding removes the binary fraction noise of the multiplication, so that
+        # a quantum of 0.1 gives 72.3 rather than 72.30000000000001
+        quantized_value = round(round(new_value / self.quantum) * self.quantum, 10)
+        if isinstance(new_value, int) and float(self.quantum).is_integer():
+            return int(quantized_value)
+        # a fractional quantum makes a float even of an int, 7 becomes 7.5 with a quantum of 2.5
+        return float(quantized_value)
+
+    def is_within_band(self, current_value, new_value):
+        """return True if `new_value` is not different enough from `current_value` to be
+        worth publishing"""
+        if new_value == current_value:
+            return self.suppress_unchanged
+        if not (self._is_numeric(current_value) and self._is_numeric(new_value)):
+            return False
+        difference = abs(new_value - current_value)
+        if self.deadband is not None and difference <= self.deadband:
+            return True
+        if self.relative_deadband is not None and difference <= self.relative_deadband * abs(
+            current_value
+        ):
+            return True
+        return False
 
     def __get__(self, thing_instance, objtype=None):
         # to serve as a Python descriptor, there must be a __get__ method to return the
@@ -86,7 +233,19 @@ class WoTProperty:
     def __set__(self, thing_instance, new_value):
         # to serve as a Python descriptor, we provide a __set__ method to set a new value
         # for the Property in the underlying WoT Thing instance.
-        thing_instance.properties[self.name].value.notify_of_external_update(new_value)
+        started = monotonic()
+        metrics.property_sets.increment(thing_instance.name, self.name)
+        new_value = self.quantize(new_value)
+        current_value = thing_instance.properties[self.name].value.get()
+        if self.is_within_band(current_value, new_value):
+            metrics.notifications_suppressed.increment(
+                thing_instance.name,
+                self.name,
+                "unchanged" if new_value == current_value else "deadband",
+            )
+        else:
+            thing_instance._publish_property_value(self.name, new_value)
+        metrics.property_set_seconds.observe(monotonic() - started, thing_instance.name, self.name)
 
     def create_wot_property(
         self,
@@ -105,7 +264,20 @@ class WoTProperty:
             value = Value(initial_value)
         else:
             logging.debug(f"CREATING property {name} with initial value {initial_value}")
-            value = Value(initial_value, value_forwarder=partial(value_forwarder, thing_instance))
+            if self.executor is not None and not iscoroutinefunction(value_forwarder):
+                # a blocking forwarder becomes a coroutine that awaits the executor
+                value_forwarder = partial(forward_in_executor, self.executor, value_forwarder)
+            if iscoroutinefunction(value_forwarder):
+                value_forwarder = AsyncForwarder(
+                    thing_instance,
+                    name,
+                    value_forwarder,
+                    policy=self.forwarder_policy,
+                    maximum_parallel_forwards=self.maximum_parallel_forwards,
+                )
+            else:
+                value_forwarder = partial(value_forwarder, thing_instance)
+            value = Value(initial_value, value_forwarder=value_forwarder)
             logging.debug(f"new value {name} is {value.last_value}")
         property_metadata = {
             "type": pytype_as_wottype(initial_value),
@@ -129,30 +301,488 @@ class WoTThing(Thing, RequiredConfig):
         doc="the number of seconds between each time polling",
         default=300,
     )
+    required_config.add_option(
+        "maximum_concurrent_forwards",
+        doc="the maximum number of coroutine value forwarders of the thing that may run at once",
+        default=4,
+    )
+    required_config.add_option(
+        "seconds_for_polling_timeout",
+        doc="the number of seconds a value source may take before its poll is abandoned",
+        default=60,
+    )
+    required_config.add_option(
+        "polling_failures_before_backoff",
+        doc="the number of consecutive failures of a value source after which it is polled "
+        "less and less often until it recovers",
+        default=3,
+    )
+    required_config.add_option(
+        "maximum_seconds_of_polling_backoff",
+        doc="the longest time to leave a failing value source before probing it again",
+        default=3600,
+    )
+    required_config.add_option(
+        "seconds_before_stream_reconnect",
+        doc="the number of seconds to wait before opening a failed value stream again, "
+        "doubled with each consecutive failure",
+        default=1,
+    )
+    required_config.add_option(
+        "maximum_seconds_before_stream_reconnect",
+        doc="the longest time to wait before opening a failed value stream again",
+        default=300,
+    )
+    required_config.add_option(
+        "property_snapshot_file",
+        doc="the file of the snapshots of property values written by the WoTServer, from which "
+        "the thing starts after a restart, None for no snapshots",
+        default=None,
+    )
+    required_config.add_option(
+        "maximum_seconds_of_snapshot_age",
+        doc="the age beyond which a snapshot is too old to restore the properties from",
+        default=3600,
+    )
+    required_config.add_option(
+        "poll_on_demand",
+        doc="stop polling the value sources of the thing while no client is interested in it",
+        default=False,
+    )
+    required_config.add_option(
+        "seconds_until_idle",
+        doc="with poll_on_demand, the number of seconds without a subscriber or a read of a "
+        "property after which the thing is idle",
+        default=600,
+    )
+    required_config.add_option(
+        "seconds_between_idle_polling",
+        doc="with poll_on_demand, the number of seconds between polls while the thing is idle, "
+        "None stops polling altogether until a client returns",
+        default=None,
+    )
+
+    # every WoT Property of the class, inherited ones included, in the order of definition
+    wot_properties = ()
+    # the same WoT Properties keyed by their names in the Things Gateway
+    wot_properties_by_name = {}
+    # a tuple of ValueSource, one for each distinct `value_source_fn` among the WoT Properties
+    # of the class
+    value_sources = ()
+    # a tuple of StreamSource, one for each distinct `value_stream_fn`
+    value_streams = ()
+
+    def __init_subclass__(kls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # find the WoT Properties once, when the class is created, rather than each time it is
+        # instantiated.  Walking the MRO from the base classes down keeps the properties in the
+        # order that they were defined with inherited ones first, while `getattr` sees
+        # the same attribute that an instance would, so derived classes may override or
+        # hide the WoT Properties of their bases.
+        attribute_names = dict.fromkeys(
+            attribute_name
+            for a_class in reversed(kls.__mro__)
+            for attribute_name in vars(a_class)
+            if not attribute_name.startswith("_")
+        )
+        kls.wot_properties = tuple(
+            getattr(kls, attribute_name)
+            for attribute_name in attribute_names
+            if isinstance(getattr(kls, attribute_name, None), WoTProperty)
+        )
+        kls.wot_properties_by_name = {
+            wot_property_instance.name: wot_property_instance
+            for wot_property_instance in kls.wot_properties
+        }
+
+        # several WoT Properties may name the same `value_source_fn`, a fetcher that updates
+        # many properties at once.  Group them here too, so that each instance polls such a
+        # fetcher exactly once per period no matter how many properties it feeds.
+        wot_properties_by_value_source_fn = {}
+        for wot_property_instance in kls.wot_properties:
+            if wot_property_instance.value_source_fn is None:
+                continue
+            wot_properties_by_value_source_fn.setdefault(
+                wot_property_instance.value_source_fn, []
+            ).append(wot_property_instance)
+        kls.value_sources = tuple(
+            ValueSource(
+                value_source_fn=value_source_fn,
+                property_names=tuple(a_property.name for a_property in wot_properties),
+                # a shared fetcher is as important as the most important property it feeds
+                polling_priority=min(a_property.polling_priority for a_property in wot_properties),
+                # and must be polled as often as the most demanding of them asks
+                seconds_between_polling=min(
+                    (
+                        a_property.seconds_between_polling
+                        for a_property in wot_properties
+                        if a_property.seconds_between_polling is not None
+                    ),
+                    default=None,
+                ),
+                executor=next(
+                    (
+                        a_property.executor
+                        for a_property in wot_properties
+                        if a_property.executor is not None
+                    ),
+                    None,
+                ),
+                polling_budget=next(
+                    (
+                        a_property.polling_budget
+                        for a_property in wot_properties
+                        if a_property.polling_budget is not None
+                    ),
+                    None,
+                ),
+                minimum_seconds_between_polling=min(
+                    (
+                        a_property.minimum_seconds_between_polling
+                        for a_property in wot_properties
+                        if a_property.minimum_seconds_between_polling is not None
+                    ),
+                    default=None,
+                ),
+                maximum_seconds_between_polling=min(
+                    (
+                        a_property.maximum_seconds_between_polling
+                        for a_property in wot_properties
+                        if a_property.maximum_seconds_between_polling is not None
+                    ),
+                    default=None,
+                ),
+                polling_timeout=next(
+                    (
+                        a_property.polling_timeout
+                        for a_property in wot_properties
+                        if a_property.polling_timeout != CONFIGURED_POLLING_TIMEOUT
+                    ),
+                    CONFIGURED_POLLING_TIMEOUT,
+                ),
+            )
+            for value_source_fn, wot_properties in wot_properties_by_value_source_fn.items()
+        )
+
+        # value streams are grouped the same way, each instance runs each of them just once
+        property_names_by_value_stream_fn = {}
+        for wot_property_instance in kls.wot_properties:
+            if wot_property_instance.value_stream_fn is None:
+                continue
+            property_names_by_value_stream_fn.setdefault(
+                wot_property_instance.value_stream_fn, []
+            ).append(wot_property_instance.name)
+        kls.value_streams = tuple(
+            StreamSource(value_stream_fn=value_stream_fn, property_names=tuple(property_names))
+            for value_stream_fn, property_names in property_names_by_value_stream_fn.items()
+        )
 
     def __init__(self, config, name, type_, description):
         self.config = config
         super(WoTThing, self).__init__(name, type_, description=description)
         self.name = name
-        self.property_fetching_coroutines = []
+        self.polling_entries = []
+        # a pywot.history.PropertyHistory for each property that asked for one, keyed by name
+        self.histories = {
+            wot_property_instance.name: PropertyHistory(wot_property_instance.history_capacity)
+            for wot_property_instance in self.wot_properties
+            if wot_property_instance.history_capacity
+        }
+        # the time of the last change of each property, restored from a snapshot or set when a new
+        # value is published
+        self.property_change_times = {}
+        # a pywot.timeseries.TimeSeriesStore logging every change of a numeric property to disk,
+        # given by the WoTServer when it is configured with a time_series_directory
+        self.time_series_store = None
+        self.stream_entries = [
+            StreamEntry(self, a_value_stream.value_stream_fn, a_value_stream.property_names)
+            for a_value_stream in self.value_streams
+        ]
+        # while a batch_update is in progress, this holds the names of the properties that have
+        # changed so that they can be published together when the batch ends
+        self._batched_property_names = None
+        # for rate limited properties, a mapping of the property name to a tuple of the time of
+        # the last notification and the timer handle of a pending trailing notification
+        self._notification_times = {}
+        self._forwarding_semaphore = None
+        # the HTTP client for value sources and forwarders to use, a WoTServer will replace it
+        # with the one shared by all the things that it serves
+        self._http_client = None
+        # the conditional request validators of `fetch_text_if_changed`, keyed by URL
+        self._http_validators = {}
+        # the last time a client subscribed, unsubscribed or read a property.  Starting up counts,
+        # so a thing isn't idle until it has been ignored for a while.
+        self._time_of_last_demand = monotonic()
 
         # instantiate the WoT Properties by iterating through and executing the partial functions
         # associated with each
-        for attribute_name in dir(self.__class__):
-            if attribute_name.startswith("_"):
-                continue
-            if not isinstance(getattr(self.__class__, attribute_name), WoTProperty):
-                continue
-            wot_property_instance = getattr(self.__class__, attribute_name)
+        for wot_property_instance in self.wot_properties:
             logging.debug(f"creating property {wot_property_instance.name}")
             wot_property_instance.wot_property_creation_function(self)
-            try:
-                self.property_fetching_coroutines.append(
-                    wot_property_instance.property_fetching_coroutine
+
+        self._restore_from_snapshot()
+
+        # no property is required to have a value source, and those that do may share one
+        for a_value_source in self.value_sources:
+            self.polling_entries.append(
+                PollingEntry(
+                    self,
+                    a_value_source.value_source_fn,
+                    a_value_source.polling_priority,
+                    a_value_source.property_names,
+                    a_value_source.seconds_between_polling,
+                    a_value_source.executor,
+                    a_value_source.polling_budget,
+                    a_value_source.minimum_seconds_between_polling,
+                    a_value_source.maximum_seconds_between_polling,
+                    a_value_source.polling_timeout,
                 )
-            except AttributeError:  # no property is required to have a property_fetching_coroutine
+            )
+
+    def _restore_from_snapshot(self):
+        # `get` rather than attribute access: a thing created from a configuration of its own
+        # options alone simply has no snapshot
+        snapshot_file = self.config.get("property_snapshot_file")
+        if snapshot_file is None:
+            return
+        written_at, snapshot_values = load_snapshot(snapshot_file)
+        if written_at is None:
+            return
+        if time() - written_at > self.config.maximum_seconds_of_snapshot_age:
+            logging.info(f"{self.name}: the snapshot in {snapshot_file} is too old to restore")
+            return
+        for a_property_name, a_property in self.properties.items():
+            if a_property.value.value_forwarder is not None:
+                # the device behind a forwarder keeps its own setting, which may have changed
+                # while the server was down.  Showing the old value without forwarding it would
+                # misstate the device, and forwarding it would overrule whatever set it since.
+                continue
+            try:
+                a_value, changed_at = snapshot_values[f"{self.name}/{a_property_name}"]
+            except KeyError:
+                continue
+            if pytype_as_wottype(a_value) != pytype_as_wottype(a_property.value.get()):
+                # the property has changed type since the snapshot was taken
+                continue
+            # there are no subscribers yet, so the value is just put in place
+            a_property.value.last_value = a_value
+            self.property_change_times[a_property_name] = changed_at
+            # clients can tell a restored value from a fresh one, the mark is removed when the
+            # property next changes
+            a_property.metadata["restored"] = True
+        logging.debug(f"{self.name}: restored from the snapshot of {written_at}")
+
+    def seconds_since_change(self, property_name):
+        """return the age of the value of a property, None if it has never changed"""
+        if property_name not in self.property_change_times:
+            return None
+        return time() - self.property_change_times[property_name]
+
+    @property
+    def http(self):
+        """a pooled pywot.http_client.HttpClient for fetching from HTTP value sources"""
+        if self._http_client is None:
+            # a thing that isn't being served by a WoTServer gets a client of its own
+            self._http_client = HttpClient()
+        return self._http_client
+
+    @http.setter
+    def http(self, an_http_client):
+        self._http_client = an_http_client
+
+    async def fetch_text_if_changed(self, url, **kwargs):
+        """fetch text from `url` for a value source, but only if it has changed since the last
+        time this thing fetched it.  If it hasn't, pywot.http_client.NotModified is raised, which
+        quietly ends the poll.  If the upstream says its data is fresh for a while, the next poll
+        of the value source is put off until then."""
+        validators = self._http_validators.setdefault(url, HttpValidators())
+        try:
+            return await self.http.get_text_if_changed(url, validators, **kwargs)
+        finally:
+            postpone_next_poll(validators.seconds_fresh)
+
+    async def fetch_json_if_changed(self, url, **kwargs):
+        """as `fetch_text_if_changed` but the text is parsed as JSON"""
+        return json.loads(await self.fetch_text_if_changed(url, **kwargs))
+
+    def is_idle(self):
+        """with `config.poll_on_demand`, a thing is idle when it has no subscribers and none of
+        its properties has been read for `config.seconds_until_idle`"""
+        if not self.config.poll_on_demand or self.subscribers:
+            return False
+        return monotonic() - self._time_of_last_demand > self.config.seconds_until_idle
+
+    def _note_demand(self):
+        was_idle = self.is_idle()
+        self._time_of_last_demand = monotonic()
+        if was_idle:
+            # a client has returned to an idle thing, refresh its values right away rather than
+            # at the end of a long idle period
+            logging.debug(f"{self.name}: waking up")
+            for a_polling_entry in self.polling_entries:
+                if a_polling_entry.scheduler is not None:
+                    a_polling_entry.scheduler.poll_now(a_polling_entry)
+
+    # the webthing.Thing methods through which clients show interest in the thing
+    def add_subscriber(self, ws):
+        self._note_demand()
+        super().add_subscriber(ws)
+
+    def remove_subscriber(self, ws):
+        super().remove_subscriber(ws)
+        # the idle time is counted from the departure of the last subscriber, but a departure is
+        # no reason to wake the thing
+        self._time_of_last_demand = monotonic()
+
+    def get_property(self, property_name):
+        self._note_demand()
+        return super().get_property(property_name)
+
+    def get_properties(self):
+        self._note_demand()
+        return super().get_properties()
+
+    @property
+    def forwarding_semaphore(self):
+        """the semaphore limiting the concurrent coroutine value forwarders of this thing"""
+        # created on first use so that it belongs to the event loop that is running by then
+        if self._forwarding_semaphore is None:
+            self._forwarding_semaphore = Semaphore(self.config.maximum_concurrent_forwards)
+        return self._forwarding_semaphore
+
+    async def run_blocking(self, a_function, *args, executor=thread_pool):
+        """run a blocking function in an executor, away from the event loop, and return its
+        result.  Use `executor=pywot.executors.process_pool` for CPU bound work."""
+        return await executor.run(a_function, *args)
+
+    @contextmanager
+    def batch_update(self):
+        """a context manager that holds back the notifications of all the properties assigned
+        within it.  When it ends, each subscriber gets just one message with all of the changed
+        properties in it.  Reads of the properties see the new values immediately."""
+        if self._batched_property_names is not None:
+            # nested in another batch, that batch will publish everything when it ends
+            yield self
+            return
+        self._batched_property_names = {}
+        try:
+            yield self
+        finally:
+            property_names = []
+            for property_name in self._batched_property_names:
+                if self.wot_properties_by_name[property_name].min_interval is None:
+                    property_names.append(property_name)
+                else:
+                    # rate limited properties go out at their own pace
+                    self._notify_at_limited_rate(property_name)
+            self._batched_property_names = None
+            if property_names:
+                self.notify_subscribers(property_names)
+
+    def update_properties(self, new_values):
+        """assign new values to several properties at once from a mapping of property names (as
+        known to the Things Gateway) to values.  They are published as a single update."""
+        with self.batch_update():
+            for property_name, new_value in new_values.items():
+                self.wot_properties_by_name[property_name].__set__(self, new_value)
+
+    def _publish_property_value(self, property_name, new_value):
+        value = self.properties[property_name].value
+        if new_value is None:
+            return
+        # an equal value only gets this far from a property that doesn't suppress_unchanged.  It
+        # is sent to the subscribers again, but it is no change.
+        if new_value != value.get():
+            self._record_change(property_name, new_value)
+        if self._batched_property_names is not None:
+            # webthing.Value would emit an update to the subscribers right away.  Within a
+            # batch, just change the value and remember to tell the subscribers later.
+            value.last_value = new_value
+            self._batched_property_names[property_name] = None
+        elif self.wot_properties_by_name[property_name].min_interval is None:
+            metrics.notifications_sent.increment(self.name, property_name)
+            # rather than notify_of_external_update, which drops a value equal to the last one
+            value.last_value = new_value
+            value.emit("update", new_value)
+        else:
+            # the new value is visible to readers right away, it's only the notification that
+            # may be held back
+            value.last_value = new_value
+            self._notify_at_limited_rate(property_name)
+
+    def _record_change(self, property_name, new_value):
+        polling_entry = current_polling_entry.get()
+        if polling_entry is not None:
+            # an adaptive polling interval shortens when its value source finds new values
+            polling_entry.values_changed = True
+        self.property_change_times[property_name] = time()
+        self.properties[property_name].metadata.pop("restored", None)
+        if not isinstance(new_value, (int, float)):
+            return
+        # booleans are recorded too, as 0.0 and 1.0
+        if property_name in self.histories:
+            self.histories[property_name].append(new_value)
+        if self.time_series_store is not None:
+            self.time_series_store.append(f"{self.name}/{property_name}", new_value)
+
+    def _notify_at_limited_rate(self, property_name):
+        min_interval = self.wot_properties_by_name[property_name].min_interval
+        io_loop = get_event_loop()
+        now = io_loop.time()
+        time_of_last_notification, pending_notification = self._notification_times.get(
+            property_name, (None, None)
+        )
+        if pending_notification is not None:
+            # a trailing notification is already on its way, it will carry this latest value in
+            # place of the one it was to carry
+            metrics.notifications_suppressed.increment(self.name, property_name, "rate_limited")
+            return
+        if time_of_last_notification is None or now - time_of_last_notification >= min_interval:
+            self._emit_property_update(property_name)
+        else:
+            self._notification_times[property_name] = (
+                time_of_last_notification,
+                io_loop.call_at(
+                    time_of_last_notification + min_interval,
+                    self._emit_property_update,
+                    property_name,
+                ),
+            )
+
+    def _emit_property_update(self, property_name):
+        self._notification_times[property_name] = (get_event_loop().time(), None)
+        metrics.notifications_sent.increment(self.name, property_name)
+        value = self.properties[property_name].value
+        value.emit("update", value.get())
+
+    def notify_subscribers(self, property_names):
+        """send the current values of the named properties to all the subscribers in a single
+        message.  This is the multiple property equivalent of webthing.Thing.property_notify"""
+        for property_name in property_names:
+            metrics.notifications_sent.increment(self.name, property_name)
+        message = json.dumps(
+            {
+                "messageType": "propertyStatus",
+                "data": {
+                    property_name: self.properties[property_name].get_value()
+                    for property_name in property_names
+                },
+            }
+        )
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.write_message(message)
+            except WebSocketClosedError:
                 pass
 
+    def properties_fed_by_value_sources(self):
+        """return a mapping of the name of each polled value source to the names of the
+        properties that it feeds"""
+        return {
+            a_polling_entry.name: a_polling_entry.property_names
+            for a_polling_entry in self.polling_entries
+        }
+
     @classmethod
     def wot_property(
         kls,
@@ -164,6 +794,8 @@ class WoTThing(Thing, RequiredConfig):
         value_forwarder=None,
         **kwargs
     ):
+        """define a WoT Property for the class.  Any keyword arguments beyond these are those of
+        WoTProperty, the rest become the metadata of the webthing.Property"""
         return WoTProperty(
             name=name,
             initial_value=initial_value,
@@ -179,37 +811,152 @@ class WoTServer(WebThingServer, RequiredConfig):
     required_config.add_option(
         "service_port", doc="a port number for the Web Things Service", default=8888
     )
+    required_config.add_option(
+        "polling_scheduler_class",
+        doc="the fully qualified name of the class that polls the value sources of all things",
+        default=PollingScheduler,
+        from_string_converter=class_converter,
+    )
+    required_config.add_option(
+        "http_client_class",
+        doc="the fully qualified name of the HTTP client class shared by all things",
+        default=HttpClient,
+        from_string_converter=class_converter,
+    )
+    required_config.add_option(
+        "time_series_directory",
+        doc="the directory in which to log every change of a numeric property, None logs nothing",
+        default=None,
+    )
+    required_config.add_option(
+        "time_series_retention_days",
+        doc="the number of days for which the time series log is kept",
+        default=366,
+    )
+    required_config.add_option(
+        "seconds_between_snapshots",
+        doc="the time between snapshots of the property values of things that have a "
+        "property_snapshot_file",
+        default=60,
+    )
+    required_config.add_option(
+        "number_of_blocking_threads",
+        doc="the number of threads in the pool that runs blocking value sources and forwarders",
+        default=4,
+    )
+    required_config.add_option(
+        "number_of_blocking_processes",
+        doc="the number of processes in the pool for CPU bound work",
+        default=2,
+    )
+    required_config.update(watchdog_config)
+    required_config.update(event_loop_config)
 
     def __init__(self, config, things, name=None, port=80, ssl_options=None):
         self.config = config
+        # before anything creates the event loop that tornado will run
+        self.event_loop_policy = use_event_loop_policy(config.server.event_loop_policy)
 
-        if len(things) == 1:
+        if isinstance(things, MultipleThings):
+            # already gathered, as the things of a shard of a pywot.sharding.ShardedWoTServer
+            pass
+        elif len(things) == 1:
             things = SingleThing(things[0])
         else:
             things = MultipleThings(things, name)
 
         super(WoTServer, self).__init__(things, port, ssl_options)
         self._set_of_all_thing_tasks = set()
+        self.watchdog = None
+        self.polling_scheduler = config.server.polling_scheduler_class(config.server)
+        thread_pool.maximum_workers = config.server.number_of_blocking_threads
+        # one pool of HTTP connections for all the things
+        self.http_client = config.server.http_client_class(config.server)
+        for a_thing in self.things.get_things():
+            a_thing.http = self.http_client
+        process_pool.maximum_workers = config.server.number_of_blocking_processes
+        # one on-disk log of property changes for all the things
+        self.time_series_store = None
+        if config.server.time_series_directory is not None:
+            self.time_series_store = TimeSeriesStore(
+                config.server.time_series_directory,
+                retention_seconds=config.server.time_series_retention_days * 24 * 60 * 60,
+            )
+            for a_thing in self.things.get_things():
+                a_thing.time_series_store = self.time_series_store
+        # the recent values of the properties that keep a history, alongside webthing's own routes
+        if isinstance(things, SingleThing):
+            history_route = r"/properties/(?P<property_name>[^/]+)/history/?"
+        else:
+            history_route = r"/(?P<thing_id>\d+)/properties/(?P<property_name>[^/]+)/history/?"
+        self.app.add_handlers(
+            r".*",
+            [
+                (history_route, PropertyHistoryHandler, dict(things=things)),
+                # counters and latencies of the polls and properties, for Prometheus
+                (r"/metrics/?", MetricsHandler),
+            ],
+        )
+        # things may share a snapshot file, each file is a snapshot of all the things using it.
+        # When other processes write the same files, the snapshots are merged.
+        self.merge_snapshots = False
+        self.things_by_snapshot_file = {}
+        for a_thing in self.things.get_things():
+            snapshot_file = a_thing.config.get("property_snapshot_file")
+            if snapshot_file is not None:
+                self.things_by_snapshot_file.setdefault(snapshot_file, []).append(a_thing)
 
     def add_task(self, a_task):
         self._set_of_all_thing_tasks.add(a_task)
 
+    async def _write_snapshots(self):
+        for a_snapshot_file, the_things in self.things_by_snapshot_file.items():
+            # taken in the event loop so that no property changes part way through, only the
+            # writing of the file is handed to a thread
+            try:
+                if self.merge_snapshots:
+                    await housekeeping_pool.run(
+                        write_merged_snapshot, a_snapshot_file, snapshot_values(the_things)
+                    )
+                else:
+                    await housekeeping_pool.run(
+                        write_atomically, a_snapshot_file, snapshot_things(the_things)
+                    )
+            except OSError as e:
+                logging.error(f"cannot write the property snapshot {a_snapshot_file}: {e}")
+
+    async def _take_snapshots_periodically(self):
+        while True:
+            await sleep(self.config.server.seconds_between_snapshots)
+            await self._write_snapshots()
+
     def _create_and_start_all_thing_tasks(self):
-        # create the async polling tasks for each Thing's properties
-        io_loop = get_event_loop()
+        # hand the value sources of every Thing to the one shared polling scheduler
         for a_thing in self.things.get_things():
             logging.debug(
-                f"    thing: {a_thing.name} with {len(a_thing.property_fetching_coroutines)} tasks"
+                f"    thing: {a_thing.name} with {len(a_thing.polling_entries)} value sources"
             )
-            for a_coroutine in a_thing.property_fetching_coroutines:
-                # bind the coroutine to its associated thing
-                a_thing_coroutine = a_coroutine(a_thing)
-                # create and schedule the Task for the coroutine
-                a_thing_task = io_loop.create_task(a_thing_coroutine)
-                self._set_of_all_thing_tasks.add(a_thing_task)
+            for a_polling_entry in a_thing.polling_entries:
+                self.polling_scheduler.add_first_poll(a_polling_entry)
                 logging.debug(
-                    f"        created task: {a_thing.name}.{a_coroutine.property_name}"
+                    f"        scheduled: {a_polling_entry.name} "
+                    f"feeding {', '.join(a_polling_entry.property_names)}"
                 )
+        # create and schedule the dispatcher and worker Tasks of the scheduler
+        self._set_of_all_thing_tasks.update(self.polling_scheduler.start())
+        # value streams aren't polled, each runs in a task of its own
+        io_loop = get_event_loop()
+        for a_thing in self.things.get_things():
+            for a_stream_entry in a_thing.stream_entries:
+                self._set_of_all_thing_tasks.add(io_loop.create_task(a_stream_entry.run()))
+                logging.debug(
+                    f"        streaming: {a_stream_entry.name} "
+                    f"feeding {', '.join(a_stream_entry.property_names)}"
+                )
+        if self.things_by_snapshot_file:
+            self._set_of_all_thing_tasks.add(
+                io_loop.create_task(self._take_snapshots_periodically())
+            )
 
     def _cancel_and_stop_all_thing_tasks(self):
         # cancel all the thing_tasks en masse.
@@ -223,13 +970,22 @@ class WoTServer(WebThingServer, RequiredConfig):
         try:
             logging.debug(f"starting server {self.name}")
             self._create_and_start_all_thing_tasks()
+            self.watchdog = start_watchdog(self.config.server)
             self.start()
         except KeyboardInterrupt:
             logging.debug("stop signal received")
+            if self.watchdog is not None:
+                self.watchdog.stop()
             # when stopping the server, we need to halt any thing_tasks
             self._cancel_and_stop_all_thing_tasks()
+            # a final snapshot, so that a restart begins where this run ended
+            get_event_loop().run_until_complete(self._write_snapshots())
+            get_event_loop().run_until_complete(self.http_client.close())
+            if self.time_series_store is not None:
+                self.time_series_store.close()
             # finally stop the server
             self.stop()
+            shutdown_executors()
 
 
 logging_config = Namespace()
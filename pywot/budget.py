@@ -0,0 +1,142 @@
+"""Spreading the request quota of a rate limited upstream across the things that poll it.
+
+Free API plans allow a fixed number of requests per day or hour, the free Weather Underground plan
+500 a day.  Rather than hand tuning `seconds_between_polling` for every thing so that together they
+stay under the limit, value sources that use such an upstream share a PollingBudget.  The
+PollingScheduler asks the budget how long each of its consumers must wait between polls: the time
+left in the period divided by the polls each consumer may still make.  As the quota is used up
+faster than planned, that wait grows, and the polling slows down on its own.  Once the quota is
+exhausted, polling waits for the next period.
+
+The periods are aligned with the wall clock in UTC, so a daily quota renews at midnight UTC, as
+most upstreams count them.
+
+When the rate of requests so far would exhaust the quota before the period is out, a warning
+says when.  The requests remaining and the projected exhaustion of each budget are also served
+with the other metrics at `/metrics`."""
+
+import logging
+import weakref
+
+from time import time
+
+from pywot import metrics
+
+# a projection from the first few requests of a period says little, none is reported until this
+# fraction of the quota has been used
+FRACTION_USED_BEFORE_PROJECTING = 0.1
+
+
+class PollingBudget:
+    def __init__(
+        self,
+        name,
+        requests_per_period,
+        seconds_per_period=24 * 60 * 60,
+        reserved_requests=0,
+    ):
+        self.name = name
+        self.requests_per_period = requests_per_period
+        self.seconds_per_period = seconds_per_period
+        # requests held back from polling for other uses of the same quota, such as a restart
+        self.reserved_requests = reserved_requests
+        # the PollingEntries drawing from this budget, those of things no longer served drop out
+        self.consumers = weakref.WeakSet()
+        self.period_start = self._current_period_start()
+        self.requests_used = 0
+        self._exhaustion_reported = False
+        self._projected_exhaustion_reported = False
+
+    def _current_period_start(self):
+        now = time()
+        return now - now % self.seconds_per_period
+
+    def _roll_over(self):
+        period_start = self._current_period_start()
+        if period_start != self.period_start:
+            logging.debug(
+                f"{self.name}: a new period, {self.requests_used} requests used in the last"
+            )
+            self.period_start = period_start
+            self.requests_used = 0
+            self._exhaustion_reported = False
+            self._projected_exhaustion_reported = False
+
+    def add_consumer(self, polling_entry):
+        self.consumers.add(polling_entry)
+
+    @property
+    def seconds_left_in_period(self):
+        return self.period_start + self.seconds_per_period - time()
+
+    @property
+    def requests_remaining(self):
+        self._roll_over()
+        return max(0, self.requests_per_period - self.reserved_requests - self.requests_used)
+
+    def draw(self):
+        """record a request made to the upstream.  Returns False if the quota is exhausted, in
+        which case the request should not be made."""
+        if self.requests_remaining == 0:
+            if not self._exhaustion_reported:
+                logging.warning(
+                    f"{self.name}: quota of {self.requests_per_period} requests exhausted, "
+                    f"polling resumes in {self.seconds_left_in_period:.0f} seconds"
+                )
+                self._exhaustion_reported = True
+            return False
+        self.requests_used += 1
+        self._report_projected_exhaustion()
+        return True
+
+    def _report_projected_exhaustion(self):
+        seconds_until_exhausted = self.projected_exhaustion()
+        metrics.budget_requests_remaining.set(self.requests_remaining, self.name)
+        metrics.budget_seconds_until_exhausted.set(
+            float("inf") if seconds_until_exhausted is None else seconds_until_exhausted, self.name
+        )
+        if (
+            seconds_until_exhausted is None
+            or self._projected_exhaustion_reported
+            or self.requests_used < FRACTION_USED_BEFORE_PROJECTING * self.requests_per_period
+        ):
+            return
+        logging.warning(
+            f"{self.name}: at the rate so far, the quota of {self.requests_per_period} requests "
+            f"runs out in {seconds_until_exhausted:.0f} seconds, "
+            f"{self.seconds_left_in_period - seconds_until_exhausted:.0f} seconds before the "
+            f"period ends"
+        )
+        self._projected_exhaustion_reported = True
+
+    def seconds_between_polls(self):
+        """return the fewest seconds each consumer must wait between polls for all of them
+        together to stay within the quota for the rest of the period"""
+        requests_remaining = self.requests_remaining
+        if requests_remaining == 0:
+            return self.seconds_left_in_period
+        return self.seconds_left_in_period * max(1, len(self.consumers)) / requests_remaining
+
+    def projected_exhaustion(self):
+        """return the number of seconds from now until the quota runs out if requests continue
+        at the rate seen so far in this period, or None if it will last the period"""
+        requests_remaining = self.requests_remaining
+        seconds_into_period = time() - self.period_start
+        if self.requests_used == 0 or seconds_into_period <= 0:
+            return None
+        seconds_until_exhausted = requests_remaining * seconds_into_period / self.requests_used
+        if seconds_until_exhausted >= self.seconds_left_in_period:
+            return None
+        return seconds_until_exhausted
+
+    def stats(self):
+        """return a mapping of the statistics of this budget"""
+        return {
+            "requests_per_period": self.requests_per_period,
+            "seconds_per_period": self.seconds_per_period,
+            "requests_used": self.requests_used,
+            "requests_remaining": self.requests_remaining,
+            "consumers": len(self.consumers),
+            "seconds_between_polls": self.seconds_between_polls(),
+            "seconds_until_exhausted": self.projected_exhaustion(),
+        }
@@ -0,0 +1,90 @@
+"""A cache that lets many Things share the result of one fetch.
+
+Several Things watching the same upstream, a weather station or tide light per room for the same
+city, would each fetch the same document on their own.  A SingleFlightCache sits in front of the
+fetch.  While a fetch for a key is in flight, every other request for that key waits for the same
+result rather than starting another.  A result is then served from the cache until it is
+`seconds_to_live` old.  The least recently used entries are evicted to keep the cache under
+`maximum_entries`.  Failures are never cached, so the next request tries again.
+
+Results are shared, not copied: those that get them must not modify them."""
+
+import logging
+
+from asyncio import ensure_future, shield
+from collections import OrderedDict
+from time import monotonic
+
+
+class SingleFlightCache:
+    def __init__(self, seconds_to_live=60, maximum_entries=256):
+        self.seconds_to_live = seconds_to_live
+        self.maximum_entries = maximum_entries
+        # key -> (expiration time, result) in order of use, the least recently used first
+        self._entries = OrderedDict()
+        # key -> the task fetching the result for that key
+        self._in_flight = {}
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+        self.number_of_joins = 0
+        self.number_of_evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key, fetch_fn, *args, seconds_to_live=None):
+        """return the result for `key`, running `await fetch_fn(*args)` to get it only if there
+        is neither a fresh result in the cache nor a fetch already in flight"""
+        try:
+            expiration_time, result = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            if monotonic() < expiration_time:
+                self.number_of_hits += 1
+                self._entries.move_to_end(key)
+                return result
+            del self._entries[key]
+
+        if key in self._in_flight:
+            self.number_of_joins += 1
+        else:
+            self.number_of_misses += 1
+            a_task = ensure_future(self._fetch(key, fetch_fn, args, seconds_to_live))
+            self._in_flight[key] = a_task
+            a_task.add_done_callback(lambda a_task: self._in_flight.pop(key, None))
+        # the fetch is shielded so that a requester giving up does not cancel it for the others
+        return await shield(self._in_flight[key])
+
+    async def _fetch(self, key, fetch_fn, args, seconds_to_live):
+        result = await fetch_fn(*args)
+        if seconds_to_live is None:
+            seconds_to_live = self.seconds_to_live
+        if seconds_to_live > 0:
+            self._entries[key] = (monotonic() + seconds_to_live, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maximum_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self.number_of_evictions += 1
+                logging.debug(f"evicted {evicted_key} from the cache")
+        return result
+
+    def invalidate(self, key=None):
+        """forget the result for `key`, or all results if no key is given"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        """return a mapping of the statistics of this cache"""
+        number_of_requests = self.number_of_hits + self.number_of_misses + self.number_of_joins
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self.number_of_hits,
+            "misses": self.number_of_misses,
+            "joins": self.number_of_joins,
+            "evictions": self.number_of_evictions,
+            "hit_ratio": (self.number_of_hits + self.number_of_joins) / max(1, number_of_requests),
+        }
@@ -0,0 +1,67 @@
+"""Backing off from a value source that keeps failing.
+
+Retrying a dead upstream at the full polling rate hammers it, wastes a polling worker and fills
+the log with the same error.  A CircuitBreaker counts the consecutive failures of one value
+source.  After `failure_threshold` of them the circuit opens: the source is left alone for twice
+its polling period, then for four times, and so on up to `maximum_seconds_open`.  When that time is
+up the circuit is half open and a single probing poll is let through.  Success closes the circuit
+again, failure opens it for longer."""
+
+import logging
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, maximum_seconds_open=3600):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.maximum_seconds_open = maximum_seconds_open
+        self.state = CLOSED
+        self.number_of_consecutive_failures = 0
+        self.seconds_open = 0
+
+    @property
+    def is_closed(self):
+        return self.state == CLOSED
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logging.info(
+                f"{self.name}: recovered after {self.number_of_consecutive_failures} failures"
+            )
+        self.state = CLOSED
+        self.number_of_consecutive_failures = 0
+        self.seconds_open = 0
+
+    def record_failure(self, seconds_between_polling):
+        """count a failure, returning True if it is worth logging: those up to and including the
+        one that opens the circuit.  The failures of probes are only logged at debug level."""
+        self.number_of_consecutive_failures += 1
+        if self.number_of_consecutive_failures < self.failure_threshold:
+            return True
+        worth_logging = self.state == CLOSED
+        # the cap on the exponent only keeps the arithmetic finite, `maximum_seconds_open` rules
+        number_of_doublings = min(
+            self.number_of_consecutive_failures - self.failure_threshold + 1, 32
+        )
+        self.seconds_open = min(
+            seconds_between_polling * 2 ** number_of_doublings, self.maximum_seconds_open
+        )
+        if worth_logging:
+            logging.warning(
+                f"{self.name}: {self.number_of_consecutive_failures} failures in a row, "
+                f"backing off for {self.seconds_open:.0f} seconds at a time"
+            )
+        self.state = OPEN
+        return worth_logging
+
+    def seconds_until_probe(self):
+        """return the fewest seconds to wait before the next poll, 0 if the circuit is closed.
+        Asking means the next poll is coming, so an open circuit becomes half open."""
+        if self.state == CLOSED:
+            return 0
+        self.state = HALF_OPEN
+        return self.seconds_open
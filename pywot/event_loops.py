@@ -0,0 +1,44 @@
+"""The choice of event loop implementation.
+
+The event loop runs every poll, every websocket message and every timer of a server or rule
+system.  A faster implementation, like the libuv based `uvloop`, can be chosen with the
+configuration option `event_loop_policy`: the name of a module providing an `EventLoopPolicy`,
+or "asyncio" for the standard library's own.  If the module cannot be imported, the standard
+event loop is used instead.
+
+The policy must be set before the event loop is first created, so WoTServer sets it as it is
+created, and `pywot.rules.run_main` before it creates the rule system."""
+
+import asyncio
+import logging
+
+from importlib import import_module
+
+from configmanners import Namespace
+
+DEFAULT_POLICY_NAME = "asyncio"
+
+event_loop_config = Namespace()
+event_loop_config.add_option(
+    "event_loop_policy",
+    doc="the module of the event loop implementation (asyncio, uvloop...)",
+    default=DEFAULT_POLICY_NAME,
+)
+
+
+def use_event_loop_policy(policy_name):
+    """set the event loop policy offered by the module `policy_name` and return the name of the
+    policy in use.  For "asyncio", or if that module is not available, the current policy is left
+    as it is."""
+    if policy_name == DEFAULT_POLICY_NAME:
+        return DEFAULT_POLICY_NAME
+    try:
+        policy_class = import_module(policy_name).EventLoopPolicy
+    except (ImportError, AttributeError) as e:
+        logging.warning(
+            f"the {policy_name} event loop is not available, using the asyncio event loop: {e}"
+        )
+        return DEFAULT_POLICY_NAME
+    asyncio.set_event_loop_policy(policy_class())
+    logging.debug(f"using the {policy_name} event loop")
+    return policy_name
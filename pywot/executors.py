@@ -0,0 +1,143 @@
+"""Managed pools for running blocking code away from the event loop.
+
+Every Thing in a WoTServer shares one event loop, so a value source that reads hardware, makes a
+synchronous HTTP call or parses a large document stalls every other Thing until it is done.  A
+ManagedExecutor runs such calls in a pool of threads, or of processes for CPU bound work, while
+keeping count of how deep the queue is and how long the calls take.
+
+Two pools are shared by the whole process: `thread_pool` and `process_pool`.  Neither is created
+until it is first used.  Functions run in `process_pool` must be picklable, as must their
+arguments, so it cannot be handed a Thing.  The server's own upkeep, of the time series store and
+the snapshots, runs in a small `housekeeping_pool` of its own, so that value sources blocked on a
+hung upstream cannot hold it up, nor can the upkeep take the threads the value sources need."""
+
+import logging
+
+from asyncio import CancelledError, TimeoutError, get_event_loop, wait_for, wrap_future
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from time import monotonic
+
+from pywot import metrics
+
+
+def _timed_call(a_function, args):
+    # run in the worker thread or process.  CLOCK_MONOTONIC is shared by all the processes of a
+    # machine, so the start time is comparable with the submission time back in the event loop.
+    started = monotonic()
+    return started, a_function(*args)
+
+
+class ManagedExecutor:
+    """a lazily created concurrent.futures executor that keeps statistics about its use"""
+
+    def __init__(self, name, executor_class, maximum_workers):
+        self.name = name
+        self.executor_class = executor_class
+        self.maximum_workers = maximum_workers
+        self._executor = None
+        self.number_submitted = 0
+        # the outcome of each call as seen by its caller.  A call abandoned by a timeout or a
+        # cancellation may still be running in its worker: it is in flight until it returns.
+        self.number_succeeded = 0
+        self.number_failed = 0
+        self.number_timed_out = 0
+        self.number_cancelled = 0
+        self.number_in_flight = 0
+        self.maximum_queue_depth = 0
+        self.total_seconds_waiting = 0.0
+        self.total_seconds_running = 0.0
+        self.maximum_seconds_latency = 0.0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            logging.debug(f"starting the {self.name} executor with {self.maximum_workers} workers")
+            self._executor = self.executor_class(max_workers=self.maximum_workers)
+        return self._executor
+
+    @property
+    def queue_depth(self):
+        """the number of calls waiting for a worker"""
+        return max(0, self.number_in_flight - self.maximum_workers)
+
+    async def run(self, a_function, *args, timeout=None):
+        """run `a_function(*args)` in the pool and return its result.  If it takes more than
+        `timeout` seconds, raise asyncio.TimeoutError.  A call that has started cannot be stopped,
+        its worker stays busy until it returns."""
+        io_loop = get_event_loop()
+        submitted = monotonic()
+        self.number_submitted += 1
+        self.number_in_flight += 1
+        self.maximum_queue_depth = max(self.maximum_queue_depth, self.queue_depth)
+        a_future = self.executor.submit(_timed_call, a_function, args)
+        a_future.add_done_callback(partial(self._worker_done, io_loop))
+        self._publish_stats()
+        try:
+            started, result = await wait_for(wrap_future(a_future), timeout)
+        except TimeoutError:
+            self.number_timed_out += 1
+            raise
+        except CancelledError:
+            self.number_cancelled += 1
+            raise
+        except Exception:
+            self.number_failed += 1
+            raise
+        else:
+            finished = monotonic()
+            self.number_succeeded += 1
+            self.total_seconds_waiting += started - submitted
+            self.total_seconds_running += finished - started
+            self.maximum_seconds_latency = max(self.maximum_seconds_latency, finished - submitted)
+            return result
+        finally:
+            self._publish_stats()
+
+    def _worker_done(self, io_loop, a_future):
+        # in the worker thread, or the thread collecting the results of a process pool
+        try:
+            io_loop.call_soon_threadsafe(self._call_finished)
+        except RuntimeError:
+            # the event loop has been closed, nobody is left to read the statistics
+            pass
+
+    def _call_finished(self):
+        self.number_in_flight -= 1
+        self._publish_stats()
+
+    def stats(self):
+        """return a mapping of the statistics of this executor"""
+        return {
+            "maximum_workers": self.maximum_workers,
+            "submitted": self.number_submitted,
+            "succeeded": self.number_succeeded,
+            "failed": self.number_failed,
+            "timed_out": self.number_timed_out,
+            "cancelled": self.number_cancelled,
+            "in_flight": self.number_in_flight,
+            "queue_depth": self.queue_depth,
+            "maximum_queue_depth": self.maximum_queue_depth,
+            "mean_seconds_waiting": self.total_seconds_waiting / max(1, self.number_succeeded),
+            "mean_seconds_running": self.total_seconds_running / max(1, self.number_succeeded),
+            "maximum_seconds_latency": self.maximum_seconds_latency,
+        }
+
+    def _publish_stats(self):
+        for a_statistic, a_value in self.stats().items():
+            metrics.executor_statistics[a_statistic].set(a_value, self.name)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+thread_pool = ManagedExecutor("thread", ThreadPoolExecutor, 4)
+process_pool = ManagedExecutor("process", ProcessPoolExecutor, 2)
+housekeeping_pool = ManagedExecutor("housekeeping", ThreadPoolExecutor, 1)
+
+
+def shutdown_executors():
+    for an_executor in (thread_pool, process_pool, housekeeping_pool):
+        an_executor.shutdown()
@@ -0,0 +1,87 @@
+"""Support for value forwarders that are coroutines.
+
+webthing.Value calls its value forwarder synchronously, so an asynchronous forwarder cannot just be
+called.  Launching it with `asyncio.ensure_future` gives no ordering, no backpressure and no error
+reporting: rapid writes from the Things Gateway pile up overlapping runs.  An AsyncForwarder stands
+in for the coroutine and runs it according to a policy:
+
+    SERIALIZE - one at a time, in the order the values arrived
+    CANCEL_PREVIOUS - a new value cancels the run in progress, only the latest value matters
+    PARALLEL - up to `maximum_parallel_forwards` at once
+
+The forwards of all the properties of a Thing also share a limit on how many may run at the same
+time, `config.maximum_concurrent_forwards`."""
+
+import logging
+
+from asyncio import ensure_future
+from collections import deque
+
+SERIALIZE = "serialize"
+CANCEL_PREVIOUS = "cancel_previous"
+PARALLEL = "parallel"
+
+
+class AsyncForwarder:
+    """a synchronous callable for webthing.Value that runs a coroutine value forwarder"""
+
+    def __init__(
+        self,
+        thing,
+        property_name,
+        value_forwarder,
+        policy=SERIALIZE,
+        maximum_parallel_forwards=4,
+        maximum_pending_forwards=100,
+    ):
+        if policy not in (SERIALIZE, CANCEL_PREVIOUS, PARALLEL):
+            raise ValueError(f"{policy} is not a value forwarder policy")
+        self.thing = thing
+        self.property_name = property_name
+        self.value_forwarder = value_forwarder
+        self.policy = policy
+        self.maximum_running = maximum_parallel_forwards if policy == PARALLEL else 1
+        self.maximum_pending_forwards = maximum_pending_forwards
+        self.pending_values = deque()
+        self.running_tasks = set()
+
+    @property
+    def name(self):
+        return f"{self.thing.name}.{self.property_name}"
+
+    def __call__(self, new_value):
+        if self.policy == CANCEL_PREVIOUS:
+            self.pending_values.clear()
+            for a_task in self.running_tasks:
+                a_task.cancel()
+        elif len(self.pending_values) >= self.maximum_pending_forwards:
+            logging.warning(f"{self.name}: too many pending values, dropping the oldest")
+            self.pending_values.popleft()
+        self.pending_values.append(new_value)
+        self._start_pending_forwards()
+
+    def _start_pending_forwards(self):
+        # a cancelled run stays in `running_tasks` until it has actually finished, so with
+        # CANCEL_PREVIOUS the next run can never overlap the cleanup of the one it replaced.
+        while self.pending_values and len(self.running_tasks) < self.maximum_running:
+            a_task = ensure_future(self._forward(self.pending_values.popleft()))
+            self.running_tasks.add(a_task)
+            a_task.add_done_callback(self._forward_done)
+
+    async def _forward(self, new_value):
+        async with self.thing.forwarding_semaphore:
+            await self.value_forwarder(self.thing, new_value)
+
+    def _forward_done(self, a_task):
+        self.running_tasks.discard(a_task)
+        if a_task.cancelled():
+            logging.debug(f"{self.name}: value forwarder canceled")
+        elif a_task.exception() is not None:
+            e = a_task.exception()
+            logging.error(f"{self.name}: value forwarder fails: {type(e)}: {e}")
+        self._start_pending_forwards()
+
+
+async def forward_in_executor(executor, value_forwarder, thing, new_value):
+    """adapt a blocking value forwarder to run in a pywot.executors.ManagedExecutor"""
+    await executor.run(value_forwarder, thing, new_value)
@@ -0,0 +1,126 @@
+"""Digital inputs that report their changes as they happen.
+
+A contact that changes a few times a day, a thermostat's call for heat, costs a poll every second
+to watch with `value_source_fn` and is still noticed up to a second late.  An EdgeInput asks the
+GPIO backend to call back on every edge instead.  The callback arrives on a thread of the backend,
+so it is passed to the event loop with `call_soon_threadsafe`.  Mechanical contacts bounce, so the
+input is only read once the edges have stopped for `debounce_seconds`.  `EdgeInput.changes()` is
+an async generator of the settled values, suitable for use in a `value_stream_fn`.
+
+Two backends are offered.  RPiGPIOBackend uses the RPi.GPIO module of a Raspberry Pi, which is
+imported only when the backend is created.  FakeGPIOBackend simulates the pins in process, so code
+using an EdgeInput can be tested on any machine."""
+
+import logging
+
+from asyncio import Queue, get_event_loop
+
+
+class RPiGPIOBackend:
+    """the GPIO pins of a Raspberry Pi, through RPi.GPIO"""
+
+    def __init__(self):
+        import RPi.GPIO
+
+        self.GPIO = RPi.GPIO
+        self.GPIO.setmode(self.GPIO.BCM)
+
+    def setup_input(self, pin, pull_up=False):
+        self.GPIO.setup(
+            pin,
+            self.GPIO.IN,
+            pull_up_down=self.GPIO.PUD_UP if pull_up else self.GPIO.PUD_DOWN,
+        )
+
+    def read(self, pin):
+        return self.GPIO.input(pin)
+
+    def add_edge_callback(self, pin, callback):
+        self.GPIO.add_event_detect(pin, self.GPIO.BOTH, callback=callback)
+
+    def remove_edge_callback(self, pin):
+        self.GPIO.remove_event_detect(pin)
+
+
+class FakeGPIOBackend:
+    """simulated GPIO pins.  `set_level` changes the level of an input pin from any thread,
+    calling back as a real backend would on an edge."""
+
+    def __init__(self):
+        self.levels = {}
+        self.callbacks = {}
+
+    def setup_input(self, pin, pull_up=False):
+        self.levels.setdefault(pin, 1 if pull_up else 0)
+
+    def read(self, pin):
+        return self.levels[pin]
+
+    def add_edge_callback(self, pin, callback):
+        self.callbacks[pin] = callback
+
+    def remove_edge_callback(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def set_level(self, pin, level):
+        if self.levels.get(pin) == level:
+            return
+        self.levels[pin] = level
+        if pin in self.callbacks:
+            self.callbacks[pin](pin)
+
+
+class EdgeInput:
+    """a digital input pin watched by edge detection rather than polling"""
+
+    def __init__(self, backend, pin, pull_up=False, inverted=False, debounce_seconds=0.05):
+        self.backend = backend
+        self.pin = pin
+        # with a pull up resistor, a closed contact reads low.  `inverted` makes that True.
+        self.inverted = inverted
+        self.debounce_seconds = debounce_seconds
+        self.backend.setup_input(pin, pull_up=pull_up)
+
+    def read(self):
+        """return the current state of the input"""
+        return bool(self.backend.read(self.pin)) != self.inverted
+
+    async def changes(self):
+        """yield the current state of the input, then each settled change of state"""
+        io_loop = get_event_loop()
+        settled_values = Queue()
+        debounce_handle = None
+
+        def settle():
+            nonlocal debounce_handle
+            debounce_handle = None
+            settled_values.put_nowait(self.read())
+
+        def edge_detected():
+            # each edge restarts the debounce timer, the input is read once they stop
+            nonlocal debounce_handle
+            if debounce_handle is not None:
+                debounce_handle.cancel()
+            debounce_handle = io_loop.call_later(self.debounce_seconds, settle)
+
+        def edge_callback(pin):
+            # called on a thread of the backend, never touch the event loop directly from here
+            try:
+                io_loop.call_soon_threadsafe(edge_detected)
+            except RuntimeError:
+                # the event loop has been closed while the backend was still calling back
+                logging.debug(f"GPIO pin {pin}: edge after the event loop closed")
+
+        self.backend.add_edge_callback(self.pin, edge_callback)
+        try:
+            current_value = self.read()
+            yield current_value
+            while True:
+                new_value = await settled_values.get()
+                if new_value != current_value:
+                    current_value = new_value
+                    yield current_value
+        finally:
+            self.backend.remove_edge_callback(self.pin)
+            if debounce_handle is not None:
+                debounce_handle.cancel()
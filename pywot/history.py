@@ -0,0 +1,166 @@
+"""Recent values of numeric properties kept in memory for charting.
+
+A PropertyHistory is a fixed capacity ring buffer of (timestamp, value) pairs held in two arrays of
+doubles, so its memory is bounded and each append is O(1) with no allocation.  Range queries and
+downsampling into buckets of min/max/mean are vectorized with NumPy when it is installed.  Without
+it, the same results come from plain Python.
+
+WoTServer serves the history of each property that keeps one as JSON at
+`/properties/<property_name>/history`, or `/<thing_id>/properties/<property_name>/history` when it
+serves several things.  The query arguments `start` and `end` (seconds since the epoch) select a
+range and `buckets` asks for it to be downsampled."""
+
+import json
+
+from array import array
+from bisect import bisect_left, bisect_right
+from time import time
+
+from tornado.web import HTTPError, RequestHandler
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class PropertyHistory:
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        # the index of the next slot to be written, and how many slots hold values
+        self._next_index = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def append(self, value, timestamp=None):
+        self._timestamps[self._next_index] = time() if timestamp is None else timestamp
+        self._values[self._next_index] = value
+        self._next_index = (self._next_index + 1) % self.capacity
+        self._length = min(self._length + 1, self.capacity)
+
+    def _in_order(self, an_array):
+        # the slots from the oldest to the newest
+        if self._length < self.capacity:
+            return an_array[: self._length]
+        return an_array[self._next_index :] + an_array[: self._next_index]
+
+    def range(self, start=None, end=None):
+        """return the timestamps and values recorded from `start` to `end` inclusive, as two
+        NumPy arrays if NumPy is available, otherwise as two arrays of doubles"""
+        timestamps = self._in_order(self._timestamps)
+        values = self._in_order(self._values)
+        if numpy is not None:
+            timestamps = numpy.frombuffer(timestamps, dtype=numpy.float64)
+            values = numpy.frombuffer(values, dtype=numpy.float64)
+            first = 0 if start is None else numpy.searchsorted(timestamps, start, "left")
+            last = len(timestamps) if end is None else numpy.searchsorted(timestamps, end, "right")
+        else:
+            first = 0 if start is None else bisect_left(timestamps, start)
+            last = len(timestamps) if end is None else bisect_right(timestamps, end)
+        return timestamps[first:last], values[first:last]
+
+    def downsample(self, number_of_buckets, start=None, end=None):
+        """divide the range from `start` to `end` into `number_of_buckets` equal spans of time and
+        return a list of (bucket start, count, min, max, mean) for each span holding values"""
+        timestamps, values = self.range(start, end)
+        if not len(timestamps):
+            return []
+        if start is None:
+            start = timestamps[0]
+        if end is None:
+            end = timestamps[-1]
+        seconds_per_bucket = max(end - start, 1e-9) / number_of_buckets
+
+        if numpy is not None:
+            bucket_indices = numpy.minimum(
+                ((timestamps - start) / seconds_per_bucket).astype(numpy.int64),
+                number_of_buckets - 1,
+            )
+            counts = numpy.bincount(bucket_indices, minlength=number_of_buckets)
+            sums = numpy.bincount(bucket_indices, weights=values, minlength=number_of_buckets)
+            minimums = numpy.full(number_of_buckets, numpy.inf)
+            numpy.minimum.at(minimums, bucket_indices, values)
+            maximums = numpy.full(number_of_buckets, -numpy.inf)
+            numpy.maximum.at(maximums, bucket_indices, values)
+            return [
+                (
+                    start + i * seconds_per_bucket,
+                    int(counts[i]),
+                    float(minimums[i]),
+                    float(maximums[i]),
+                    float(sums[i] / counts[i]),
+                )
+                for i in numpy.flatnonzero(counts)
+            ]
+
+        buckets = {}
+        for a_timestamp, a_value in zip(timestamps, values):
+            i = min(int((a_timestamp - start) / seconds_per_bucket), number_of_buckets - 1)
+            if i in buckets:
+                count, minimum, maximum, total = buckets[i]
+                buckets[i] = (
+                    count + 1, min(minimum, a_value), max(maximum, a_value), total + a_value
+                )
+            else:
+                buckets[i] = (1, a_value, a_value, a_value)
+        return [
+            (start + i * seconds_per_bucket, count, minimum, maximum, total / count)
+            for i, (count, minimum, maximum, total) in sorted(buckets.items())
+        ]
+
+
+class PropertyHistoryHandler(RequestHandler):
+    """serves the history of a property of a thing as JSON"""
+
+    def initialize(self, things):
+        self.things = things
+
+    def set_default_headers(self):
+        # like webthing's own handlers, so that a chart in any page may fetch the history
+        self.set_header("Access-Control-Allow-Origin", "*")
+
+    def get(self, property_name, thing_id="0"):
+        thing = self.things.get_thing(thing_id)
+        if thing is None or property_name not in thing.histories:
+            raise HTTPError(404)
+        history = thing.histories[property_name]
+        start = self.get_query_argument("start", None)
+        end = self.get_query_argument("end", None)
+        number_of_buckets = self.get_query_argument("buckets", None)
+        try:
+            start = None if start is None else float(start)
+            end = None if end is None else float(end)
+            number_of_buckets = None if number_of_buckets is None else int(number_of_buckets)
+        except ValueError:
+            raise HTTPError(400)
+
+        if number_of_buckets is None:
+            timestamps, values = history.range(start, end)
+            result = {
+                "name": property_name,
+                "values": [[float(t), float(v)] for t, v in zip(timestamps, values)],
+            }
+        else:
+            if number_of_buckets < 1:
+                raise HTTPError(400)
+            result = {
+                "name": property_name,
+                "buckets": [
+                    {
+                        "start": bucket_start,
+                        "count": count,
+                        "min": minimum,
+                        "max": maximum,
+                        "mean": mean,
+                    }
+                    for bucket_start, count, minimum, maximum, mean in history.downsample(
+                        number_of_buckets, start, end
+                    )
+                ],
+            }
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(result))
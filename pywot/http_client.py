@@ -0,0 +1,201 @@
+"""A pooled HTTP client to be shared by all the Things in a process.
+
+Creating a fresh `aiohttp.ClientSession` for each request pays for a DNS lookup, a TCP connection
+and perhaps a TLS handshake on every poll.  An HttpClient keeps one session for its whole life, so
+connections are kept alive and reused, with limits on how many may be open in total and to any one
+host.  WoTServer gives its HttpClient to each of its Things as `thing.http`.
+
+For polled sources, `get_text_if_changed` makes conditional requests.  The ETag and Last-Modified
+validators of each response are kept in an HttpValidators and sent back with the next request.
+When the upstream answers 304 Not Modified it raises NotModified, so the value source skips the
+parsing and the property updates that would follow.  The polling scheduler treats NotModified as a successful
+poll.  It also reports how long the response may be considered fresh according to its
+Cache-Control max-age.
+
+Things that watch the same source can share one fetch with `get_text_cached` and `get_json_cached`.
+They go through a pywot.cache.SingleFlightCache keyed by the request, so N things watching one
+source cost one request per `seconds_to_cache_http_responses`."""
+
+import json
+import logging
+
+from functools import partial
+
+import aiohttp
+
+from configmanners import Namespace, RequiredConfig
+from configmanners.dotdict import DotDict
+
+from pywot.cache import SingleFlightCache
+
+
+class NotModified(Exception):
+    """raised by a conditional fetch when the upstream has not changed since the last fetch"""
+
+
+class HttpValidators:
+    """the conditional request state for one URL as seen by one consumer.  It must not be shared
+    by consumers, or the second to ask would be told that nothing has changed."""
+
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        # the number of seconds the last response may be considered fresh
+        self.seconds_fresh = 0
+
+    def as_request_headers(self):
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update(self, response_headers):
+        self.etag = response_headers.get("ETag", self.etag)
+        self.last_modified = response_headers.get("Last-Modified", self.last_modified)
+        self.seconds_fresh = seconds_fresh(response_headers)
+
+
+def seconds_fresh(response_headers):
+    """return how many more seconds a response may be considered fresh from its Cache-Control
+    max-age, less its Age"""
+    cache_control_directives = {}
+    for a_directive in response_headers.get("Cache-Control", "").split(","):
+        directive_name, _, directive_value = a_directive.strip().partition("=")
+        cache_control_directives[directive_name.lower()] = directive_value.strip('"')
+    if "no-cache" in cache_control_directives or "no-store" in cache_control_directives:
+        return 0
+    try:
+        max_age = int(cache_control_directives["max-age"])
+    except (KeyError, ValueError):
+        return 0
+    try:
+        age = int(response_headers.get("Age", 0))
+    except ValueError:
+        age = 0
+    return max(0, max_age - age)
+
+
+class HttpClient(RequiredConfig):
+    required_config = Namespace()
+    required_config.add_option(
+        "seconds_for_http_timeout",
+        doc="the number of seconds to allow for an HTTP request to complete",
+        default=10,
+    )
+    required_config.add_option(
+        "maximum_http_connections",
+        doc="the maximum number of HTTP connections open at once",
+        default=100,
+    )
+    required_config.add_option(
+        "maximum_http_connections_per_host",
+        doc="the maximum number of HTTP connections open at once to any one host",
+        default=8,
+    )
+    required_config.add_option(
+        "seconds_to_keep_http_connections_alive",
+        doc="the number of seconds to keep an idle HTTP connection open for reuse",
+        default=30,
+    )
+    required_config.add_option(
+        "seconds_to_cache_http_responses",
+        doc="the number of seconds a response fetched by get_text_cached is shared",
+        default=60,
+    )
+    required_config.add_option(
+        "maximum_cached_http_responses",
+        doc="the maximum number of responses kept by get_text_cached",
+        default=256,
+    )
+
+    def __init__(self, config=None):
+        if config is None:
+            # without configuration, just use the defaults
+            config = DotDict(
+                {an_option.name: an_option.default for an_option in self.required_config.values()}
+            )
+        self.config = config
+        self._session = None
+        self.cache = SingleFlightCache(
+            seconds_to_live=config.seconds_to_cache_http_responses,
+            maximum_entries=config.maximum_cached_http_responses,
+        )
+
+    @property
+    def session(self):
+        """the aiohttp.ClientSession, created on first use from within the running event loop"""
+        if self._session is None or self._session.closed:
+            logging.debug("creating the shared HTTP session")
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.config.maximum_http_connections,
+                    limit_per_host=self.config.maximum_http_connections_per_host,
+                    keepalive_timeout=self.config.seconds_to_keep_http_connections_alive,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.config.seconds_for_http_timeout),
+            )
+        return self._session
+
+    # these return the same async context managers as the methods of aiohttp.ClientSession:
+    #     async with thing.http.get(url) as response:
+    #         text = await response.text()
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.session.put(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    async def get_text(self, url, **kwargs):
+        async with self.get(url, **kwargs) as response:
+            return await response.text()
+
+    async def get_json(self, url, **kwargs):
+        return json.loads(await self.get_text(url, **kwargs))
+
+    @staticmethod
+    def _request_key(url, kwargs):
+        # the identity of a GET request: its URL and whatever else was passed to aiohttp
+        return (url, tuple(sorted((a_name, repr(a_value)) for a_name, a_value in kwargs.items())))
+
+    async def get_text_cached(self, url, seconds_to_live=None, **kwargs):
+        """as `get_text`, but concurrent identical requests are made only once and the result is
+        reused for `seconds_to_live`, by default the config's `seconds_to_cache_http_responses`"""
+        return await self.cache.get(
+            ("text",) + self._request_key(url, kwargs),
+            partial(self.get_text, url, **kwargs),
+            seconds_to_live=seconds_to_live,
+        )
+
+    async def get_json_cached(self, url, seconds_to_live=None, **kwargs):
+        """as `get_json`, but shared like `get_text_cached`.  The same parsed object is given to
+        every caller, it must not be modified."""
+        return await self.cache.get(
+            ("json",) + self._request_key(url, kwargs),
+            partial(self.get_json, url, **kwargs),
+            seconds_to_live=seconds_to_live,
+        )
+
+    async def get_text_if_changed(self, url, validators, headers=None, **kwargs):
+        """fetch the text at `url` with a conditional request.  `validators` is an HttpValidators
+        owned by the caller, it is updated from the response.  Raises NotModified on a 304."""
+        request_headers = dict(headers or {})
+        request_headers.update(validators.as_request_headers())
+        async with self.get(url, headers=request_headers, **kwargs) as response:
+            validators.update(response.headers)
+            if response.status == 304:
+                raise NotModified(url)
+            response.raise_for_status()
+            return await response.text()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,244 @@
+"""Counters and latency histograms of the work done by the things of a server.
+
+They show which value source is slow, failing or polled most, which property changes most often,
+how many of those changes reach the subscribers, and how late the event loop runs its callbacks.
+Recording is cheap enough for every poll and every assignment to a property: a dict lookup by the
+tuple of label values and an addition.  A histogram has fixed buckets, so its memory doesn't grow
+with the number of observations.
+
+WoTServer serves everything in the Prometheus text exposition format at `/metrics`.
+
+    pywot_polls_total{thing, value_source, outcome}     outcome: success, not_modified, timeout,
+                                                        error or skipped by the polling budget
+    pywot_poll_seconds{thing, value_source}             the time taken by each poll
+    pywot_property_sets_total{thing, property}          assignments to a property
+    pywot_property_set_seconds{thing, property}         the time taken by each assignment
+    pywot_notifications_sent_total{thing, property}     changes sent to the subscribers
+    pywot_notifications_suppressed_total{thing, property, reason}
+                                                        reason: deadband, unchanged or rate_limited
+    pywot_event_loop_lag_seconds                        how late the event loop runs a callback,
+                                                        measured by pywot.watchdog
+    pywot_budget_requests_remaining{budget}             requests left in the period of a budget
+    pywot_budget_seconds_until_exhausted{budget}        when the quota runs out at the rate so far,
+                                                        +Inf if it lasts the period
+    pywot_executor_<statistic>{executor}                each of the `stats()` of the pools of
+                                                        pywot.executors: the calls submitted,
+                                                        succeeded, failed, timed_out, cancelled and
+                                                        in_flight, the queue_depth, the mean
+                                                        seconds waiting and running..."""
+
+from bisect import bisect_left
+from collections import defaultdict
+
+from tornado.web import RequestHandler
+
+# in seconds, from a quick assignment to a property to a poll close to its timeout
+LATENCY_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_number(a_number):
+    if a_number == float("inf"):
+        return "+Inf"
+    if isinstance(a_number, float) and a_number.is_integer():
+        return str(int(a_number))
+    return repr(a_number)
+
+
+def _escape_documentation(a_documentation):
+    # unlike a label value, the text of a HELP line keeps its quotes as they are
+    return a_documentation.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def _escape(a_label_value):
+    return _escape_documentation(str(a_label_value)).replace('"', r"\"")
+
+
+def _format_labels(label_names, label_values, extra=""):
+    labels = [f'{a_name}="{_escape(a_value)}"' for a_name, a_value in zip(label_names, label_values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Counter:
+    """a count, for each combination of label values, that only goes up"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values = defaultdict(int)
+
+    def increment(self, *label_values, amount=1):
+        self.values[label_values] += amount
+
+    def samples(self):
+        for label_values, a_value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {a_value}"
+
+
+class Gauge:
+    """a value, for each combination of label values, that may go up or down"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values = {}
+
+    def set(self, a_value, *label_values):
+        self.values[label_values] = a_value
+
+    def samples(self):
+        for label_values, a_value in sorted(self.values.items()):
+            yield (
+                f"{self.name}{_format_labels(self.label_names, label_values)} "
+                f"{_format_number(a_value)}"
+            )
+
+
+class Histogram:
+    """the distribution of observed values in fixed buckets, for each combination of label
+    values"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        # label values -> [the count in each bucket and one more beyond the last, the sum]
+        self.series = {}
+
+    def observe(self, a_value, *label_values):
+        try:
+            a_series = self.series[label_values]
+        except KeyError:
+            a_series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        # a bucket counts the values less than or equal to its upper bound
+        a_series[0][bisect_left(self.buckets, a_value)] += 1
+        a_series[1] += a_value
+
+    def samples(self):
+        for label_values, (counts, total) in sorted(self.series.items()):
+            cumulative_count = 0
+            for upper_bound, a_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative_count += a_count
+                labels = _format_labels(
+                    self.label_names, label_values, f'le="{_format_number(upper_bound)}"'
+                )
+                yield f"{self.name}_bucket{labels} {cumulative_count}"
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {_format_number(total)}"
+            yield f"{self.name}_count{labels} {cumulative_count}"
+
+
+class MetricsRegistry:
+    """the metrics of a process, by name"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, a_metric):
+        if a_metric.name in self.metrics:
+            raise ValueError(f"there is already a metric called {a_metric.name}")
+        self.metrics[a_metric.name] = a_metric
+        return a_metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name, documentation, label_names=()):
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self):
+        """return all the metrics in the Prometheus text exposition format"""
+        lines = []
+        for a_metric in self.metrics.values():
+            lines.append(f"# HELP {a_metric.name} {_escape_documentation(a_metric.documentation)}")
+            lines.append(f"# TYPE {a_metric.name} {a_metric.type_name}")
+            lines.extend(a_metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# the metrics of every thing in the process
+registry = MetricsRegistry()
+
+polls = registry.counter(
+    "pywot_polls_total", "polls of value sources by outcome", ("thing", "value_source", "outcome")
+)
+poll_seconds = registry.histogram(
+    "pywot_poll_seconds", "the time taken to poll a value source", ("thing", "value_source")
+)
+property_sets = registry.counter(
+    "pywot_property_sets_total", "assignments of values to properties", ("thing", "property")
+)
+property_set_seconds = registry.histogram(
+    "pywot_property_set_seconds",
+    "the time taken to assign a value to a property and notify its subscribers",
+    ("thing", "property"),
+)
+notifications_sent = registry.counter(
+    "pywot_notifications_sent_total",
+    "changes of property values sent to the subscribers",
+    ("thing", "property"),
+)
+notifications_suppressed = registry.counter(
+    "pywot_notifications_suppressed_total",
+    "assignments to properties not sent to the subscribers",
+    ("thing", "property", "reason"),
+)
+event_loop_lag_seconds = registry.histogram(
+    "pywot_event_loop_lag_seconds", "how much later than asked the event loop runs a callback"
+)
+budget_requests_remaining = registry.gauge(
+    "pywot_budget_requests_remaining",
+    "the requests left in the current period of a polling budget",
+    ("budget",),
+)
+budget_seconds_until_exhausted = registry.gauge(
+    "pywot_budget_seconds_until_exhausted",
+    "the seconds until the quota of a polling budget runs out at the rate seen so far",
+    ("budget",),
+)
+
+executor_statistics = {
+    a_statistic: registry.gauge(f"pywot_executor_{a_statistic}", documentation, ("executor",))
+    for a_statistic, documentation in (
+        ("maximum_workers", "the number of workers of an executor"),
+        ("submitted", "the calls submitted to an executor"),
+        ("succeeded", "the calls to an executor that returned a result"),
+        ("failed", "the calls to an executor that raised an exception"),
+        ("timed_out", "the calls to an executor abandoned after their timeout"),
+        ("cancelled", "the calls to an executor abandoned by the cancellation of their caller"),
+        ("in_flight", "the calls waiting for or running in a worker of an executor"),
+        ("queue_depth", "the calls waiting for a worker of an executor"),
+        ("maximum_queue_depth", "the most calls ever waiting for a worker of an executor"),
+        ("mean_seconds_waiting", "the mean time a successful call waited for a worker"),
+        ("mean_seconds_running", "the mean time a successful call ran in a worker"),
+        ("maximum_seconds_latency", "the longest time from the submission to the result of a call"),
+    )
+}
+
+
+class MetricsHandler(RequestHandler):
+    """serves the metrics of a registry in the Prometheus text exposition format"""
+
+    def initialize(self, registry=registry):
+        self.registry = registry
+
+    def get(self):
+        self.set_header("Content-Type", CONTENT_TYPE)
+        self.write(self.registry.render())
@@ -1,4 +1,3 @@
-import aiohttp
 import async_timeout
 import asyncio
 import logging
@@ -8,14 +7,16 @@ import string
 import re
 
 from functools import partial
-from time import sleep
 from contextlib import contextmanager
 from pytz import timezone
 
 from configmanners.dotdict import DotDict
 from configmanners import RequiredConfig, Namespace, configuration, class_converter
 from pywot import logging_config, log_config
+from pywot.event_loops import event_loop_config, use_event_loop_policy
+from pywot.http_client import HttpClient
 from pywot.thing_dataclass import create_dataclass
+from pywot.watchdog import start_watchdog, watchdog_config
 
 
 DoNotCare = None
@@ -49,9 +50,16 @@ class RuleSystem(RequiredConfig):
         doc="the name of the timezone where the Things are ('US/Pacific, UTC, ...')",
         from_string_converter=timezone,
     )
+    required_config.add_option(
+        "http_client_class",
+        doc="the fully qualified name of the HTTP client class",
+        default=HttpClient,
+        from_string_converter=class_converter,
+    )
 
     def __init__(self, config):
         self.config = config
+        self.http = config.http_client_class(config)
 
     async def initialize(self):
         self.all_things = await self.get_list_of_all_known_things()
@@ -73,16 +81,15 @@ class RuleSystem(RequiredConfig):
     async def get_list_of_all_known_things(self):
         while True:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with async_timeout.timeout(self.config.seconds_for_timeout):
-                        async with session.get(
-                            f"{self.config.http_things_gateway_host}/things",
-                            headers={
-                                "Accept": "application/json",
-                                "Authorization": f"Bearer {self.config.things_gateway_auth_key}",
-                            },
-                        ) as response:
-                            definitions_of_all_things_as_list = json.loads(await response.text())
+                async with async_timeout.timeout(self.config.seconds_for_timeout):
+                    async with self.http.get(
+                        f"{self.config.http_things_gateway_host}/things",
+                        headers={
+                            "Accept": "application/json",
+                            "Authorization": f"Bearer {self.config.things_gateway_auth_key}",
+                        },
+                    ) as response:
+                        definitions_of_all_things_as_list = json.loads(await response.text())
                 # each thing needs a list of participating_rules.  The participating_rules are rules
                 # that use  the things in their predicates.  Each thing that has participating_rules
                 # will have an async function to respond to state changes.  This async function will
@@ -95,7 +102,7 @@ class RuleSystem(RequiredConfig):
                 return list_of_all_things
             except Exception as e:
                 logging.error(f"connection  refused {e}\nretrying in 30 seconds")
-                sleep(30.0)
+                await asyncio.sleep(30.0)
 
     async def go(self):
         logging.debug("go")
@@ -374,19 +381,26 @@ def run_main(main_function, configuration_requirements=Namespace()):
         from_string_converter=class_converter,
     )
     required_config.update(logging_config)
+    required_config.update(watchdog_config)
+    required_config.update(event_loop_config)
     required_config.update(configuration_requirements)
     config = configuration(required_config)
 
     logging.basicConfig(level=config.logging_level, format=config.logging_format)
     log_config(config)
 
+    use_event_loop_policy(config.event_loop_policy)
     rule_system = config.rule_system_class(config)
     loop = asyncio.get_event_loop()
     loop.run_until_complete(rule_system.initialize())
     main_function(config, rule_system)
     loop.run_until_complete(rule_system.go())
 
+    watchdog = start_watchdog(config)
     try:
         loop.run_forever()
     except KeyboardInterrupt:
         pass
+    if watchdog is not None:
+        watchdog.stop()
+    loop.run_until_complete(rule_system.http.close())
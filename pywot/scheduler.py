@@ -0,0 +1,452 @@
+"""The polling machinery shared by all the Things served by a WoTServer.
+
+Rather than running a separate `while True` loop for every value source of every Thing, a single
+dispatcher keeps a heap of deadlines and hands the polls that come due to a small, bounded pool of
+worker tasks.  A few thousand virtual things then cost a few thousand heap entries instead of a
+few thousand sleeping tasks and timer handles."""
+
+import heapq
+import logging
+import random
+import zlib
+
+from time import monotonic, time
+
+from asyncio import CancelledError, Condition, Event, TimeoutError, get_event_loop, wait_for
+from collections.abc import Mapping
+from contextvars import ContextVar
+from functools import partial
+from itertools import count
+
+from configmanners import Namespace, RequiredConfig
+
+from pywot import metrics
+from pywot.circuit_breaker import CircuitBreaker
+from pywot.http_client import NotModified
+
+# priority classes for value sources.  When more polls are due than there are workers to run
+# them, the lower numbers go first.  CRITICAL sources also have workers reserved for them alone,
+# so a safety related source can never be starved by a crowd of slow, low value pollers.
+CRITICAL_PRIORITY = 0
+NORMAL_PRIORITY = 1
+BACKGROUND_PRIORITY = 2
+
+# an adaptive polling interval grows by this factor after each poll that finds nothing new, and
+# shrinks by this one after each poll that changes a property
+ADAPTIVE_LENGTHENING_FACTOR = 1.5
+ADAPTIVE_SHORTENING_FACTOR = 0.5
+
+# the polling period of an entry whose own cannot be worked out, the default of
+# WoTThing's `seconds_between_polling`
+DEFAULT_SECONDS_BETWEEN_POLLING = 300
+
+# the polling_timeout of a value source that has none of its own: it is given the thing's
+# configured `seconds_for_polling_timeout`.  None is no limit at all.
+CONFIGURED_POLLING_TIMEOUT = "configured"
+
+# while a value source is being polled, this holds its PollingEntry so that helpers called by the
+# value source can influence its scheduling.  See `postpone_next_poll`.
+current_polling_entry = ContextVar("current_polling_entry", default=None)
+
+
+def postpone_next_poll(seconds):
+    """ask that the value source being polled not be polled again for at least `seconds`.  It is
+    used when an upstream says how long its data will stay fresh.  Outside of a poll, it does
+    nothing."""
+    polling_entry = current_polling_entry.get()
+    if polling_entry is not None:
+        polling_entry.minimum_seconds_until_next_poll = max(
+            polling_entry.minimum_seconds_until_next_poll, seconds
+        )
+
+
+class PollingEntry:
+    """the scheduling state for one value source of one Thing"""
+
+    def __init__(
+        self,
+        thing,
+        value_source_fn,
+        priority=NORMAL_PRIORITY,
+        property_names=(),
+        seconds_between_polling=None,
+        executor=None,
+        polling_budget=None,
+        minimum_seconds_between_polling=None,
+        maximum_seconds_between_polling=None,
+        polling_timeout=CONFIGURED_POLLING_TIMEOUT,
+    ):
+        self.thing = thing
+        self.value_source_fn = value_source_fn
+        self.priority = priority
+        # the names of the properties this value source feeds, for reporting only
+        self.property_names = property_names
+        # None means use the polling interval configured for the whole thing
+        self._seconds_between_polling = seconds_between_polling
+        # a blocking value source is run in this executor, None for a coroutine value source
+        self.executor = executor
+        # the pywot.budget.PollingBudget of a rate limited upstream, if any
+        self.polling_budget = polling_budget
+        self._polling_timeout = polling_timeout
+        # the time of the next poll, None while it is being polled or is dormant
+        self.deadline = None
+        # a dormant entry is not scheduled at all, its thing is idle.  See WoTThing.is_idle.
+        self.dormant = False
+        # the PollingScheduler responsible for this entry
+        self.scheduler = None
+        self.minimum_seconds_until_next_poll = 0
+        # with both bounds, the polling interval adapts to how often the values change: longer
+        # while polls find nothing new, shorter when they do.  It starts at the usual interval.
+        self.minimum_seconds_between_polling = minimum_seconds_between_polling
+        self.maximum_seconds_between_polling = maximum_seconds_between_polling
+        self.adaptive = (
+            minimum_seconds_between_polling is not None
+            and maximum_seconds_between_polling is not None
+        )
+        # set by the thing when a poll changes the value of a property
+        self.values_changed = False
+        # a value source that keeps failing is polled less and less often until it recovers
+        self.circuit_breaker = CircuitBreaker(
+            self.name,
+            failure_threshold=self._thing_option("polling_failures_before_backoff"),
+            maximum_seconds_open=self._thing_option("maximum_seconds_of_polling_backoff"),
+        )
+        # while the last poll failed, the values of the properties are stale
+        self.stale = False
+        self.time_of_last_success = None
+        self._adaptive_seconds_between_polling = None
+        if self.adaptive:
+            self._set_adaptive_seconds_between_polling(self.seconds_between_polling)
+        # the jitter applied to the polling period is random in appearance, but seeded from the
+        # name of the entry so that it is the same from one run of the server to the next.
+        self.phase = zlib.crc32(self.name.encode("utf-8")) / 0xFFFFFFFF
+        self._jitter_generator = random.Random(self.phase)
+
+    @property
+    def name(self):
+        return f"{self.thing.name}.{self.value_source_fn.__name__}"
+
+    def _thing_option(self, option_name):
+        # a thing created from a configuration lacking the option, like those of the tests, gets
+        # the option's default
+        try:
+            return self.thing.config[option_name]
+        except KeyError:
+            return self.thing.get_required_config()[option_name].default
+
+    @property
+    def polling_timeout(self):
+        """the seconds a poll may take before it is abandoned, None for no limit"""
+        if self._polling_timeout == CONFIGURED_POLLING_TIMEOUT:
+            return self._thing_option("seconds_for_polling_timeout")
+        return self._polling_timeout
+
+    @property
+    def seconds_between_polling(self):
+        if self._adaptive_seconds_between_polling is not None:
+            return self._adaptive_seconds_between_polling
+        if self._seconds_between_polling is None:
+            return self.thing.config.seconds_between_polling
+        return self._seconds_between_polling
+
+    def _set_adaptive_seconds_between_polling(self, seconds_between_polling):
+        self._adaptive_seconds_between_polling = min(
+            max(seconds_between_polling, self.minimum_seconds_between_polling),
+            self.maximum_seconds_between_polling,
+        )
+        # clients can see how often the values of the properties are being refreshed
+        for a_property_name in self.property_names:
+            self.thing.properties[a_property_name].metadata[
+                "pollingInterval"
+            ] = self._adaptive_seconds_between_polling
+
+    def _set_stale(self, stale):
+        if stale == self.stale:
+            return
+        self.stale = stale
+        # clients can see that the values of the properties are no longer being refreshed
+        for a_property_name in self.property_names:
+            self.thing.properties[a_property_name].metadata["stale"] = stale
+
+    def _record_success(self):
+        self.circuit_breaker.record_success()
+        self._set_stale(False)
+        self.time_of_last_success = time()
+
+    def _record_failure(self, message):
+        if self.circuit_breaker.record_failure(self.seconds_between_polling):
+            logging.error(message)
+        else:
+            logging.debug(message)
+        self._set_stale(True)
+
+    def _adapt_seconds_between_polling(self):
+        if self.values_changed:
+            factor = ADAPTIVE_SHORTENING_FACTOR
+        else:
+            factor = ADAPTIVE_LENGTHENING_FACTOR
+        self._set_adaptive_seconds_between_polling(self.seconds_between_polling * factor)
+
+    def next_jitter(self):
+        """return a number in the range [-1.0, 1.0) to scale the jitter of the next period"""
+        return self._jitter_generator.uniform(-1.0, 1.0)
+
+    async def poll(self):
+        value_source_name = self.value_source_fn.__name__
+        if self.polling_budget is not None and not self.polling_budget.draw():
+            logging.debug(f"{self.name}: skipping the poll, the budget is exhausted")
+            metrics.polls.increment(self.thing.name, value_source_name, "skipped")
+            return
+        token = current_polling_entry.set(self)
+        self.values_changed = False
+        outcome = "success"
+        started = monotonic()
+        try:
+            # a hung upstream must not hold a polling worker forever.  A blocking value source
+            # keeps its thread until it returns, but the worker is free to move on.
+            if self.executor is None:
+                new_values = await wait_for(
+                    self.value_source_fn(self.thing), self.polling_timeout
+                )
+            else:
+                # the executor counts the calls that time out
+                new_values = await self.executor.run(
+                    self.value_source_fn, self.thing, timeout=self.polling_timeout
+                )
+            if self.executor is not None:
+                if new_values is not None and not isinstance(new_values, Mapping):
+                    # a blocking value source returns the new value of its property
+                    if len(self.property_names) != 1:
+                        raise TypeError(
+                            f"{self.name} feeds {len(self.property_names)} properties, "
+                            f"it must return a mapping of their names to values"
+                        )
+                    new_values = {self.property_names[0]: new_values}
+            if isinstance(new_values, Mapping):
+                # rather than assigning to the properties itself, the value source has returned
+                # a mapping of property names to new values.  They're published as one update.
+                self.thing.update_properties(new_values)
+            self._record_success()
+            if self.adaptive:
+                self._adapt_seconds_between_polling()
+        except NotModified:
+            outcome = "not_modified"
+            logging.debug(f"{self.name}: upstream not modified")
+            self._record_success()
+            if self.adaptive:
+                self._adapt_seconds_between_polling()
+        except CancelledError:
+            outcome = None
+            raise
+        except TimeoutError:
+            outcome = "timeout"
+            self._record_failure(
+                f"{self.name}: loading data fails: no answer within "
+                f"{self.polling_timeout} seconds"
+            )
+        except Exception as e:
+            # we'll be optimistic and prefer to retry if something goes wrong.
+            # while graceful falure is to be commended, there is also great value
+            # in spontaneous recovery.  The circuit breaker just makes the retries less frequent.
+            outcome = "error"
+            self._record_failure(f"{self.name}: loading data fails: {type(e)}: {e}")
+        finally:
+            current_polling_entry.reset(token)
+            if outcome is not None:
+                # a poll cut short by the server shutting down is neither a success nor a failure
+                metrics.polls.increment(self.thing.name, value_source_name, outcome)
+                metrics.poll_seconds.observe(
+                    monotonic() - started, self.thing.name, value_source_name
+                )
+
+
+class PollingScheduler(RequiredConfig):
+    """a deadline heap of PollingEntry instances serviced by a bounded pool of workers"""
+
+    required_config = Namespace()
+    required_config.add_option(
+        "number_of_polling_workers",
+        doc="the maximum number of value sources to poll concurrently",
+        default=8,
+    )
+    required_config.add_option(
+        "number_of_critical_polling_workers",
+        doc="the number of extra polling workers reserved for CRITICAL_PRIORITY value sources",
+        default=1,
+    )
+    required_config.add_option(
+        "polling_phase_spread",
+        doc="the fraction (0.0 to 1.0) of its polling period across which the first poll of each "
+        "value source is spread, 0.0 polls everything at once when the server starts",
+        default=1.0,
+    )
+    required_config.add_option(
+        "polling_jitter",
+        doc="the fraction (0.0 to 1.0) of its polling period by which each poll may be moved "
+        "earlier or later",
+        default=0.1,
+    )
+
+    def __init__(self, config):
+        self.config = config
+        # the deadline heap holds (deadline, sequence, entry) for entries waiting for their
+        # next poll.  The ready heap holds (priority, deadline, sequence, entry) for entries that
+        # are due and waiting for a worker.  The sequence number breaks ties so that entries
+        # themselves never need to be compared.
+        self._deadline_heap = []
+        self._ready_heap = []
+        self._sequence = count()
+        self._deadline_changed = None
+        self._work_available = None
+
+    @staticmethod
+    def _now():
+        return get_event_loop().time()
+
+    def add(self, polling_entry, delay=0.0):
+        """schedule the next poll of `polling_entry` for `delay` seconds from now"""
+        polling_entry.deadline = self._now() + delay
+        heapq.heappush(
+            self._deadline_heap, (polling_entry.deadline, next(self._sequence), polling_entry)
+        )
+        if self._deadline_changed is not None and self._deadline_heap[0][2] is polling_entry:
+            # the new entry is due before anything else, the dispatcher must wake up early
+            self._deadline_changed.set()
+
+    def add_first_poll(self, polling_entry):
+        """schedule the first poll of `polling_entry` at its own offset within its period.
+
+        Were every value source polled the moment the server starts, all of the upstreams would
+        be hit at the same instant after each restart and, with equal periods, at the same
+        instant forever after.  The offset comes from the entry's name, so a given thing's
+        sources land in the same place in the period every time."""
+        polling_entry.scheduler = self
+        if polling_entry.polling_budget is not None:
+            polling_entry.polling_budget.add_consumer(polling_entry)
+        self.add(
+            polling_entry,
+            polling_entry.phase
+            * self.config.polling_phase_spread
+            * polling_entry.seconds_between_polling,
+        )
+
+    def poll_now(self, polling_entry):
+        """move the next poll of `polling_entry` to right now.  It does nothing if the entry is
+        already due or being polled."""
+        if polling_entry.dormant:
+            polling_entry.dormant = False
+            self.add(polling_entry)
+        elif polling_entry.deadline is not None and polling_entry.deadline > self._now():
+            # the old place of the entry in the deadline heap is left behind, the dispatcher
+            # drops it because it no longer matches the entry's deadline
+            self.add(polling_entry)
+
+    def seconds_until_next_poll(self, polling_entry):
+        """return the number of seconds until the next poll of `polling_entry`, or None if it
+        should not be polled again until its thing is no longer idle"""
+        if polling_entry.thing.is_idle():
+            seconds_between_idle_polling = polling_entry.thing.config.seconds_between_idle_polling
+            if seconds_between_idle_polling is None:
+                return None
+            seconds_between_polling = max(
+                polling_entry.seconds_between_polling, seconds_between_idle_polling
+            )
+        else:
+            seconds_between_polling = polling_entry.seconds_between_polling
+        seconds_until_next_poll = seconds_between_polling * (
+            1.0 + self.config.polling_jitter * polling_entry.next_jitter()
+        )
+        # the value source may have learned that polling again too soon would be pointless
+        seconds_until_next_poll = max(
+            seconds_until_next_poll, polling_entry.minimum_seconds_until_next_poll
+        )
+        polling_entry.minimum_seconds_until_next_poll = 0
+        # a failing value source is left alone for a while before it is probed again
+        seconds_until_next_poll = max(
+            seconds_until_next_poll, polling_entry.circuit_breaker.seconds_until_probe()
+        )
+        if polling_entry.polling_budget is not None:
+            # polling any sooner would spend the quota of the upstream before the period is out
+            seconds_until_next_poll = max(
+                seconds_until_next_poll, polling_entry.polling_budget.seconds_between_polls()
+            )
+        return seconds_until_next_poll
+
+    def start(self):
+        """create the dispatcher and worker tasks, returning them so the owner can cancel them"""
+        io_loop = get_event_loop()
+        self._deadline_changed = Event()
+        self._work_available = Condition()
+        tasks = {io_loop.create_task(self._dispatch())}
+        for _ in range(self.config.number_of_polling_workers):
+            tasks.add(io_loop.create_task(self._work(critical_only=False)))
+        for _ in range(self.config.number_of_critical_polling_workers):
+            tasks.add(io_loop.create_task(self._work(critical_only=True)))
+        logging.debug(f"polling scheduler started with {len(tasks) - 1} workers")
+        return tasks
+
+    async def _dispatch(self):
+        while True:
+            now = self._now()
+            number_ready = 0
+            while self._deadline_heap and self._deadline_heap[0][0] <= now:
+                deadline, sequence, polling_entry = heapq.heappop(self._deadline_heap)
+                if deadline != polling_entry.deadline:
+                    # left behind when the entry was rescheduled by `poll_now`
+                    continue
+                heapq.heappush(
+                    self._ready_heap, (polling_entry.priority, deadline, sequence, polling_entry)
+                )
+                number_ready += 1
+            if number_ready:
+                async with self._work_available:
+                    self._work_available.notify_all()
+
+            self._deadline_changed.clear()
+            # a timer wakes the dispatcher at the next deadline.  wait_for would do, but it can
+            # swallow the cancellation of the dispatcher when the event is set at the same time.
+            wake_up = (
+                get_event_loop().call_at(self._deadline_heap[0][0], self._deadline_changed.set)
+                if self._deadline_heap
+                else None
+            )
+            try:
+                await self._deadline_changed.wait()
+            finally:
+                if wake_up is not None:
+                    wake_up.cancel()
+
+    @staticmethod
+    def _default_seconds_between_polling(polling_entry):
+        try:
+            return polling_entry.seconds_between_polling
+        except Exception:
+            return DEFAULT_SECONDS_BETWEEN_POLLING
+
+    def _has_work(self, critical_only):
+        if not self._ready_heap:
+            return False
+        return not critical_only or self._ready_heap[0][0] == CRITICAL_PRIORITY
+
+    async def _work(self, critical_only):
+        while True:
+            async with self._work_available:
+                await self._work_available.wait_for(partial(self._has_work, critical_only))
+                priority, deadline, sequence, polling_entry = heapq.heappop(self._ready_heap)
+            polling_entry.deadline = None
+            try:
+                await polling_entry.poll()
+                # like the old per property loops, the next poll is measured from the end of
+                # this one, so a slow source can never have two polls in flight at once.
+                seconds_until_next_poll = self.seconds_until_next_poll(polling_entry)
+            except CancelledError:
+                raise
+            except Exception as e:
+                # a worker that died here would leave fewer and fewer workers to poll everything
+                logging.error(f"{polling_entry.name}: scheduling fails: {type(e)}: {e}")
+                seconds_until_next_poll = self._default_seconds_between_polling(polling_entry)
+            if seconds_until_next_poll is None:
+                logging.debug(f"{polling_entry.name}: dormant until its thing is wanted")
+                polling_entry.dormant = True
+            else:
+                self.add(polling_entry, seconds_until_next_poll)
@@ -0,0 +1,285 @@
+"""A WoTServer spread across several processes.
+
+One WoTServer runs the polling, the JSON encoding and the websocket fan-out of all of its things
+in one event loop, on one core.  A ShardedWoTServer partitions the things into
+`server.number_of_shards` shards, each served by a WoTServer in a worker process of its own, on
+a port of its own: `port + 1` for the first shard, `port + 2` for the second and so on.  A thing
+is assigned to a shard by a hash of its name, and served by it at `/<thing id>`, a number that is
+also a hash of its name.  So as long as `server.number_of_shards` stays the same, a thing keeps its
+shard, and its URL, from one run to the next, even as other things come and go.  A shard left
+without things keeps its port, but no worker is started for it.
+
+The worker processes are forked from a supervising process, so the things need no pickling.  The
+supervisor holds no event loop and no threads, so it can safely fork a worker again when one
+dies, after `server.seconds_before_worker_restart`.  A restarted worker takes the values of its
+properties from the latest snapshot, if its things have a `property_snapshot_file`.
+
+On `port` itself, a directory process serves the merged list of the descriptions of all the
+things, fetched from the workers, with every `href` in them pointing to the worker serving it.
+Each worker advertises itself with mDNS, as a WoTServer does, and serves its own `/metrics`.
+
+Use it in place of WoTServer, for example with `--server.wot_server_class` in the demos:
+
+    --server.wot_server_class=pywot.sharding.ShardedWoTServer --server.number_of_shards=4"""
+
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import zlib
+
+from multiprocessing.connection import wait
+from os.path import join
+from time import sleep
+from urllib.parse import urljoin
+
+from configmanners import Namespace, RequiredConfig
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from tornado.ioloop import IOLoop
+from tornado.web import Application, RequestHandler
+
+from webthing import MultipleThings
+
+from pywot import WoTServer
+from pywot.event_loops import use_event_loop_policy
+
+
+def thing_id_of(a_thing):
+    """return the number in the URL of a thing, which depends on its name alone"""
+    return zlib.crc32(a_thing.name.encode("utf-8"))
+
+
+def shard_of(a_thing, number_of_shards):
+    """return the index of the shard of a thing"""
+    return thing_id_of(a_thing) % number_of_shards
+
+
+class ShardThings(MultipleThings):
+    """the things of a shard, each at `/<thing id>` rather than at its index in the list, which
+    would change with the other things of the shard"""
+
+    def __init__(self, things, name):
+        super(ShardThings, self).__init__(things, name)
+        self.things_by_id = {thing_id_of(a_thing): a_thing for a_thing in things}
+
+    def get_thing(self, thing_id):
+        try:
+            return self.things_by_id.get(int(thing_id))
+        except ValueError:
+            return None
+
+    def set_href_prefixes(self):
+        # webthing numbers the things by their place in the list as its server starts
+        for a_thing_id, a_thing in self.things_by_id.items():
+            a_thing.set_href_prefix(f"/{a_thing_id}")
+
+
+def absolute_hrefs(a_description, worker_url):
+    """point every href within a thing description, those of its properties, actions, events
+    and links included, at the worker that serves it.  Absolute URLs are left as they are."""
+    if isinstance(a_description, dict):
+        for a_key, a_value in a_description.items():
+            if a_key == "href" and isinstance(a_value, str):
+                a_description[a_key] = urljoin(worker_url, a_value)
+            else:
+                absolute_hrefs(a_value, worker_url)
+    elif isinstance(a_description, list):
+        for a_value in a_description:
+            absolute_hrefs(a_value, worker_url)
+
+
+class ThingDirectoryHandler(RequestHandler):
+    """serves the descriptions of the things of all the shards as one list"""
+
+    def initialize(self, worker_ports, protocol):
+        self.worker_ports = worker_ports
+        self.protocol = protocol
+
+    def set_default_headers(self):
+        self.set_header("Access-Control-Allow-Origin", "*")
+
+    async def get(self):
+        # the workers describe their things with links for the host the client asked for
+        hostname = self.request.host_name
+        http_client = AsyncHTTPClient()
+        descriptions = []
+        for a_worker_port in self.worker_ports:
+            worker_url = f"{self.protocol}://{hostname}:{a_worker_port}/"
+            try:
+                response = await http_client.fetch(
+                    f"{self.protocol}://127.0.0.1:{a_worker_port}/",
+                    headers={"Host": f"{hostname}:{a_worker_port}", "Accept": "application/json"},
+                    validate_cert=False,
+                )
+            except (HTTPClientError, OSError) as e:
+                # a worker being restarted, its things are missing from the list until it is back
+                logging.warning(f"the directory cannot reach the shard at {worker_url}: {e}")
+                continue
+            worker_descriptions = json.loads(response.body)
+            absolute_hrefs(worker_descriptions, worker_url)
+            descriptions.extend(worker_descriptions)
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(descriptions))
+
+
+class ShardedWoTServer(RequiredConfig):
+    required_config = Namespace()
+    required_config.update(WoTServer.get_required_config())
+    required_config.add_option(
+        "number_of_shards",
+        doc="the number of worker processes serving the things, each on a core of its own",
+        default=os.cpu_count() or 1,
+    )
+    required_config.add_option(
+        "seconds_before_worker_restart",
+        doc="the time to wait before restarting a worker process that has died",
+        default=5,
+    )
+
+    def __init__(self, config, things, name=None, port=80, ssl_options=None):
+        self.config = config
+        self.name = name or "pywot"
+        self.port = port
+        self.ssl_options = ssl_options
+        things_by_id = {}
+        for a_thing in things:
+            other_thing = things_by_id.setdefault(thing_id_of(a_thing), a_thing)
+            if other_thing is not a_thing:
+                raise ValueError(
+                    f"the things {other_thing.name} and {a_thing.name} would have the same URL, "
+                    f"one of them must be renamed"
+                )
+        # the configured number, not fewer for fewer things, so that the shard of a thing
+        # doesn't depend on how many others there are
+        number_of_shards = max(1, config.server.number_of_shards)
+        self.shards = [[] for i in range(number_of_shards)]
+        for a_thing in things:
+            self.shards[shard_of(a_thing, number_of_shards)].append(a_thing)
+        # a shard may be empty, but it keeps its port so that the others keep theirs
+        self.worker_ports = [
+            self.port_of_shard(shard_index)
+            for shard_index, a_shard in enumerate(self.shards)
+            if a_shard
+        ]
+        # fork rather than spawn: the things are inherited by the workers, not pickled
+        self._multiprocessing = multiprocessing.get_context("fork")
+        self.processes = {}
+
+    def port_of_shard(self, shard_index):
+        return self.port + 1 + shard_index
+
+    def _run_worker(self, shard_index):
+        # in the worker process
+        server_config = self.config.server
+        if server_config.time_series_directory is not None:
+            # each worker numbers the series it logs, so each needs a store of its own
+            server_config.time_series_directory = join(
+                server_config.time_series_directory, f"shard_{shard_index}"
+            )
+        name = f"{self.name} shard {shard_index}"
+        things = ShardThings(self.shards[shard_index], name)
+        for a_thing in things.get_things():
+            # the worker may be a restart, long after the things were created
+            a_thing._restore_from_snapshot()
+        server = WoTServer(
+            self.config,
+            things,
+            name=name,
+            port=self.port_of_shard(shard_index),
+            ssl_options=self.ssl_options,
+        )
+        things.set_href_prefixes()
+        # the other workers snapshot their things to the same files
+        server.merge_snapshots = True
+        server.run()
+
+    def _run_directory(self):
+        # in the directory process
+        use_event_loop_policy(self.config.server.event_loop_policy)
+        application = Application(
+            [
+                (
+                    r"/?",
+                    ThingDirectoryHandler,
+                    dict(
+                        worker_ports=self.worker_ports,
+                        protocol="http" if self.ssl_options is None else "https",
+                    ),
+                )
+            ]
+        )
+        application.listen(self.port, ssl_options=self.ssl_options)
+        try:
+            IOLoop.current().start()
+        except KeyboardInterrupt:
+            pass
+
+    def _process_main(self, a_function, *args):
+        # in each child process.  In a process group of its own, ^C at the terminal reaches the
+        # supervisor alone, which passes it on to each child just once.
+        os.setpgrp()
+        a_function(*args)
+
+    def _start_process(self, process_key):
+        if process_key == "directory":
+            target_args = (self._run_directory,)
+        else:
+            target_args = (self._run_worker, process_key)
+        a_process = self._multiprocessing.Process(
+            target=self._process_main,
+            args=target_args,
+            name=f"{self.name} {process_key}",
+            # a daemonic process cannot start the processes of a process_pool.  The supervisor
+            # stops and joins its children itself.
+            daemon=False,
+        )
+        a_process.start()
+        logging.info(f"started {a_process.name} as process {a_process.pid}")
+        self.processes[process_key] = a_process
+
+    def _supervise(self):
+        while True:
+            processes_by_sentinel = {
+                a_process.sentinel: process_key
+                for process_key, a_process in self.processes.items()
+            }
+            dead_process_keys = [
+                processes_by_sentinel[a_sentinel] for a_sentinel in wait(processes_by_sentinel)
+            ]
+            for process_key in dead_process_keys:
+                a_process = self.processes[process_key]
+                a_process.join()
+                logging.error(
+                    f"{a_process.name} exited with {a_process.exitcode}, restarting it in "
+                    f"{self.config.server.seconds_before_worker_restart} seconds"
+                )
+            sleep(self.config.server.seconds_before_worker_restart)
+            for process_key in dead_process_keys:
+                self._start_process(process_key)
+
+    def _stop_all_processes(self):
+        for a_process in self.processes.values():
+            if a_process.is_alive():
+                os.kill(a_process.pid, signal.SIGINT)
+        for a_process in self.processes.values():
+            a_process.join(timeout=30)
+            if a_process.is_alive():
+                logging.warning(f"{a_process.name} did not stop, terminating it")
+                a_process.terminate()
+
+    def run(self):
+        logging.debug(f"starting server {self.name} with {len(self.shards)} shards")
+        # a service manager stops the supervisor with SIGTERM, it stops the workers like ^C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            for shard_index, a_shard in enumerate(self.shards):
+                if a_shard:
+                    self._start_process(shard_index)
+            self._start_process("directory")
+            self._supervise()
+        except KeyboardInterrupt:
+            logging.debug("stop signal received")
+        finally:
+            # the children are not daemonic, the supervisor must not leave them behind
+            self._stop_all_processes()
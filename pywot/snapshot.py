@@ -0,0 +1,166 @@
+"""Snapshots of property values for warm restarts.
+
+After a restart, every property would hold its `initial_value` until the first poll of its value
+source, which can take minutes.  A WoTServer periodically writes the current value of every
+property of its things that has changed to a snapshot file, replacing the old one atomically.
+When a WoTThing is created with `config.property_snapshot_file`, it starts from the values in the
+snapshot rather than the initial values, provided the snapshot is no older than
+`config.maximum_seconds_of_snapshot_age`.  Properties with a `value_forwarder` are not restored:
+the device they set is the authority on their value.
+
+The file is a packed binary format, so it stays small and quick to read with thousands of
+properties.  Each value is stored with the time it last changed, so that its age is known:
+
+    header: b"PYWOTSNP", version (u16), written at (f64), number of values (u32)
+    each value: key length (u16), key "<thing name>/<property name>" (utf-8), type code (u8),
+                the value (f64, i64, u8 or u32 length and utf-8), changed at (f64)"""
+
+import fcntl
+import logging
+import struct
+
+from functools import lru_cache
+from os import stat
+from time import time
+
+from pywot.timeseries import write_atomically
+
+MAGIC = b"PYWOTSNP"
+VERSION = 1
+HEADER = struct.Struct("<8sHdI")
+KEY_LENGTH = struct.Struct("<H")
+TYPE_CODE = struct.Struct("<B")
+CHANGED_AT = struct.Struct("<d")
+STRING_LENGTH = struct.Struct("<I")
+
+# type code -> the struct of its packed value.  Strings are of variable length.
+FLOAT, INTEGER, BOOLEAN, STRING = range(4)
+VALUE_STRUCTS = {
+    FLOAT: struct.Struct("<d"),
+    INTEGER: struct.Struct("<q"),
+    BOOLEAN: struct.Struct("<?"),
+}
+
+
+def _type_code(a_value):
+    # bool first, it is a subclass of int
+    if isinstance(a_value, bool):
+        return BOOLEAN
+    if isinstance(a_value, int):
+        return INTEGER
+    if isinstance(a_value, float):
+        return FLOAT
+    if isinstance(a_value, str):
+        return STRING
+    return None
+
+
+def pack_snapshot(values, written_at=None):
+    """return the bytes of a snapshot of a mapping of keys to (value, changed at).  Values of
+    types that cannot be stored are left out."""
+    packed_values = []
+    for a_key, (a_value, changed_at) in values.items():
+        type_code = _type_code(a_value)
+        if type_code is None:
+            continue
+        if type_code == STRING:
+            encoded_value = a_value.encode("utf-8")
+            packed_value = STRING_LENGTH.pack(len(encoded_value)) + encoded_value
+        else:
+            try:
+                packed_value = VALUE_STRUCTS[type_code].pack(a_value)
+            except struct.error:
+                # an integer too large for 64 bits
+                continue
+        encoded_key = a_key.encode("utf-8")
+        packed_values.append(
+            KEY_LENGTH.pack(len(encoded_key))
+            + encoded_key
+            + TYPE_CODE.pack(type_code)
+            + packed_value
+            + CHANGED_AT.pack(changed_at)
+        )
+    header = HEADER.pack(
+        MAGIC, VERSION, time() if written_at is None else written_at, len(packed_values)
+    )
+    return header + b"".join(packed_values)
+
+
+def unpack_snapshot(data):
+    """return the time a snapshot was written and a mapping of its keys to (value, changed at)"""
+    magic, version, written_at, number_of_values = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a pywot property snapshot")
+    offset = HEADER.size
+    values = {}
+    for _ in range(number_of_values):
+        (key_length,) = KEY_LENGTH.unpack_from(data, offset)
+        offset += KEY_LENGTH.size
+        a_key = bytes(data[offset : offset + key_length]).decode("utf-8")
+        offset += key_length
+        (type_code,) = TYPE_CODE.unpack_from(data, offset)
+        offset += TYPE_CODE.size
+        if type_code == STRING:
+            (string_length,) = STRING_LENGTH.unpack_from(data, offset)
+            offset += STRING_LENGTH.size
+            a_value = bytes(data[offset : offset + string_length]).decode("utf-8")
+            offset += string_length
+        else:
+            (a_value,) = VALUE_STRUCTS[type_code].unpack_from(data, offset)
+            offset += VALUE_STRUCTS[type_code].size
+        (changed_at,) = CHANGED_AT.unpack_from(data, offset)
+        offset += CHANGED_AT.size
+        values[a_key] = (a_value, changed_at)
+    return written_at, values
+
+
+@lru_cache(maxsize=8)
+def _load_snapshot(path, modification_time):
+    # cached by the modification time, so a thousand things created from one snapshot read and
+    # unpack it just once
+    with open(path, "rb") as f:
+        return unpack_snapshot(f.read())
+
+
+def load_snapshot(path):
+    """return the time the snapshot at `path` was written and its mapping of keys to (value,
+    changed at), or (None, {}) if there is no usable snapshot"""
+    try:
+        return _load_snapshot(path, stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None, {}
+    except (ValueError, KeyError, struct.error, UnicodeDecodeError) as e:
+        logging.warning(f"ignoring the property snapshot {path}: {e}")
+        return None, {}
+
+
+def snapshot_values(things):
+    """return a mapping of the keys of the properties of `things` to (value, changed at).  Those
+    that have never changed still hold their initial values, which are not worth restoring."""
+    values = {}
+    for a_thing in things:
+        for a_property_name, a_property in a_thing.properties.items():
+            try:
+                changed_at = a_thing.property_change_times[a_property_name]
+            except KeyError:
+                continue
+            values[f"{a_thing.name}/{a_property_name}"] = (a_property.value.get(), changed_at)
+    return values
+
+
+def snapshot_things(things):
+    """return the bytes of a snapshot of the changed properties of `things`.  It is quick enough to
+    run in the event loop, which keeps the snapshot consistent, leaving only the writing of the
+    file to be done elsewhere with `write_atomically`."""
+    return pack_snapshot(snapshot_values(things))
+
+
+def write_merged_snapshot(path, values):
+    """write a snapshot of `values` to `path`, keeping the values already there for other keys.
+    Processes that each snapshot their own things to the same file take turns by a lock on
+    `<path>.lock`, so that none loses the values written by another."""
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        _, merged_values = load_snapshot(path)
+        merged_values = {**merged_values, **values}
+        write_atomically(path, pack_snapshot(merged_values))
@@ -0,0 +1,76 @@
+"""Value sources that push rather than being polled.
+
+Some sources can stream their values: websockets, server sent events, GPIO edge interrupts or an
+MQTT broker.  Polling them costs a request every period and delays each change by up to a whole
+period.  A `value_stream_fn` is instead an async generator method of the Thing, or any method
+returning an async iterator.  Each value it yields goes straight into its property, or, for a
+stream feeding several properties, each mapping of property names to values it yields is
+published as one update.
+
+A StreamEntry runs one stream for one Thing in a task of its own.  When the stream fails or
+ends, it is opened again after a pause that doubles with each consecutive failure, up to
+`config.maximum_seconds_before_stream_reconnect`.  The pause is reset by the arrival of a value."""
+
+import logging
+
+from asyncio import CancelledError, sleep
+from collections.abc import Mapping
+
+
+class StreamEntry:
+    """the running state of one value stream of one Thing"""
+
+    def __init__(self, thing, value_stream_fn, property_names=()):
+        self.thing = thing
+        self.value_stream_fn = value_stream_fn
+        self.property_names = property_names
+        self.number_of_consecutive_failures = 0
+        # while the stream is down, the values of the properties are stale
+        self.stale = False
+
+    @property
+    def name(self):
+        return f"{self.thing.name}.{self.value_stream_fn.__name__}"
+
+    def _set_stale(self, stale):
+        if stale == self.stale:
+            return
+        self.stale = stale
+        for a_property_name in self.property_names:
+            self.thing.properties[a_property_name].metadata["stale"] = stale
+
+    def _publish(self, new_values):
+        if not isinstance(new_values, Mapping):
+            # the stream yields the new value of its property
+            if len(self.property_names) != 1:
+                raise TypeError(
+                    f"{self.name} feeds {len(self.property_names)} properties, "
+                    f"it must yield mappings of their names to values"
+                )
+            new_values = {self.property_names[0]: new_values}
+        self.thing.update_properties(new_values)
+
+    def seconds_before_reconnect(self):
+        return min(
+            self.thing.config.seconds_before_stream_reconnect
+            * 2 ** min(self.number_of_consecutive_failures - 1, 32),
+            self.thing.config.maximum_seconds_before_stream_reconnect,
+        )
+
+    async def run(self):
+        while True:
+            try:
+                logging.debug(f"{self.name}: opening the stream")
+                async for new_values in self.value_stream_fn(self.thing):
+                    self.number_of_consecutive_failures = 0
+                    self._set_stale(False)
+                    self._publish(new_values)
+                logging.info(f"{self.name}: the stream has ended")
+            except CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"{self.name}: streaming data fails: {type(e)}: {e}")
+            # whether it failed or just ended, the stream is opened again after a pause
+            self.number_of_consecutive_failures += 1
+            self._set_stale(True)
+            await sleep(self.seconds_before_reconnect())
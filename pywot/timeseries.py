@@ -0,0 +1,352 @@
+"""A persistent log of every property change, kept without any external database.
+
+A TimeSeriesStore appends each change to a file of fixed size records: the time, the value and the
+id of the series, "<thing name>/<property name>".  The names of the series are kept beside the
+records in `series.json`.  A new segment file is started every `seconds_per_segment`, a day by
+default, and segments older than `retention_seconds` are deleted.  When a segment is finished, its
+records are rolled up into buckets of `seconds_per_rollup` holding the count, min, max and sum of
+each series, written to a file of its own.  A year of one minute data is then just 8760 rollups
+per series for a long range query, rather than half a million records.
+
+Appending a record is a write to a file already open.  The rest of the upkeep, rolling up a
+finished segment, deleting the expired ones and saving the names of new series, is done in
+`pywot.executors.housekeeping_pool` so that it doesn't stall the event loop at midnight.
+
+Segments are memory mapped for reading.  Selecting the records of a series within a range, and
+aggregating them into rollups, is vectorized with NumPy when it is installed, and done in plain
+Python otherwise.
+
+    segments/000001700000.tsdat    - the records of a segment, 24 bytes each
+    segments/000001700000.tsrollup - its rollups, 40 bytes each"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from concurrent.futures import wait
+from time import time
+
+from pywot.executors import housekeeping_pool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# (timestamp, value, series id) padded to keep the doubles of every record aligned
+RECORD = struct.Struct("<ddI4x")
+# (bucket start, series id, count, min, max, sum)
+ROLLUP = struct.Struct("<dIIddd")
+
+SEGMENT_SUFFIX = ".tsdat"
+ROLLUP_SUFFIX = ".tsrollup"
+
+if numpy is not None:
+    RECORD_DTYPE = numpy.dtype(
+        [("timestamp", "<f8"), ("value", "<f8"), ("series_id", "<u4"), ("padding", "V4")]
+    )
+    ROLLUP_DTYPE = numpy.dtype(
+        [
+            ("bucket_start", "<f8"),
+            ("series_id", "<u4"),
+            ("count", "<u4"),
+            ("minimum", "<f8"),
+            ("maximum", "<f8"),
+            ("total", "<f8"),
+        ]
+    )
+else:
+    RECORD_DTYPE = ROLLUP_DTYPE = None
+
+
+def write_atomically(path, data):
+    """replace the file at `path` with `data` such that a crash leaves the old or the new file,
+    never a mix of the two"""
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+def _records_in_file(path, record_struct, dtype=None):
+    """return the complete records of a file as a NumPy structured array, or a list of tuples
+    when NumPy is not available.  A file deleted by the retention has no records."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return [] if numpy is None else numpy.zeros(0, dtype=dtype)
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        number_of_records = size // record_struct.size
+        if not number_of_records:
+            return [] if numpy is None else numpy.zeros(0, dtype=dtype)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if numpy is not None:
+                return numpy.frombuffer(mapped, dtype=dtype, count=number_of_records).copy()
+            return list(record_struct.iter_unpack(mapped[: number_of_records * record_struct.size]))
+
+
+class TimeSeriesStore:
+    def __init__(
+        self,
+        directory,
+        seconds_per_segment=24 * 60 * 60,
+        retention_seconds=366 * 24 * 60 * 60,
+        seconds_per_rollup=60 * 60,
+    ):
+        self.directory = directory
+        self.seconds_per_segment = seconds_per_segment
+        self.retention_seconds = retention_seconds
+        self.seconds_per_rollup = seconds_per_rollup
+        self.segments_directory = os.path.join(directory, "segments")
+        os.makedirs(self.segments_directory, exist_ok=True)
+        self._series_path = os.path.join(directory, "series.json")
+        try:
+            with open(self._series_path) as f:
+                self._series_ids = json.load(f)
+        except FileNotFoundError:
+            self._series_ids = {}
+        self._current_segment_start = None
+        self._current_segment_file = None
+        # the version of the series names last given to the thread pool and the last saved, so
+        # that an older version saved late cannot replace a newer one
+        self._series_ids_version = 0
+        self._saved_series_ids_version = 0
+        self._series_ids_lock = threading.Lock()
+        # the upkeep in progress in the thread pool, waited for by `close`
+        self._pending_upkeep = set()
+        # segments finished while the server was down still need their rollups
+        self._submit_upkeep(self._roll_up_missing, time())
+
+    def _submit_upkeep(self, a_function, *args):
+        a_future = housekeeping_pool.executor.submit(a_function, *args)
+        self._pending_upkeep.add(a_future)
+        a_future.add_done_callback(self._upkeep_done)
+
+    def _upkeep_done(self, a_future):
+        # in the thread pool, or the caller's thread if the upkeep was already done
+        self._pending_upkeep.discard(a_future)
+        if not a_future.cancelled() and a_future.exception() is not None:
+            logging.error(
+                "the upkeep of the time series store fails", exc_info=a_future.exception()
+            )
+
+    def _roll_up_missing(self, now):
+        # in the thread pool
+        for a_segment_start in self._segment_starts():
+            if a_segment_start + self.seconds_per_segment > now:
+                break
+            if not os.path.exists(self._rollup_path(a_segment_start)):
+                self._roll_up(a_segment_start)
+
+    def _segment_path(self, segment_start):
+        return os.path.join(self.segments_directory, f"{int(segment_start):012d}{SEGMENT_SUFFIX}")
+
+    def _rollup_path(self, segment_start):
+        return os.path.join(self.segments_directory, f"{int(segment_start):012d}{ROLLUP_SUFFIX}")
+
+    def _segment_starts(self):
+        return sorted(
+            int(a_file_name[: -len(SEGMENT_SUFFIX)])
+            for a_file_name in os.listdir(self.segments_directory)
+            if a_file_name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def series_id(self, series_name):
+        """return the id of the named series, adding the series if it is new"""
+        try:
+            return self._series_ids[series_name]
+        except KeyError:
+            self._series_ids[series_name] = len(self._series_ids)
+            self._series_ids_version += 1
+            self._submit_upkeep(
+                self._save_series_ids, dict(self._series_ids), self._series_ids_version
+            )
+            return self._series_ids[series_name]
+
+    def _save_series_ids(self, series_ids, version):
+        # in the thread pool
+        with self._series_ids_lock:
+            if version <= self._saved_series_ids_version:
+                return
+            write_atomically(self._series_path, json.dumps(series_ids).encode("utf-8"))
+            self._saved_series_ids_version = version
+
+    def append(self, series_name, value, timestamp=None):
+        """record the value of a series"""
+        if timestamp is None:
+            timestamp = time()
+        segment_start = int(timestamp - timestamp % self.seconds_per_segment)
+        if segment_start != self._current_segment_start:
+            self._start_segment(segment_start)
+        self._current_segment_file.write(
+            RECORD.pack(timestamp, value, self.series_id(series_name))
+        )
+        self._current_segment_file.flush()
+
+    def _start_segment(self, segment_start):
+        previous_segment_start = self._current_segment_start
+        if self._current_segment_file is not None:
+            self._current_segment_file.close()
+        if previous_segment_start is not None and previous_segment_start < segment_start:
+            self._submit_upkeep(self._roll_up, previous_segment_start)
+        self._current_segment_start = segment_start
+        path = self._segment_path(segment_start)
+        self._current_segment_file = open(path, "ab")
+        # a crash may have left half a record at the end, cut it off before appending more
+        size = self._current_segment_file.tell()
+        if size % RECORD.size:
+            self._current_segment_file.truncate(size - size % RECORD.size)
+        self._submit_upkeep(self._apply_retention, segment_start)
+
+    def _apply_retention(self, now):
+        # in the thread pool
+        for a_segment_start in self._segment_starts():
+            if a_segment_start + self.seconds_per_segment > now - self.retention_seconds:
+                break
+            logging.debug(f"time series segment {a_segment_start} has expired")
+            for a_path in (self._segment_path(a_segment_start), self._rollup_path(a_segment_start)):
+                try:
+                    os.remove(a_path)
+                except FileNotFoundError:
+                    pass
+
+    def _aggregate(self, segment_start):
+        """return the rollups of the records of a segment, sorted by bucket and series id, as a
+        NumPy structured array of ROLLUP_DTYPE, or a list of tuples when NumPy is not available"""
+        records = _records_in_file(self._segment_path(segment_start), RECORD, RECORD_DTYPE)
+        if numpy is not None:
+            timestamps = records["timestamp"]
+            bucket_starts = timestamps - timestamps % self.seconds_per_rollup
+            order = numpy.lexsort((records["series_id"], bucket_starts))
+            bucket_starts = bucket_starts[order]
+            series_ids = records["series_id"][order]
+            values = records["value"][order]
+            if not len(values):
+                return numpy.zeros(0, dtype=ROLLUP_DTYPE)
+            # the index of the first record of each (bucket, series id) in the sorted records
+            firsts = numpy.flatnonzero(
+                numpy.concatenate(
+                    (
+                        [True],
+                        (bucket_starts[1:] != bucket_starts[:-1])
+                        | (series_ids[1:] != series_ids[:-1]),
+                    )
+                )
+            )
+            rollups = numpy.zeros(len(firsts), dtype=ROLLUP_DTYPE)
+            rollups["bucket_start"] = bucket_starts[firsts]
+            rollups["series_id"] = series_ids[firsts]
+            rollups["count"] = numpy.diff(numpy.append(firsts, len(values)))
+            rollups["minimum"] = numpy.minimum.reduceat(values, firsts)
+            rollups["maximum"] = numpy.maximum.reduceat(values, firsts)
+            # bincount adds in the order of the records, as the plain Python aggregation does
+            rollups["total"] = numpy.bincount(
+                numpy.repeat(numpy.arange(len(firsts)), rollups["count"]), weights=values
+            )
+            return rollups
+
+        aggregates_by_key = {}
+        for a_timestamp, a_value, a_series_id in records:
+            bucket_start = a_timestamp - a_timestamp % self.seconds_per_rollup
+            key = (bucket_start, a_series_id)
+            if key in aggregates_by_key:
+                count, minimum, maximum, total = aggregates_by_key[key]
+                aggregates_by_key[key] = (
+                    count + 1, min(minimum, a_value), max(maximum, a_value), total + a_value
+                )
+            else:
+                aggregates_by_key[key] = (1, a_value, a_value, a_value)
+        return sorted(key + aggregates for key, aggregates in aggregates_by_key.items())
+
+    def _roll_up(self, segment_start):
+        # in the thread pool
+        rollups = self._aggregate(segment_start)
+        if numpy is not None:
+            data = rollups.tobytes()
+        else:
+            data = b"".join(ROLLUP.pack(*a_rollup) for a_rollup in rollups)
+        write_atomically(self._rollup_path(segment_start), data)
+
+    def _overlapping_segment_starts(self, start, end):
+        return [
+            a_segment_start
+            for a_segment_start in self._segment_starts()
+            if (end is None or a_segment_start <= end)
+            and (start is None or a_segment_start + self.seconds_per_segment > start)
+        ]
+
+    def query(self, series_name, start=None, end=None):
+        """return a list of (timestamp, value) of the series from `start` to `end` inclusive"""
+        series_id = self._series_ids.get(series_name)
+        if series_id is None:
+            return []
+        if self._current_segment_file is not None:
+            self._current_segment_file.flush()
+        results = []
+        for a_segment_start in self._overlapping_segment_starts(start, end):
+            records = _records_in_file(
+                self._segment_path(a_segment_start), RECORD, RECORD_DTYPE
+            )
+            if numpy is not None:
+                selected = records["series_id"] == series_id
+                if start is not None:
+                    selected &= records["timestamp"] >= start
+                if end is not None:
+                    selected &= records["timestamp"] <= end
+                results.extend(
+                    zip(
+                        records["timestamp"][selected].tolist(),
+                        records["value"][selected].tolist(),
+                    )
+                )
+            else:
+                results.extend(
+                    (a_timestamp, a_value)
+                    for a_timestamp, a_value, a_series_id in records
+                    if a_series_id == series_id
+                    and (start is None or a_timestamp >= start)
+                    and (end is None or a_timestamp <= end)
+                )
+        return results
+
+    def query_rollups(self, series_name, start=None, end=None):
+        """return a list of (bucket start, count, min, max, mean) of the series for each rollup
+        bucket from `start` to `end`.  Finished segments are read from their rollup files, only
+        the current one is aggregated on the fly."""
+        series_id = self._series_ids.get(series_name)
+        if series_id is None:
+            return []
+        results = []
+        for a_segment_start in self._overlapping_segment_starts(start, end):
+            if a_segment_start == self._current_segment_start or not os.path.exists(
+                self._rollup_path(a_segment_start)
+            ):
+                rollups = self._aggregate(a_segment_start)
+            else:
+                rollups = _records_in_file(
+                    self._rollup_path(a_segment_start), ROLLUP, ROLLUP_DTYPE
+                )
+            if numpy is not None:
+                rollups = rollups[rollups["series_id"] == series_id].tolist()
+            results.extend(
+                (bucket_start, count, minimum, maximum, total / count)
+                for bucket_start, a_series_id, count, minimum, maximum, total in rollups
+                if a_series_id == series_id
+                and (start is None or bucket_start + self.seconds_per_rollup > start)
+                and (end is None or bucket_start <= end)
+            )
+        return results
+
+    def close(self):
+        # the rollups and the names of the series must be on disk for the next start
+        wait(list(self._pending_upkeep))
+        if self._current_segment_file is not None:
+            self._current_segment_file.close()
+            self._current_segment_file = None
+            self._current_segment_start = None
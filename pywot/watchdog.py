@@ -0,0 +1,216 @@
+"""A watchdog for callbacks that block the event loop.
+
+Every thing of a server, or every rule of a rule system, shares one event loop.  A blocking call
+hidden in any of them, a `time.sleep`, a synchronous HTTP request or a long parse, freezes all of
+the others, and nothing says so.  The EventLoopWatchdog schedules a heartbeat callback in the
+event loop every `seconds_between_heartbeats`.  How late each heartbeat runs is the scheduling
+delay of the loop, recorded in `pywot.metrics`.  A thread of the watchdog checks the time of the
+last heartbeat.  When the loop has been held for more than `seconds_of_blocking_before_report`, the
+thread captures the stack of the event loop's thread as it is, blocked, and logs it along with the
+task that was running.
+
+The stalls are kept in a report of the worst offenders, by task or, outside of a task, by the
+line of code that blocked.  `worst_offenders()` returns it, it is logged every
+`seconds_between_watchdog_reports` and when the watchdog stops.  Until a stall, the cost is one
+short callback per heartbeat and one check per heartbeat in the thread."""
+
+import logging
+import sys
+import threading
+import traceback
+
+from asyncio import current_task, get_event_loop
+from time import monotonic
+
+from configmanners import Namespace
+
+from pywot import metrics
+
+watchdog_config = Namespace()
+watchdog_config.add_option(
+    "event_loop_watchdog",
+    doc="watch for callbacks that block the event loop and report them",
+    default=True,
+)
+watchdog_config.add_option(
+    "seconds_between_heartbeats",
+    doc="the time between the watchdog's measurements of how late the event loop runs",
+    default=0.1,
+)
+watchdog_config.add_option(
+    "seconds_of_blocking_before_report",
+    doc="how long a callback may block the event loop before its stack is captured and logged",
+    default=0.25,
+)
+watchdog_config.add_option(
+    "number_of_worst_offenders",
+    doc="the number of the worst blockers of the event loop kept in the watchdog's report",
+    default=10,
+)
+watchdog_config.add_option(
+    "seconds_between_watchdog_reports",
+    doc="the time between logs of the watchdog's report of the worst offenders",
+    default=3600,
+)
+
+
+class BlockingOffender:
+    """the stalls of the event loop attributed to one task or line of code"""
+
+    def __init__(self, location, stack):
+        self.location = location
+        self.number_of_stalls = 0
+        self.total_seconds_blocked = 0.0
+        self.worst_seconds_blocked = 0.0
+        # the stack as it was during the worst of the stalls
+        self.stack = stack
+
+    def add_stall(self, seconds_blocked, stack):
+        self.number_of_stalls += 1
+        self.total_seconds_blocked += seconds_blocked
+        if seconds_blocked >= self.worst_seconds_blocked:
+            self.worst_seconds_blocked = seconds_blocked
+            self.stack = stack
+
+
+class EventLoopWatchdog:
+    def __init__(
+        self,
+        seconds_between_heartbeats=0.1,
+        seconds_of_blocking_before_report=0.25,
+        number_of_worst_offenders=10,
+        seconds_between_reports=3600,
+    ):
+        self.seconds_between_heartbeats = seconds_between_heartbeats
+        self.seconds_of_blocking_before_report = seconds_of_blocking_before_report
+        self.number_of_worst_offenders = number_of_worst_offenders
+        self.seconds_between_reports = seconds_between_reports
+        self.offenders = {}
+        self.io_loop = None
+        self._loop_thread_id = None
+        self._heartbeat_handle = None
+        self._time_of_last_heartbeat = None
+        self._time_of_last_report = None
+        # set by the thread of the watchdog when it catches the loop blocked: (the time of the
+        # heartbeat it followed, the location, the stack).  The next heartbeat ends the stall.
+        self._stall = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self, io_loop=None):
+        """start watching the event loop.  This must be called from the event loop's thread."""
+        self.io_loop = get_event_loop() if io_loop is None else io_loop
+        self._loop_thread_id = threading.get_ident()
+        self._time_of_last_heartbeat = self._time_of_last_report = monotonic()
+        self._heartbeat_handle = self.io_loop.call_later(
+            self.seconds_between_heartbeats, self._heartbeat
+        )
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._watch, name="pywot watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self._heartbeat_handle.cancel()
+        self.log_report()
+
+    def _heartbeat(self):
+        # in the event loop
+        now = monotonic()
+        seconds_late = max(0.0, now - self._time_of_last_heartbeat - self.seconds_between_heartbeats)
+        metrics.event_loop_lag_seconds.observe(seconds_late)
+        stall, self._stall = self._stall, None
+        if stall is not None and stall[0] == self._time_of_last_heartbeat:
+            self._add_stall(seconds_late, *stall[1:])
+        self._time_of_last_heartbeat = now
+        if now - self._time_of_last_report >= self.seconds_between_reports:
+            self._time_of_last_report = now
+            self.log_report()
+        self._heartbeat_handle = self.io_loop.call_later(
+            self.seconds_between_heartbeats, self._heartbeat
+        )
+
+    def _watch(self):
+        # in the thread of the watchdog
+        while not self._stopping.wait(self.seconds_between_heartbeats):
+            time_of_last_heartbeat = self._time_of_last_heartbeat
+            seconds_blocked = monotonic() - time_of_last_heartbeat - self.seconds_between_heartbeats
+            if (
+                seconds_blocked <= self.seconds_of_blocking_before_report
+                or self._stall is not None
+                # outside of run_forever or run_until_complete, no heartbeat is expected
+                or not self.io_loop.is_running()
+            ):
+                continue
+            location, stack = self._capture_blocked_stack()
+            if stack is None:
+                continue
+            self._stall = (time_of_last_heartbeat, location, stack)
+            logging.warning(
+                f"the event loop has been blocked for {seconds_blocked:.3f} seconds by "
+                f"{location}:\n{stack}"
+            )
+
+    def _capture_blocked_stack(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None, None
+        stack_summary = traceback.extract_stack(frame)
+        del frame
+        task = current_task(self.io_loop)
+        if task is not None:
+            location = f"task {task.get_coro().__qualname__}"
+        else:
+            innermost_frame = stack_summary[-1]
+            location = (
+                f"{innermost_frame.name} "
+                f"({innermost_frame.filename}:{innermost_frame.lineno})"
+            )
+        return location, "".join(stack_summary.format())
+
+    def _add_stall(self, seconds_blocked, location, stack):
+        logging.debug(f"the event loop was blocked for {seconds_blocked:.3f} seconds by {location}")
+        if location not in self.offenders:
+            self.offenders[location] = BlockingOffender(location, stack)
+        self.offenders[location].add_stall(seconds_blocked, stack)
+        if len(self.offenders) > self.number_of_worst_offenders:
+            least_offender = min(
+                self.offenders.values(), key=lambda an_offender: an_offender.worst_seconds_blocked
+            )
+            del self.offenders[least_offender.location]
+
+    def worst_offenders(self):
+        """return the BlockingOffenders, the worst first"""
+        return sorted(
+            self.offenders.values(),
+            key=lambda an_offender: an_offender.worst_seconds_blocked,
+            reverse=True,
+        )
+
+    def log_report(self):
+        for an_offender in self.worst_offenders():
+            logging.warning(
+                f"blocked the event loop {an_offender.number_of_stalls} times for "
+                f"{an_offender.total_seconds_blocked:.3f} seconds in all, at worst "
+                f"{an_offender.worst_seconds_blocked:.3f} seconds: {an_offender.location}\n"
+                f"{an_offender.stack}"
+            )
+
+
+def start_watchdog(config, io_loop=None):
+    """start and return an EventLoopWatchdog as configured by the options of `watchdog_config`,
+    or return None if it is not enabled"""
+    if not config.event_loop_watchdog:
+        return None
+    watchdog = EventLoopWatchdog(
+        seconds_between_heartbeats=config.seconds_between_heartbeats,
+        seconds_of_blocking_before_report=config.seconds_of_blocking_before_report,
+        number_of_worst_offenders=config.number_of_worst_offenders,
+        seconds_between_reports=config.seconds_between_watchdog_reports,
+    )
+    watchdog.start(io_loop)
+    return watchdog